@@ -1,342 +1,280 @@
 import streamlit as st
-import yfinance as yf
-import pandas as pd
-import requests
-import plotly.graph_objects as go
-import plotly.express as px
+import os
+import sys
+import json
+import time
+import hashlib
+import uuid
+import threading
+from concurrent.futures import Future
 from datetime import datetime, timedelta, timezone
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from portfolio import load_portfolio, parse_master_input
+from profiling import CAPTURE_MODES, begin_run, stage, count, mark, install_network_meter
 
-# --- 앱 메모리(Session State) 초기화 ---
-if "analyzed" not in st.session_state: st.session_state.analyzed = False
-if "sort_by" not in st.session_state: st.session_state.sort_by = "실제금액숫자" 
-if "filter_by" not in st.session_state: st.session_state.filter_by = "전체"
+# 첫 화면(입력 패널 + 헤더 골격)은 가벼운 모듈만으로 먼저 그리고,
+# pandas/plotly/yfinance 를 끌고 오는 모듈은 그 다음에 불러온다 (환율은 별도 스레드에서 채움)
+startup_prof = begin_run("startup")
+try:
+    cold_start = "charts" not in sys.modules      # 이 프로세스에서 무거운 모듈을 처음 불러오는 실행인지
 
-# ==========================================
-# 🔑 구글 시트 연결 설정
-# ==========================================
-SHEET_CSV_URL = "여기에_시트_CSV_링크를_넣어주세요"
-WEB_APP_URL = "여기에_웹앱_URL을_넣어주세요"
+    # --- 앱 메모리(Session State) 초기화 ---
+    if "analyzed" not in st.session_state: st.session_state.analyzed = False
+    if "sort_by" not in st.session_state: st.session_state.sort_by = "실제금액숫자" 
+    if "filter_by" not in st.session_state: st.session_state.filter_by = "전체"
+    if "profile_runs" not in st.session_state: st.session_state.profile_runs = {}
 
-# ==========================================
-# 1. 포트폴리오 정의 & 브랜드 메타데이터
-# ==========================================
-SAMSUNG_TICKER = "005930.KS"
-SAMSUNG_QTY = 41
-
-fixed_portfolio = [
-    {"name": "GLDM", "ticker": "GLDM", "ratio": 0.04, "country": "US"},
-    {"name": "VTV",  "ticker": "VTV",  "ratio": 0.04, "country": "US"},
-    {"name": "TLT",  "ticker": "TLT",  "ratio": 0.025, "country": "US"},
-    {"name": "IEI",  "ticker": "IEI",  "ratio": 0.015, "country": "US"},
-    {"name": "SCHD", "ticker": "SCHD", "ratio": 0.04, "country": "US"},
-]
-
-invest_portfolio = [
-    {"name": "TSM",        "ticker": "TSM",    "ratio": 0.235, "country": "US"},
-    {"name": "NVDA",       "ticker": "NVDA",   "ratio": 0.08, "country": "US"},
-    {"name": "TSLA",       "ticker": "TSLA",   "ratio": 0.065, "country": "US"},
-    {"name": "MSFT",       "ticker": "MSFT",   "ratio": 0.065, "country": "US"},
-    {"name": "AAPL",       "ticker": "AAPL",   "ratio": 0.06, "country": "US"},
-    {"name": "GOOGL",      "ticker": "GOOGL",  "ratio": 0.10, "country": "US"},
-    {"name": "AMD",        "ticker": "AMD",    "ratio": 0.065, "country": "US"},
-    {"name": "AMZN",       "ticker": "AMZN",   "ratio": 0.065, "country": "US"},
-    {"name": "SK하이닉스", "ticker": "000660.KS", "ratio": 0.20, "country": "KR"},
-    {"name": "현대차",     "ticker": "005380.KS", "ratio": 0.065, "country": "KR"},
-]
-
-all_stocks = fixed_portfolio + invest_portfolio
-all_names = [item['name'] for item in all_stocks] 
-
-brand_meta = {
-    "TSM": {"name": "📱 TSM", "color": "#8A5A5A"},
-    "NVDA": {"name": "🤖 NVDA", "color": "#76B900"},
-    "TSLA": {"name": "🚗 TSLA", "color": "#E31937"},
-    "MSFT": {"name": "🪟 MSFT", "color": "#F34F1C"},
-    "AAPL": {"name": "🍎 AAPL", "color": "#A2AAAD"},
-    "GOOGL": {"name": "🔍 GOOGL", "color": "#4285F4"},
-    "AMD": {"name": "💻 AMD", "color": "#ED1C24"},
-    "AMZN": {"name": "🛒 AMZN", "color": "#FF9900"},
-    "SK하이닉스": {"name": "💾 SK하이닉스", "color": "#E60012"},
-    "현대차": {"name": "🚙 현대차", "color": "#002C5F"},
-    "삼성전자": {"name": "🔒 삼성전자", "color": "#1428A0"},
-    "GLDM": {"name": "🥇 GLDM", "color": "#FFD700"},
-    "VTV": {"name": "🏦 VTV", "color": "#00509E"},
-    "TLT": {"name": "📜 TLT", "color": "#0076CE"},
-    "IEI": {"name": "📄 IEI", "color": "#0093D0"},
-    "SCHD": {"name": "💸 SCHD", "color": "#005A9C"},
-    "예수금": {"name": "💵 예수금", "color": "#85BB65"}
-}
+    LIVE_INTERVALS = [60, 120, 300, 600]   # 장중 시세 캐시 수명(quote_cache.LIVE_TTL_SEC)보다 짧게 잡아도 의미 없음
+    PROJECTION_PATHS = [5000, 10000, 20000, 50000]
 
-def get_brand(raw_name):
-    key = raw_name.split()[0]
-    return brand_meta.get(key, {"name": raw_name, "color": "#9E9E9E"})
+    # ==========================================
+    # 🔑 구글 시트 연결 설정
+    # ==========================================
+    SHEET_CSV_URL = os.environ.get("SHEET_CSV_URL", "여기에_시트_CSV_링크를_넣어주세요")     # 시트 → 파일 → 웹에 게시 → CSV
+    WEB_APP_URL = "여기에_웹앱_URL을_넣어주세요"
 
-# ==========================================
-# 2. 데이터 캐싱 함수
-# ==========================================
-@st.cache_data(ttl=600)
-def get_current_exchange_rate():
-    try: 
-        hist = yf.Ticker("KRW=X").history(period="5d")
-        return hist['Close'].dropna().iloc[-1]
-    except: 
-        return 1400.0
-
-@st.cache_data(ttl=3600)
-def get_exchange_trend():
-    try:
-        df = yf.download("KRW=X", period="1mo", progress=False)
-        if isinstance(df.columns, pd.MultiIndex): return df['Close']['KRW=X']
-        return df['Close']
-    except: return None
+    # ==========================================
+    # 1. 포트폴리오 정의 & 브랜드 메타데이터 (portfolio.toml)
+    # ==========================================
+    PORTFOLIO = load_portfolio()
+    brand_meta = PORTFOLIO.brand_meta()
 
-def get_real_price_and_change(ticker, country):
-    try:
-        stock = yf.Ticker(ticker)
-        hist = stock.history(period="7d")
-        
-        if len(hist) >= 3:
-            d2_close = hist['Close'].iloc[-3]
-            d1_close = hist['Close'].iloc[-2]
-            prev_change_pct = ((d1_close - d2_close) / d2_close) * 100
-        else:
-            d2_close = 0
-            d1_close = stock.fast_info.get('previous_close', 0)
-            prev_change_pct = 0.0
+    def get_brand(raw_name):
+        key = raw_name.split()[0]
+        return brand_meta.get(key, {"name": raw_name, "color": "#9E9E9E"})
 
-        if country == "KR":
-            try: current_price = stock.fast_info['last_price']
-            except: current_price = hist['Close'].iloc[-1] if not hist.empty else 0
+    # ==========================================
+    # 2. 데이터 캐싱 함수
+    # ==========================================
+    @st.cache_data(ttl=600)
+    def get_current_exchange_rate():
+        from quotes import get_exchange_rate
+        return get_exchange_rate()
+
+    @st.cache_data(ttl=3600)
+    def get_exchange_trend():
+        import yfinance as yf
+        import pandas as pd
+        try:
+            df = yf.download("KRW=X", period="1mo", progress=False)
+            if isinstance(df.columns, pd.MultiIndex): return df['Close']['KRW=X']
+            return df['Close']
+        except: return None
+
+    def start_fx_header():
+        """헤더 환율/1개월 추이를 스크립트와 나란히 받는다 (cache_data 적중이면 바로 끝남)."""
+        fut = Future()
+        def work():
+            try: fut.set_result((get_current_exchange_rate(), get_exchange_trend()))
+            except BaseException as e: fut.set_exception(e)
+        worker = threading.Thread(target=work, name="header-fx", daemon=True)
+        add_script_run_ctx(worker, get_script_run_ctx())
+        worker.start()
+        return fut
+
+    def fill_fx_header(slot, fut):
+        """헤더 골격의 환율 칸을 채운다. 스크립트 끝(또는 st.stop 직전)에 한 번 부른다."""
+        with stage("fx_header"):
+            try: exc_rate, trend_df = fut.result()
+            except: exc_rate, trend_df = None, None
+        with slot.container():
+            st.info(f"**💵 실시간 환율 (KRW/USD)**\n### " + (f"₩{exc_rate:,.1f}" if exc_rate else "불러오지 못함"))
+            if trend_df is not None and not trend_df.empty:
+                import plotly.graph_objects as go
+                fig_spark = go.Figure(go.Scatter(x=trend_df.index, y=trend_df.values, mode='lines', line=dict(color='#2E7D32', width=3)))
+                fig_spark.update_layout(margin=dict(l=0,r=0,t=0,b=0), height=40, xaxis=dict(visible=False), yaxis=dict(visible=False), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
+                st.plotly_chart(fig_spark, use_container_width=True, config={'displayModeBar': False})
+
+    # ==========================================
+    # 3. 최상단 UI (단일 입력 패널 ➔ 전광판 헤더)
+    # ==========================================
+    st.set_page_config(page_title="스마트 리밸런싱", page_icon="📈", layout="wide")
+    st.title("📈 퀀트 포트폴리오 터미널")
+
+    st.subheader("⚙️ 포트폴리오 통합 데이터 입력")
+    n_holdings = len(PORTFOLIO)
+    n_free = n_holdings - int(PORTFOLIO.locked.sum())
+    st.markdown(f"**(입력순서) 현금[1개] + 보유수량(고정종목 제외)[{n_free}개] + 평단가(원화)[{n_holdings}개] + 실현손익(원화)[{n_holdings}개]**")
+    st.caption(f"※ 순서: {' '.join(PORTFOLIO.aliases)}")
+
+    master_input = st.text_input(f"🔢 아래 칸에 띄어쓰기로 구분하여 한 줄로 붙여넣어주세요 (총 {PORTFOLIO.input_size}개 숫자)", 
+                                 placeholder="예: 10000000 10 5 0 2 10 5 ...", 
+                                 value=st.query_params.get("raw_data", ""))
+    with st.expander("📂 증권사 거래내역 CSV 로 보유수량·평단가·실현손익 채우기 (선택)"):
+        ledger_files = st.file_uploader("거래내역 CSV (매수/매도/배당/환전, 국내·해외 계좌 여러 개 가능)", type="csv", accept_multiple_files=True)
+        col_method, col_reset = st.columns([3, 1])
+        ledger_method = col_method.radio("원가 계산", ["fifo", "avg"], format_func={"fifo": "선입선출(FIFO)", "avg": "이동평균"}.get, horizontal=True)
+        ledger_reset = col_reset.button("반영한 원장 지우기", use_container_width=True)
+        st.caption("※ 파일을 올리면 위 입력칸에서는 첫 숫자(현금)만 쓰고 나머지는 원장에서 계산합니다. 같은 파일을 다시 올리면 새 거래만 더합니다 (이 브라우저 세션 안에서만 기억).")
+        if st.session_state.get("ledger_note"): st.caption(f"✅ {st.session_state.ledger_note}")
+    col_run, col_save = st.columns([4, 1])
+    execute_btn = col_run.button("분석 실행 및 시트에 기록 🚀", type="primary", use_container_width=True)
+    save_btn = col_save.button("💾 오늘 보유 저장", use_container_width=True,
+                               help="분석과 함께 입력한 보유를 오늘 날짜로 저장해 차트 보유 이력에 씁니다 (주소의 holder 값마다 따로 저장)")
+    if st.session_state.get("snapshot_note"): st.caption(st.session_state.snapshot_note)
+
+    st.write("---")
+
+    kst = timezone(timedelta(hours=9))
+    now = datetime.now(kst)
+    weekdays = ["월", "화", "수", "목", "금", "토", "일"]
+    date_str = f"{now.strftime('%Y년 %m월 %d일')} ({weekdays[now.weekday()]})"
+    time_str = now.strftime("%p %I:%M").replace("AM", "오전").replace("PM", "오후")
+    fx_future = start_fx_header()
+
+    head_col1, head_col2, head_col3, head_col4 = st.columns(4)
+    with head_col1: 
+        st.info(f"**📅 오늘 날짜**\n### {date_str}")
+    with head_col2:
+        if st.session_state.analyzed and "total_asset" in st.session_state:
+            st.info(f"**💰 총 자산**\n### ₩{st.session_state.total_asset:,.0f}")
         else:
-            df_intra = stock.history(period="1d", interval="1m", prepost=True)
-            if not df_intra.empty: current_price = df_intra['Close'].iloc[-1]
-            else: current_price = stock.fast_info.get('last_price', d1_close)
+            st.info(f"**💰 총 자산**\n### 분석 전")
+    with head_col3: 
+        st.info(f"**⏰ 현재 시간 (KST)**\n### {time_str}")
+    with head_col4: 
+        fx_slot = st.empty()
+        fx_slot.info(f"**💵 실시간 환율 (KRW/USD)**\n### 불러오는 중…")
 
-        if d1_close > 0 and current_price > 0: change_pct = ((current_price - d1_close) / d1_close) * 100
-        else: change_pct = 0.0
-        
-        return current_price, change_pct, d1_close, prev_change_pct, d2_close
-    except: return 0, 0.0, 0, 0.0, 0
+    st.write("---")
+    mark("first_paint")
 
-# ==========================================
-# 3. 최상단 UI (단일 입력 패널 ➔ 전광판 헤더)
-# ==========================================
-st.set_page_config(page_title="스마트 리밸런싱", page_icon="📈", layout="wide")
-st.title("📈 퀀트 포트폴리오 터미널")
-
-st.subheader("⚙️ 포트폴리오 통합 데이터 입력")
-st.markdown("**(입력순서) 현금[1개] + 보유수량(삼전제외)[15개] + 평단가(원화)[16개] + 실현손익(원화)[16개]**")
-st.caption(f"※ 순서: 금 가치주 장기채권 중기채권 배당주 TSM NVDA TSLA MSFT AAPL GOOGL AMD AMZN 하이닉스 현대차 삼성전자")
-
-master_input = st.text_input("🔢 아래 칸에 띄어쓰기로 구분하여 한 줄로 붙여넣어주세요 (총 48개 숫자)", 
-                             placeholder="예: 10000000 10 5 0 2 10 5 ...", 
-                             value=st.query_params.get("raw_data", ""))
-execute_btn = st.button("분석 실행 및 시트에 기록 🚀", type="primary", use_container_width=True)
-
-st.write("---")
-
-kst = timezone(timedelta(hours=9))
-now = datetime.now(kst)
-weekdays = ["월", "화", "수", "목", "금", "토", "일"]
-date_str = f"{now.strftime('%Y년 %m월 %d일')} ({weekdays[now.weekday()]})"
-time_str = now.strftime("%p %I:%M").replace("AM", "오전").replace("PM", "오후")
-exc_rate = get_current_exchange_rate()
-
-head_col1, head_col2, head_col3, head_col4 = st.columns(4)
-with head_col1: 
-    st.info(f"**📅 오늘 날짜**\n### {date_str}")
-with head_col2:
-    if st.session_state.analyzed and "total_asset" in st.session_state:
-        st.info(f"**💰 총 자산**\n### ₩{st.session_state.total_asset:,.0f}")
-    else:
-        st.info(f"**💰 총 자산**\n### 분석 전")
-with head_col3: 
-    st.info(f"**⏰ 현재 시간 (KST)**\n### {time_str}")
-with head_col4: 
-    st.info(f"**💵 실시간 환율 (KRW/USD)**\n### ₩{exc_rate:,.1f}")
-    trend_df = get_exchange_trend()
-    if trend_df is not None and not trend_df.empty:
-        fig_spark = go.Figure(go.Scatter(x=trend_df.index, y=trend_df.values, mode='lines', line=dict(color='#2E7D32', width=3)))
-        fig_spark.update_layout(margin=dict(l=0,r=0,t=0,b=0), height=40, xaxis=dict(visible=False), yaxis=dict(visible=False), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
-        st.plotly_chart(fig_spark, use_container_width=True, config={'displayModeBar': False})
-
-st.write("---")
+    # ==========================================
+    # 무거운 모듈 (pandas / plotly / yfinance) — 첫 화면을 보낸 뒤에 불러온다
+    # ==========================================
+    with stage("imports"):
+        import yfinance as yf
+        import pandas as pd
+        from market_data import MarketDataService
+        from price_history import PriceHistory
+        from valuation import value_holdings
+        from charts import month_starts, candle_figure, area_figure, add_recorded_line, set_last_value, projection_figure
+        from ohlc_pyramid import OhlcPyramid, CHART_RANGES, RESOLUTIONS, PAN_FACTOR
+        from montecarlo import project, METHODS
+        from risk import RiskState, risk_levels
+        from tables import (
+            STOCK_COLUMNS, SUMMARY_COLUMNS, PNL_COLUMNS, action_summary_html, target_amounts,
+            build_holding_table, style_stock_view, style_summary_table, style_pnl_table,
+        )
+        from quote_cache import open_markets, next_open
+        from engine import evaluate, session_values
+        from sheet_writer import get_sheet_writer
+        from sheet_reader import get_sheet_reader
+        from ledger import CostBasisBook, LedgerError, apply_files
+        from holdings_timeline import from_changes, record_snapshot, snapshot_changes
+        install_network_meter()
+
+    PROJECTION_METHODS = dict(zip(METHODS, ["과거 수익률 재표본", "다변량 정규분포"]))
+
+    @st.cache_resource
+    def get_market_data():
+        """모든 세션이 같이 쓰는 시세/일봉 서비스 (프로세스당 하나)"""
+        return MarketDataService()
+
+    MARKET = get_market_data()
+    if cold_start: count("cold_start")
+finally:
+    startup_prof.end()      # 중간에 예외로 빠져나가도 계측을 끝낸다
+
+st.session_state.profile_runs["startup"] = startup_prof.end().to_dict()
 
 # ==========================================
 # 4. 데이터 수집 엔진 & 입력 파싱 로직
 # ==========================================
-if execute_btn:
+if ledger_reset:
+    st.session_state.pop("ledger_book", None)
+    st.session_state.pop("ledger_note", None)
+    st.toast("반영한 원장을 지웠습니다. 다음 분석 때 올린 파일을 처음부터 다시 반영합니다.")
+
+if execute_btn or save_btn:
     st.query_params["raw_data"] = master_input
     
-    values = []
-    if master_input.strip() != "":
+    try:
+        pf_input = parse_master_input(PORTFOLIO, master_input)
+    except ValueError:
+        st.error("숫자와 띄어쓰기만 입력해주세요!")
+        fill_fx_header(fx_slot, fx_future)
+        st.stop()
+
+    st.session_state.pop("ledger_note", None)
+    st.session_state.pop("snapshot_note", None)
+    book = None
+    if ledger_files:
         try:
-            values = list(map(float, master_input.replace(",", "").split()))
-        except ValueError:
-            st.error("숫자와 띄어쓰기만 입력해주세요!")
+            # 원장 상태는 세션마다 따로 든다 (다른 사용자가 같은 이름의 파일을 올려도 섞이지 않음)
+            book = st.session_state.get("ledger_book")
+            if book is None or book.method != ledger_method: book = CostBasisBook(ledger_method)
+            with stage("ledger"):
+                book, applied = apply_files(book, PORTFOLIO, [(f.name, f) for f in ledger_files], fx_fallback=get_current_exchange_rate())
+            st.session_state.ledger_book = book
+            pf_input = book.to_input(PORTFOLIO, pf_input.cash)
+            st.session_state.ledger_note = f"거래내역 새 거래 {applied:,}건 반영" + "".join(f" · {k} {v:,}건" for k, v in book.counts.items() if k != "applied")
+        except LedgerError as e:
+            st.error(f"거래내역을 읽을 수 없습니다: {e}")
+            fill_fx_header(fx_slot, fx_future)
             st.stop()
-            
-    while len(values) < 48:
-        values.append(0.0)
-        
-    input_cash = values[0]
-    user_holdings = [int(v) for v in values[1:16]]
-    user_avg_prices = values[16:31]
-    sam_avg_price = values[31]
-    user_realized_profits = values[32:47]
-    sam_realized_profit = values[47]
-
-    with st.spinner('실시간 시세 및 차트 로딩 중... (약 15초 소요)'):
-        exchange_rate = get_current_exchange_rate()
-        
-        current_stock_assets = 0
-        total_today_profit = 0
-        total_prev_asset = input_cash 
-        total_prev2_asset = input_cash 
-        stock_data_cache = [] 
-        
-        cat_cur = {"US": 0, "KR": 0, "ETF": 0}
-        cat_prev = {"US": 0, "KR": 0, "ETF": 0}
-        cat_prev2 = {"US": 0, "KR": 0, "ETF": 0}
-
-        # 삼성전자 계산
-        sam_price, sam_change, sam_prev, sam_prev_change, sam_d2 = get_real_price_and_change(SAMSUNG_TICKER, "KR")
-        sam_amt = sam_price * SAMSUNG_QTY
-        sam_profit_today = sam_amt - (sam_prev * SAMSUNG_QTY)
-        current_stock_assets += sam_amt
-        total_today_profit += sam_profit_today
-        total_prev_asset += (sam_prev * SAMSUNG_QTY)
-        total_prev2_asset += (sam_d2 * SAMSUNG_QTY)
-        cat_cur["KR"] += sam_amt
-        cat_prev["KR"] += (sam_prev * SAMSUNG_QTY)
-        cat_prev2["KR"] += (sam_d2 * SAMSUNG_QTY)
-        
-        sam_unreal_p = (sam_price - sam_avg_price) * SAMSUNG_QTY if sam_avg_price > 0 else 0
-        sam_tot_p = sam_realized_profit + sam_unreal_p
-        sam_actual_avg_p = sam_avg_price - (sam_realized_profit / SAMSUNG_QTY) if SAMSUNG_QTY > 0 else sam_avg_price
-        sam_principal = sam_amt - sam_tot_p
-        sam_return_pct = ((sam_price - sam_actual_avg_p) / sam_actual_avg_p * 100) if sam_actual_avg_p > 0 else 0
-
-        # 나머지 15개 종목 순회
-        for i, p in enumerate(all_stocks):
-            price, change_pct, prev_close, prev_change_pct, d2_close = get_real_price_and_change(p['ticker'], p['country'])
-            if p['country'] == "US":
-                price_krw = price * exchange_rate
-                price_usd = price
-                prev_amt_krw = prev_close * exchange_rate * user_holdings[i]
-                prev2_amt_krw = d2_close * exchange_rate * user_holdings[i]
-            else:
-                price_krw = price
-                price_usd = 0
-                prev_amt_krw = prev_close * user_holdings[i]
-                prev2_amt_krw = d2_close * user_holdings[i]
-            
-            my_qty = user_holdings[i]
-            my_amt = my_qty * price_krw
-            today_profit = my_amt - prev_amt_krw
-            
-            avg_p = user_avg_prices[i]
-            real_p = user_realized_profits[i]
-            
-            unreal_p = (price_krw - avg_p) * my_qty if avg_p > 0 else 0
-            tot_p = real_p + unreal_p
-            actual_avg_p = avg_p - (real_p / my_qty) if my_qty > 0 else avg_p
-            principal = my_amt - tot_p
-            return_pct = ((price_krw - actual_avg_p) / actual_avg_p * 100) if actual_avg_p > 0 else 0
-
-            current_stock_assets += my_amt
-            total_today_profit += today_profit
-            total_prev_asset += prev_amt_krw
-            total_prev2_asset += prev2_amt_krw
-            
-            if i < 5:
-                cat_cur["ETF"] += my_amt
-                cat_prev["ETF"] += prev_amt_krw
-                cat_prev2["ETF"] += prev2_amt_krw
-                cat_label = "현금성"
-            elif p['country'] == 'US':
-                cat_cur["US"] += my_amt
-                cat_prev["US"] += prev_amt_krw
-                cat_prev2["US"] += prev2_amt_krw
-                cat_label = "미장"
-            else:
-                cat_cur["KR"] += my_amt
-                cat_prev["KR"] += prev_amt_krw
-                cat_prev2["KR"] += prev2_amt_krw
-                cat_label = "국장"
-            
-            stock_data_cache.append({
-                "price_krw": price_krw, "price_usd": price_usd, "my_amt": my_amt, 
-                "change_pct": change_pct, "today_profit": today_profit, "prev_change_pct": prev_change_pct,
-                "avg_p": avg_p, "actual_avg_p": actual_avg_p, "real_p": real_p, 
-                "unreal_p": unreal_p, "tot_p": tot_p, "principal": principal, 
-                "return_pct": return_pct, "cat_label": cat_label
-            })
-
-        total_asset = current_stock_assets + input_cash
-        total_daily_return_pct = (total_today_profit / total_prev_asset) * 100 if total_prev_asset > 0 else 0
-        total_d1_change_pct = ((total_prev_asset - total_prev2_asset) / total_prev2_asset) * 100 if total_prev2_asset > 0 else 0
+
+    # 프로파일러(cProfile/pyinstrument)는 이번 분석 한 번만 켠다 (st.stop() 으로 빠져나가도 with 가 끈다)
+    capture = st.session_state.get("profile_capture", CAPTURE_MODES[0])
+    st.session_state.profile_capture = CAPTURE_MODES[0]
+
+    with begin_run("execute", capture) as prof, st.spinner('실시간 시세 및 차트 로딩 중...'):
+        with stage("quotes"): snapshot = MARKET.snapshot(PORTFOLIO, fx_fallback=get_current_exchange_rate)
+        with stage("evaluate"): ev = evaluate(PORTFOLIO, snapshot, pf_input)
+        total_asset = ev.total_asset
 
         if total_asset == 0:
             st.error("총 자산이 0원입니다.")
+            fill_fx_header(fx_slot, fx_future)
             st.stop()
 
         if "script.google.com" in WEB_APP_URL:
-            try: requests.post(WEB_APP_URL, data={"date": now.strftime("%Y-%m-%d"), "asset": int(total_asset)})
-            except: pass
-
-        tickers = [p['ticker'] for p in all_stocks] + ["KRW=X", SAMSUNG_TICKER]
-        df_hist = yf.download(tickers, period="3y", progress=False)
-
-        st.session_state.total_asset = total_asset
-        st.session_state.rebalance_budget = total_asset - sam_amt
-        st.session_state.total_today_profit = total_today_profit
-        st.session_state.total_daily_return_pct = total_daily_return_pct
-        st.session_state.total_d1_change_pct = total_d1_change_pct
-        st.session_state.exc_rate = exchange_rate
-        
-        st.session_state.sam_amt = sam_amt
-        st.session_state.sam_price = sam_price
-        st.session_state.sam_change = sam_change
-        st.session_state.sam_profit = sam_profit_today
-        st.session_state.sam_prev_change = sam_prev_change
-        st.session_state.sam_avg_price = sam_avg_price
-        st.session_state.sam_actual_avg_p = sam_actual_avg_p
-        st.session_state.sam_real_p = sam_realized_profit
-        st.session_state.sam_unreal_p = sam_unreal_p
-        st.session_state.sam_tot_p = sam_tot_p
-        st.session_state.sam_principal = sam_principal
-        st.session_state.sam_return_pct = sam_return_pct
-
-        st.session_state.stock_data_cache = stock_data_cache
-        st.session_state.user_holdings = user_holdings
-        st.session_state.input_cash = input_cash
-        st.session_state.cat_stats = {
-            "US": cat_cur["US"], "US_P": cat_prev["US"], "US_P2": cat_prev2["US"],
-            "KR": cat_cur["KR"], "KR_P": cat_prev["KR"], "KR_P2": cat_prev2["KR"],
-            "ETF": cat_cur["ETF"], "ETF_P": cat_prev["ETF"], "ETF_P2": cat_prev2["ETF"]
-        }
-        st.session_state.df_hist = df_hist
+            get_sheet_writer(WEB_APP_URL).enqueue({"date": now.strftime("%Y-%m-%d"), "asset": int(total_asset)})
+
+        # 시트에 실제로 기록해 온 날짜별 총자산 (조건부 요청, 바뀐 줄만 캐시에 더함). 못 받으면 캐시에 있는 만큼만
+        recorded = None
+        if SHEET_CSV_URL.startswith("http"):
+            with stage("sheet"):
+                try: recorded = get_sheet_reader(SHEET_CSV_URL).history()
+                except: pass
+
+        tickers = list(PORTFOLIO.tickers) + ["KRW=X"] + ([PORTFOLIO.benchmark] if PORTFOLIO.benchmark else [])
+        with stage("history"):
+            try: df_hist = MARKET.history(tickers, years=3)
+            except: df_hist = PriceHistory.from_frame(yf.download(tickers, period="3y", progress=False), tickers)
+
+        # 차트용 보유 이력: 이번에 거래내역을 넣었으면 그 변화, 아니면 이 보유자(주소의 holder)가 "오늘 보유 저장" 으로 남긴 일별 스냅샷
+        with stage("timeline"):
+            holder = st.query_params.get("holder")
+            if save_btn and book is not None:
+                st.session_state.snapshot_note = "※ 거래내역을 넣으면 보유 이력은 거래내역으로 계산하므로 스냅샷은 저장하지 않았습니다."
+            elif save_btn:
+                if not holder: holder = st.query_params["holder"] = uuid.uuid4().hex[:16]
+                record_snapshot(PORTFOLIO, pf_input, holder)
+                st.session_state.snapshot_note = f"✅ 오늘 보유를 저장했습니다. 이 주소(holder={holder})로 다시 열면 저장한 이력을 이어서 씁니다."
+            if book is not None: timeline = from_changes(PORTFOLIO, book.change_rows(), "ledger")
+            else: timeline = from_changes(PORTFOLIO, snapshot_changes(holder) if holder else [], "snapshots")
+
+        st.session_state.update(session_values(PORTFOLIO, ev), table_memo={})
+        st.session_state.holdings_timeline = timeline
+        st.session_state.recorded_assets = recorded
+        st.session_state.df_hist = df_hist      # 서비스가 들고 있는 공유 PriceHistory 를 가리킬 뿐 (세션마다 복사하지 않음)
+        st.session_state.chart_fingerprint = hashlib.sha1(repr((
+            ev.qty.tolist(), ev.cash, ev.total_asset, df_hist.shape, str(df_hist.index[-1]) if len(df_hist) else "", timeline.fingerprint(),
+            None if recorded is None else (len(recorded), hash(recorded.to_numpy().tobytes()))
+        )).encode()).hexdigest()
+        st.session_state.failed_tickers = list(snapshot.failed)
+        st.session_state.pf_input = pf_input
+        st.session_state.live_quotes = (snapshot.quotes.tobytes(), snapshot.exchange_rate)
+        st.session_state.live_updated_at = time.time()
         st.session_state.analyzed = True
+        st.session_state.profile_runs["execute"] = prof.end().to_dict()
         st.rerun()
 
 # ==========================================
 # 5. 화면 출력부 및 공통 설정
 # ==========================================
 
-# 표 정렬을 위한 Styler 파이프라인 함수 (수정됨: DataFrame 추출 오류 수정)
-def apply_alignments(styler):
-    df = styler.data
-    text_cols = [c for c in df.columns if c in ["실행", "종목", "구분"]]
-    num_cols = [c for c in df.columns if c not in text_cols]
-    
-    styler.set_table_styles([dict(selector='th', props=[('text-align', 'center')])], overwrite=False)
-    if text_cols:
-        styler.set_properties(subset=text_cols, **{'text-align': 'center'})
-    if num_cols:
-        styler.set_properties(subset=num_cols, **{'text-align': 'right'})
-    return styler
-
 # 너비 최적화 설정
 SHARED_COL_CONFIG = {
     "실행": st.column_config.TextColumn("실행", width=90),
@@ -361,621 +299,349 @@ SHARED_COL_CONFIG = {
     "수익률(%)": st.column_config.TextColumn("수익률(%)", width=85),
 }
 
-def fmt_pnl(val):
-    if val > 0: return f"▲ ₩{val:,.0f}"
-    elif val < 0: return f"▼ ₩{abs(val):,.0f}"
-    return "₩0"
-
-def fmt_pct(val):
-    if val > 0: return f"▲ {val:.2f}%"
-    elif val < 0: return f"▼ {abs(val):.2f}%"
-    return "0.00%"
-
-if st.session_state.analyzed:
-    action_placeholder = st.empty()
-    st.success(f"**📊 현재 포트폴리오 총 자산:** ₩{st.session_state.total_asset:,.0f}")
-    
-    st.write("🔍 **종목 필터링 (아래 리밸런싱 표에만 적용됩니다)**")
-    col_f1, col_f2, col_f3, col_f4 = st.columns(4)
-    if col_f1.button("📋 전체 보기", use_container_width=True): st.session_state.filter_by = "전체"
-    if col_f2.button("🇰🇷 국장", use_container_width=True): st.session_state.filter_by = "국장"
-    if col_f3.button("🌎 미장", use_container_width=True): st.session_state.filter_by = "미장"
-    if col_f4.button("🛡️ 현금성(ETF)", use_container_width=True): st.session_state.filter_by = "현금성"
-    
-    st.write("↕️ **정렬 기준 선택**")
-    col_btn1, col_btn2, col_btn3, _ = st.columns([2.5, 2.5, 2.5, 2.5])
-    if col_btn1.button("💰 실제금액 내림차순", use_container_width=True): st.session_state.sort_by = "실제금액숫자"
-    if col_btn2.button("📈 등락률 내림차순", use_container_width=True): st.session_state.sort_by = "등락률숫자"
-    if col_btn3.button("💸 오늘수익 내림차순", use_container_width=True): st.session_state.sort_by = "오늘수익숫자"
-
-    # --- 5-1. 개별 종목표 데이터 구성 ---
-    stock_rows = []
-    pnl_rows = [] 
-    actions_needed = [] 
-    total_buy_cost = 0
-    
-    reb_budget = st.session_state.rebalance_budget
-    budget_invest = reb_budget * 0.65
-    exc_rate = st.session_state.exc_rate
-
-    sam_change_str = f"▲ {st.session_state.sam_change:.2f}%" if st.session_state.sam_change > 0 else (f"▼ {abs(st.session_state.sam_change):.2f}%" if st.session_state.sam_change < 0 else "-")
-    sam_prev_change_str = f"▲ {st.session_state.sam_prev_change:.2f}%" if st.session_state.sam_prev_change > 0 else (f"▼ {abs(st.session_state.sam_prev_change):.2f}%" if st.session_state.sam_prev_change < 0 else "-")
-    sam_profit_str = f"▲ ₩{st.session_state.sam_profit:,.0f}" if st.session_state.sam_profit > 0 else (f"▼ ₩{abs(st.session_state.sam_profit):,.0f}" if st.session_state.sam_profit < 0 else "₩0")
-    
-    sam_actual_ratio_num = (st.session_state.sam_amt / st.session_state.total_asset) if st.session_state.total_asset > 0 else 0.0
-
-    stock_rows.append({
-        "실행": "매매불가",
-        "종목": get_brand("삼성전자")["name"], "현재가($)": "-", "현재가(₩)": f"₩{st.session_state.sam_price:,.0f}", 
-        "D-1": sam_prev_change_str, "등락률": sam_change_str, "오늘수익": sam_profit_str,
-        "목표비중": "-", "실제비중": f"{sam_actual_ratio_num:.1%}",
-        "목표금액": "-", "실제금액": f"₩{st.session_state.sam_amt:,.0f}",
-        "목표수량": "-", "내보유": str(SAMSUNG_QTY),
-        "등락률숫자": st.session_state.sam_change, "실제금액숫자": st.session_state.sam_amt, "오늘수익숫자": st.session_state.sam_profit,
-        "목표비중숫자": 0.0, "실제비중숫자": sam_actual_ratio_num, "목표금액숫자": 0.0,
-        "카테고리": "국장" 
-    })
-    
-    pnl_rows.append({
-        "카테고리": "국장",
-        "종목": get_brand("삼성전자")["name"],
-        "현재가": f"₩{st.session_state.sam_price:,.0f}",
-        "실제평단가": f"₩{st.session_state.sam_actual_avg_p:,.0f}",
-        "실현수익": fmt_pnl(st.session_state.sam_real_p),
-        "미실현수익": fmt_pnl(st.session_state.sam_unreal_p),
-        "총수익": fmt_pnl(st.session_state.sam_tot_p),
-        "실제금액": f"₩{st.session_state.sam_amt:,.0f}",
-        "원금(투입분)": f"₩{st.session_state.sam_principal:,.0f}",
-        "수익률(%)": fmt_pct(st.session_state.sam_return_pct),
-        "수익률숫자": st.session_state.sam_return_pct,
-        "real_num": st.session_state.sam_real_p,
-        "unreal_num": st.session_state.sam_unreal_p,
-        "tot_num": st.session_state.sam_tot_p,
-        "prin_num": st.session_state.sam_principal,
-        "amt_num": st.session_state.sam_amt
-    })
-
-    for i, p in enumerate(all_stocks):
-        cached = st.session_state.stock_data_cache[i]
-        price_krw = cached['price_krw']
-        price_usd = cached['price_usd']
-        my_amt = cached['my_amt']
-        change_pct = cached['change_pct']
-        prev_change_pct = cached['prev_change_pct']
-        today_profit = cached['today_profit']
-        my_qty = st.session_state.user_holdings[i]
-
-        if i < 5: 
-            exact_target_cost = reb_budget * p['ratio']
-            target_ratio_num = p['ratio']
-            category = "현금성"
-        else: 
-            exact_target_cost = budget_invest * p['ratio']
-            target_ratio_num = 0.63 * p['ratio']
-            category = "미장" if p['country'] == 'US' else "국장"
-
-        display_target_ratio = f"{target_ratio_num:.1%}"
-
-        if price_krw > 0: target_qty = round(exact_target_cost / price_krw)
-        else: target_qty = 0
-        total_buy_cost += (target_qty * price_krw)
-        
-        actual_ratio_num = my_amt / st.session_state.total_asset if st.session_state.total_asset > 0 else 0.0
-        current_ratio = f"{actual_ratio_num:.1%}"
-        
-        diff = target_qty - my_qty
-        raw_name = p['name'] 
-        if diff > 0: 
-            action = f"{int(diff)}주 매수"
-            actions_needed.append(f"**{raw_name}** <span style='color:#2E7D32; font-weight:bold;'>🟢 {int(diff)}주 매수</span>")
-        elif diff < 0: 
-            action = f"{int(abs(diff))}주 매도"
-            actions_needed.append(f"**{raw_name}** <span style='color:#D32F2F; font-weight:bold;'>🔴 {int(abs(diff))}주 매도</span>")
-        else: 
-            action = "유지"
-
-        price_display = f"${price_usd:,.2f}" if p['country'] == "US" else "-"
-        change_str = f"▲ {change_pct:.2f}%" if change_pct > 0 else (f"▼ {abs(change_pct):.2f}%" if change_pct < 0 else "-")
-        prev_change_str = f"▲ {prev_change_pct:.2f}%" if prev_change_pct > 0 else (f"▼ {abs(prev_change_pct):.2f}%" if prev_change_pct < 0 else "-")
-        profit_str = f"▲ ₩{today_profit:,.0f}" if today_profit > 0 else (f"▼ ₩{abs(today_profit):,.0f}" if today_profit < 0 else "₩0")
-
-        stock_rows.append({
-            "실행": action,
-            "종목": get_brand(p['name'])["name"], "현재가($)": price_display, "현재가(₩)": f"₩{price_krw:,.0f}", 
-            "D-1": prev_change_str, "등락률": change_str, "오늘수익": profit_str,
-            "목표비중": display_target_ratio, "실제비중": current_ratio,
-            "목표금액": f"₩{exact_target_cost:,.0f}", "실제금액": f"₩{my_amt:,.0f}",
-            "목표수량": str(int(target_qty)), "내보유": str(int(my_qty)),
-            "등락률숫자": change_pct, "실제금액숫자": my_amt, "오늘수익숫자": today_profit,
-            "목표비중숫자": target_ratio_num, "실제비중숫자": actual_ratio_num, "목표금액숫자": exact_target_cost,
-            "카테고리": category
-        })
-        
-        if category in ["미장", "현금성"]:
-            cur_price_str = f"${price_usd:,.2f}"
-            act_avg_usd = cached['actual_avg_p'] / exc_rate if exc_rate > 0 else 0
-            act_avg_str = f"${act_avg_usd:,.2f}"
-        else:
-            cur_price_str = f"₩{price_krw:,.0f}"
-            act_avg_str = f"₩{cached['actual_avg_p']:,.0f}"
-
-        pnl_rows.append({
-            "카테고리": category,
-            "종목": get_brand(p['name'])["name"],
-            "현재가": cur_price_str,
-            "실제평단가": act_avg_str,
-            "실현수익": fmt_pnl(cached['real_p']),
-            "미실현수익": fmt_pnl(cached['unreal_p']),
-            "총수익": fmt_pnl(cached['tot_p']),
-            "실제금액": f"₩{cached['my_amt']:,.0f}",
-            "원금(투입분)": f"₩{cached['principal']:,.0f}",
-            "수익률(%)": fmt_pct(cached['return_pct']),
-            "수익률숫자": cached['return_pct'],
-            "real_num": cached['real_p'],
-            "unreal_num": cached['unreal_p'],
-            "tot_num": cached['tot_p'],
-            "prin_num": cached['principal'],
-            "amt_num": cached['my_amt']
-        })
-
-    # --- 최상단 알림(Placeholder) 업데이트 ---
-    if actions_needed:
-        summary_html = f"""
-        <div style='background-color: #FFFDE7; padding: 15px; border-radius: 8px; border: 2px solid #FBC02D; margin-bottom: 20px;'>
-            <h5 style='margin-top: 0; color: #F57F17; margin-bottom: 10px;'>🛒 필요 매수/매도 요약</h5>
-            <div style='font-size: 15px;'>{' &nbsp;|&nbsp; '.join(actions_needed)}</div>
-        </div>
-        """
-        action_placeholder.markdown(summary_html, unsafe_allow_html=True)
-    else:
-        summary_html = """
-        <div style='background-color: #F1F8E9; padding: 15px; border-radius: 8px; border: 2px solid #66BB6A; margin-bottom: 20px;'>
-            <h5 style='margin-top: 0; color: #2E7D32; margin-bottom: 0;'>🟢 매수/매도 신호 없음 (현재 목표 비중 완벽 유지중)</h5>
-        </div>
-        """
-        action_placeholder.markdown(summary_html, unsafe_allow_html=True)
-
-    # [리밸런싱 뷰] 데이터프레임
-    df_stocks = pd.DataFrame(stock_rows)
-    if st.session_state.filter_by != "전체":
-        df_stocks = df_stocks[df_stocks['카테고리'] == st.session_state.filter_by]
-    
-    sum_actual_amt = df_stocks['실제금액숫자'].sum()
-    sum_today_profit = df_stocks['오늘수익숫자'].sum()
-    sum_target_ratio = df_stocks['목표비중숫자'].sum()
-    sum_actual_ratio = df_stocks['실제비중숫자'].sum()
-    sum_target_amt = df_stocks['목표금액숫자'].sum()
-
-    prof_str = f"▲ ₩{sum_today_profit:,.0f}" if sum_today_profit > 0 else (f"▼ ₩{abs(sum_today_profit):,.0f}" if sum_today_profit < 0 else "₩0")
-    
-    summary_row = {
-        "실행": "-", "종목": f"📊 [{st.session_state.filter_by}] 요약",
-        "현재가($)": "-", "현재가(₩)": "-", "D-1": "-", "등락률": "-",
-        "오늘수익": prof_str,
-        "목표비중": f"{sum_target_ratio:.1%}",
-        "실제비중": f"{sum_actual_ratio:.1%}",
-        "목표금액": f"₩{sum_target_amt:,.0f}",
-        "실제금액": f"₩{sum_actual_amt:,.0f}",
-        "목표수량": "-", "내보유": "-"
-    }
-
-    df_stocks = df_stocks.sort_values(by=st.session_state.sort_by, ascending=False).drop(columns=['등락률숫자', '실제금액숫자', '오늘수익숫자', '목표비중숫자', '실제비중숫자', '목표금액숫자', '카테고리'])
-    df_stocks = pd.concat([df_stocks, pd.DataFrame([summary_row])], ignore_index=True)
-    
-    # [상세 손익 뷰] 카테고리별 정렬 및 요약행 삽입
-    cat_summary = {"국장": {"real":0, "unreal":0, "tot":0, "prin":0, "amt":0},
-                   "미장": {"real":0, "unreal":0, "tot":0, "prin":0, "amt":0},
-                   "현금성": {"real":0, "unreal":0, "tot":0, "prin":0, "amt":0}}
-                   
-    for row in pnl_rows:
-        c = row['카테고리']
-        cat_summary[c]["real"] += row["real_num"]
-        cat_summary[c]["unreal"] += row["unreal_num"]
-        cat_summary[c]["tot"] += row["tot_num"]
-        cat_summary[c]["prin"] += row["prin_num"]
-        cat_summary[c]["amt"] += row["amt_num"]
-        
-    combined_pnl_rows = []
-    for cat in ["국장", "미장", "현금성"]:
-        cat_items = [row for row in pnl_rows if row["카테고리"] == cat]
-        cat_items.sort(key=lambda x: x["수익률숫자"], reverse=True)
-        
-        for item in cat_items:
-            del item["수익률숫자"]
-            del item["real_num"]
-            del item["unreal_num"]
-            del item["tot_num"]
-            del item["prin_num"]
-            del item["amt_num"]
-            combined_pnl_rows.append(item)
-            
-        s = cat_summary[cat]
-        pct = (s["tot"] / s["prin"] * 100) if s["prin"] > 0 else 0
-        combined_pnl_rows.append({
-            "종목": f"📊 [{cat}] 요약",
-            "현재가": "-", "실제평단가": "-",
-            "실현수익": fmt_pnl(s['real']),
-            "미실현수익": fmt_pnl(s['unreal']),
-            "총수익": fmt_pnl(s['tot']),
-            "실제금액": f"₩{s['amt']:,.0f}",
-            "원금(투입분)": f"₩{s['prin']:,.0f}",
-            "수익률(%)": fmt_pct(pct)
-        })
-        
-    tot_s = {k: sum(cat_summary[cat][k] for cat in ["국장", "미장", "현금성"]) for k in ["real", "unreal", "tot", "prin", "amt"]}
-    tot_pct = (tot_s["tot"] / tot_s["prin"] * 100) if tot_s["prin"] > 0 else 0
-    combined_pnl_rows.append({
-        "종목": "📊 전체 자산 총합 요약",
-        "현재가": "-", "실제평단가": "-",
-        "실현수익": fmt_pnl(tot_s['real']),
-        "미실현수익": fmt_pnl(tot_s['unreal']),
-        "총수익": fmt_pnl(tot_s['tot']),
-        "실제금액": f"₩{tot_s['amt']:,.0f}",
-        "원금(투입분)": f"₩{tot_s['prin']:,.0f}",
-        "수익률(%)": fmt_pct(tot_pct)
-    })
-    
-    df_pnl = pd.DataFrame(combined_pnl_rows)
-    if '카테고리' in df_pnl.columns:
-        df_pnl = df_pnl.drop(columns=['카테고리'])
-
-    # --- 포트폴리오 자산군별 현황 요약표 ---
-    tgt_US = reb_budget * 0.65 * 0.735
-    tgt_KR_inv = reb_budget * 0.65 * 0.265
-    tgt_KR_tot = tgt_KR_inv + st.session_state.sam_amt
-    tgt_ETF = reb_budget * 0.16
-    tgt_Cash = reb_budget * 0.19
-    
-    sum_rows = []
-    target_data = [
-        ("US", "🌎 해외주식 총합", tgt_US),
-        ("KR", "🇰🇷 국내주식 총합", tgt_KR_tot),
-        ("ETF", "🛡️ 현금성ETF 총합", tgt_ETF)
-    ]
-    
-    for code, label, t_amt in target_data:
-        c_cur = st.session_state.cat_stats[code]
-        c_prev = st.session_state.cat_stats[code + "_P"]
-        c_prev2 = st.session_state.cat_stats[code + "_P2"]
-        
-        c_prof = c_cur - c_prev
-        c_pct = (c_prof / c_prev * 100) if c_prev > 0 else 0
-        c_d1_pct = ((c_prev - c_prev2) / c_prev2 * 100) if c_prev2 > 0 else 0
-
-        c_pct_str = f"▲ {c_pct:.2f}%" if c_pct > 0 else (f"▼ {abs(c_pct):.2f}%" if c_pct < 0 else "-")
-        c_d1_pct_str = f"▲ {c_d1_pct:.2f}%" if c_d1_pct > 0 else (f"▼ {abs(c_d1_pct):.2f}%" if c_d1_pct < 0 else "-")
-        c_prof_str = f"▲ ₩{c_prof:,.0f}" if c_prof > 0 else (f"▼ ₩{abs(c_prof):,.0f}" if c_prof < 0 else "₩0")
-        
-        sum_rows.append({
-            "종목": label, "D-1": c_d1_pct_str, "등락률": c_pct_str, "오늘수익": c_prof_str,
-            "목표비중": f"{(t_amt / st.session_state.total_asset):.1%}" if st.session_state.total_asset > 0 else "0%", 
-            "실제비중": f"{(c_cur / st.session_state.total_asset):.1%}",
-            "목표금액": f"₩{t_amt:,.0f}", "실제금액": f"₩{c_cur:,.0f}"
-        })
+render_prof = begin_run("render")
+try:
+    if st.session_state.analyzed:
+        action_placeholder = st.empty()
+        st.success(f"**📊 현재 포트폴리오 총 자산:** ₩{st.session_state.total_asset:,.0f}")
+        if st.session_state.get("failed_tickers"):
+            st.warning(f"⚠️ 시세 조회 실패: {', '.join(st.session_state.failed_tickers)} (해당 종목은 0원으로 계산되었습니다)")
+
+        # --- 실시간 자동 갱신: 장중에만 현재가/환율을 다시 받아 평가값만 바꾼다 (3년 이력·차트 원본은 그대로) ---
+        col_live, col_interval, col_status = st.columns([2, 3, 5])
+        live_on = col_live.toggle("⚡ 실시간 자동 갱신", key="live_mode")
+        live_sec = col_interval.select_slider("갱신 주기(초)", options=LIVE_INTERVALS, value=60, key="live_interval", disabled=not live_on)
+
+        @st.fragment(run_every=live_sec if live_on else None)
+        def live_refresh():
+            if not st.session_state.get("live_mode"): return
+            markets = open_markets(PORTFOLIO.countries)
+            if not markets:
+                opens = min(next_open(c) for c in set(PORTFOLIO.countries)).astimezone(kst)
+                st.caption(f"⏸️ 장 마감 — 다음 개장 {opens.strftime('%m/%d %H:%M')} (KST) 까지 갱신하지 않습니다")
+                return
+            # 방금 갱신해서 앱 전체를 다시 그린 실행이면 건너뛴다
+            if time.time() - st.session_state.get("live_updated_at", 0) >= live_sec - 1:
+                snapshot = MARKET.snapshot(PORTFOLIO, fx_fallback=get_current_exchange_rate)
+                st.session_state.live_updated_at = time.time()
+                live_key = (snapshot.quotes.tobytes(), snapshot.exchange_rate)
+                if live_key != st.session_state.get("live_quotes"):
+                    ev = evaluate(PORTFOLIO, snapshot, st.session_state.pf_input)
+                    st.session_state.update(session_values(PORTFOLIO, ev), table_memo={})
+                    st.session_state.failed_tickers = list(snapshot.failed)
+                    st.session_state.live_quotes = live_key
+                    st.rerun()
+            updated = datetime.fromtimestamp(st.session_state.live_updated_at, kst).strftime("%H:%M:%S")
+            st.caption(f"🟢 {'·'.join(markets)} 장중 — {live_sec}초마다 갱신 (마지막 {updated})")
+
+        with col_status: live_refresh()
     
-    sum_rows.append({
-        "종목": get_brand("예수금")["name"], "D-1": "-", "등락률": "-", "오늘수익": "-",
-        "목표비중": "19.0%", "실제비중": f"{(st.session_state.input_cash / st.session_state.total_asset):.1%}",
-        "목표금액": f"₩{tgt_Cash:,.0f}", "실제금액": f"₩{st.session_state.input_cash:,.0f}"
-    })
-
-    tot_pct_daily = st.session_state.total_daily_return_pct
-    tot_d1_pct = st.session_state.total_d1_change_pct
-    tot_prof_daily = st.session_state.total_today_profit
+        st.write("🔍 **종목 필터링 (아래 리밸런싱 표에만 적용됩니다)**")
+        filter_cols = st.columns(len(PORTFOLIO.categories) + 1)
+        if filter_cols[0].button("📋 전체 보기", use_container_width=True): st.session_state.filter_by = "전체"
+        for col_f, c in zip(filter_cols[1:], PORTFOLIO.categories):
+            if col_f.button(c.button, use_container_width=True): st.session_state.filter_by = c.name
     
-    tot_pct_str = f"▲ {tot_pct_daily:.2f}%" if tot_pct_daily > 0 else (f"▼ {abs(tot_pct_daily):.2f}%" if tot_pct_daily < 0 else "-")
-    tot_d1_pct_str = f"▲ {tot_d1_pct:.2f}%" if tot_d1_pct > 0 else (f"▼ {abs(tot_d1_pct):.2f}%" if tot_d1_pct < 0 else "-")
-    tot_profit_str = f"▲ ₩{tot_prof_daily:,.0f}" if tot_prof_daily > 0 else (f"▼ ₩{abs(tot_prof_daily):,.0f}" if tot_prof_daily < 0 else "₩0")
-    
-    sum_rows.append({
-        "종목": "📊 포트폴리오 총합", "D-1": tot_d1_pct_str, "등락률": tot_pct_str, "오늘수익": tot_profit_str,
-        "목표비중": "100.0%", "실제비중": "100.0%", "목표금액": f"₩{st.session_state.total_asset:,.0f}", "실제금액": f"₩{st.session_state.total_asset:,.0f}"
-    })
-    df_summary = pd.DataFrame(sum_rows)
-
-    # --- 표 렌더링 스타일 ---
-    def style_change_color(val):
-        val_str = str(val)
-        if '▲' in val_str: return 'background-color: #CCFFCC; color: #2E7D32; font-weight: bold;'
-        elif '▼' in val_str: return 'background-color: #FFD1DC; color: #C2185B; font-weight: bold;'
-        return ''
-
-    def style_d1_color(val):
-        val_str = str(val)
-        if '▲' in val_str: return 'color: #2E7D32; font-weight: bold;'
-        elif '▼' in val_str: return 'color: #C2185B; font-weight: bold;'
-        return ''
-
-    def style_text_color(val):
-        if '매수' in str(val): return 'color: #2E7D32; font-weight: bold;'  # 초록색
-        elif '매도' in str(val): return 'color: #D32F2F; font-weight: bold;' # 빨간색
-        return 'color: #757575;'
-
-    def style_profit_val(val):
-        val_str = str(val)
-        if '▲' in val_str: return 'color: #2E7D32; font-weight: bold;'
-        elif '▼' in val_str: return 'color: #C2185B; font-weight: bold;'
-        return ''
-
-    def style_stock_dataframe(row):
-        if '총합 요약' in str(row.get('종목', '')):
-            return ['background-color: #FFF59D; color: #212121; font-weight: bold; font-size: 15px;'] * len(row)
-        elif '요약' in str(row.get('종목', '')):
-            return ['background-color: #EEEEEE; font-weight: bold;'] * len(row)
-        return [''] * len(row)
-
-    def style_summary_dataframe(row):
-        col_name = '종목' if '종목' in row else '구분'
-        bg_color = 'white'
-        if '해외' in row[col_name] or '미장' in row[col_name]: bg_color = '#FCE4EC'
-        elif '국내' in row[col_name] or '국장' in row[col_name]: bg_color = '#E3F2FD'
-        elif 'ETF' in row[col_name] or '현금성' in row[col_name]: bg_color = '#FFF9C4'
-        elif '예수금' in row[col_name]: bg_color = '#F1F8E9' 
-        elif '전체' in row[col_name] or '총합' in row[col_name]: bg_color = '#EEEEEE'
-        return [f'background-color: {bg_color}'] * len(row)
-
-    st.subheader(f"📑 개별 종목 상세 리밸런싱 현황 (현재 필터: {st.session_state.filter_by})")
-    st.dataframe(
-        df_stocks.style.apply(style_stock_dataframe, axis=1)
-                 .map(style_text_color, subset=['실행'])
-                 .map(style_change_color, subset=['등락률', '오늘수익'])
-                 .map(style_d1_color, subset=['D-1'])
-                 .pipe(apply_alignments),
-        column_order=["실행", "종목", "현재가($)", "현재가(₩)", "D-1", "등락률", "오늘수익", "목표비중", "실제비중", "목표금액", "실제금액", "목표수량", "내보유"],
-        column_config=SHARED_COL_CONFIG,
-        hide_index=True, use_container_width=False, height=650 
-    )
-    
-    st.write("---")
-    st.subheader("📋 포트폴리오 자산군별 현황 요약 (이론적 목표비중 기준)")
-    st.dataframe(
-        df_summary.style.apply(style_summary_dataframe, axis=1)
-                  .map(style_change_color, subset=['등락률', '오늘수익'])
-                  .map(style_d1_color, subset=['D-1'])
-                  .pipe(apply_alignments),
-        column_order=["종목", "D-1", "등락률", "오늘수익", "목표비중", "실제비중", "목표금액", "실제금액"],
-        column_config=SHARED_COL_CONFIG,
-        hide_index=True, use_container_width=False, height=250 
-    )
-
-    st.write("---")
-    st.subheader("💰 종목별 손익 및 실제 평단가 현황 (카테고리별 수익률 정렬)")
-    st.caption("※ **실제평단가** = 평균단가 - (실현수익 / 보유수량) | **원금** = 현재가치 - 총수익")
-    st.dataframe(
-        df_pnl.style.apply(style_stock_dataframe, axis=1)
-              .map(style_profit_val, subset=['실현수익', '미실현수익', '총수익', '수익률(%)'])
-              .pipe(apply_alignments),
-        column_order=["종목", "현재가", "실제평단가", "실현수익", "미실현수익", "총수익", "실제금액", "원금(투입분)", "수익률(%)"],
-        column_config=SHARED_COL_CONFIG,
-        hide_index=True, use_container_width=False, height=750 
-    )
-
-    # ==========================================
-    # 6. 전문가 레이아웃 차트 구역
-    # ==========================================
-    st.write("---")
-    col_chart, col_pie = st.columns([6, 4])
+        st.write("↕️ **정렬 기준 선택**")
+        col_btn1, col_btn2, col_btn3, _ = st.columns([2.5, 2.5, 2.5, 2.5])
+        if col_btn1.button("💰 실제금액 내림차순", use_container_width=True): st.session_state.sort_by = "실제금액숫자"
+        if col_btn2.button("📈 등락률 내림차순", use_container_width=True): st.session_state.sort_by = "등락률숫자"
+        if col_btn3.button("💸 오늘수익 내림차순", use_container_width=True): st.session_state.sort_by = "오늘수익숫자"
+
+        # 표는 분석(시세 반영) 1회당 한 번 만들고, 필터/정렬 버튼은 미리 만든 행과 CSS 의 순서만 바꾼다
+        table_memo = st.session_state.setdefault("table_memo", {})
+        def table_memoized(key, build):
+            if key not in table_memo:
+                count("table_memo_miss")
+                table_memo[key] = build()
+            else:
+                count("table_memo_hit")
+            return table_memo[key]
+
+        with stage("table_build"):
+            holding_table = table_memoized("table", lambda: build_holding_table(PORTFOLIO, st.session_state))
+            filter_by, sort_by = st.session_state.filter_by, st.session_state.sort_by
+            stock_styler = table_memoized(("stock", filter_by, sort_by), lambda: style_stock_view(holding_table, filter_by, sort_by))
+            summary_styler = table_memoized("summary", lambda: style_summary_table(holding_table.summary))
+            pnl_styler = table_memoized("pnl", lambda: style_pnl_table(holding_table.pnl))
+        actions_needed = holding_table.actions
+        action_placeholder.markdown(action_summary_html(actions_needed), unsafe_allow_html=True)
+
+        st.subheader(f"📑 개별 종목 상세 리밸런싱 현황 (현재 필터: {st.session_state.filter_by})")
+        with stage("table_render"):
+            st.dataframe(
+                stock_styler,
+                column_order=STOCK_COLUMNS,
+                column_config=SHARED_COL_CONFIG,
+                hide_index=True, use_container_width=False, height=650 
+            )
+        fee_str = f" · 예상 수수료 ₩{st.session_state.trade_fees:,.0f}" if st.session_state.trade_fees > 0 else ""
+        plan_note = "목표비중과의 오차가 가장 작은 조합" if st.session_state.plan_exact else "탐색 한도 안에서 찾은 근사 조합"
+        st.caption(
+            f"※ 목표수량은 예산 안에서 전 종목을 함께 정수로 맞춘 값입니다 ({plan_note}). "
+            f"리밸런싱 후 예상 예수금 **₩{st.session_state.cash_after:,.0f}** (목표 ₩{st.session_state.rebalance_budget * PORTFOLIO.cash_share:,.0f}){fee_str}"
+        )
     
-    with col_chart:
-        st.subheader("📉 자산 성장 시뮬레이션 (3년)")
-        tab1, tab2, tab3, tab4 = st.tabs(["🕯️ 총자산 캔들형", "📊 층별 누적 영역형", "🇰🇷 국장 캔들형", "🌎 미장 캔들형"])
+        st.write("---")
+        st.subheader("📋 포트폴리오 자산군별 현황 요약 (이론적 목표비중 기준)")
+        with stage("table_render"):
+            st.dataframe(
+                summary_styler,
+                column_order=SUMMARY_COLUMNS,
+                column_config=SHARED_COL_CONFIG,
+                hide_index=True, use_container_width=False, height=250 
+            )
+
+        st.write("---")
+        st.subheader("💰 종목별 손익 및 실제 평단가 현황 (카테고리별 수익률 정렬)")
+        st.caption("※ **실제평단가** = 평균단가 - (실현수익 / 보유수량) | **원금** = 현재가치 - 총수익")
+        with stage("table_render"):
+            st.dataframe(
+                pnl_styler,
+                column_order=PNL_COLUMNS,
+                column_config=SHARED_COL_CONFIG,
+                hide_index=True, use_container_width=False, height=750 
+            )
+
+        # ==========================================
+        # 6. 전문가 레이아웃 차트 구역
+        # ==========================================
+        st.write("---")
+        col_chart, col_pie = st.columns([6, 4])
+
+        df_hist = st.session_state.df_hist
+
+        # 선택된 차트(와 리스크 지표)만 만들고, 같은 보유/시세 지문(fingerprint) 동안은 만든 결과를 재사용
+        chart_memo = st.session_state.setdefault("chart_memo", {})
+        if chart_memo.get("fingerprint") != st.session_state.chart_fingerprint:
+            chart_memo.clear()
+            chart_memo["fingerprint"] = st.session_state.chart_fingerprint
+
+        def memoized(key, build):
+            if key not in chart_memo:
+                count("chart_memo_miss")
+                chart_memo[key] = build()
+            else: count("chart_memo_hit")
+            return chart_memo[key]
+
+        def gridlines():
+            return memoized("month_starts", lambda: month_starts(df_hist.index))
+
+        def current_valuation():
+            """현재 보유수량·예수금을 3년 내내 들고 있었다고 본 평가금액 (리스크 지표용)"""
+            return memoized("current_valuation", lambda: value_holdings(PORTFOLIO, df_hist, st.session_state.user_holdings, st.session_state.input_cash))
+
+        def valuation():
+            """차트용 평가금액: 보유 이력이 있으면 날짜마다 그날의 수량·예수금으로"""
+            timeline = st.session_state.get("holdings_timeline")
+            if timeline is None or len(timeline) == 0: return current_valuation()
+            def build():
+                qty, cash = timeline.step_matrix(df_hist.index, st.session_state.user_holdings, st.session_state.input_cash)
+                return value_holdings(PORTFOLIO, df_hist, qty, cash)
+            return memoized("valuation", build)
+
+        with col_chart:
+            st.subheader("📉 자산 성장 시뮬레이션 (3년)")
+            chart_views = ["🕯️ 총자산 캔들형", "📊 층별 누적 영역형", "🇰🇷 국장 캔들형", "🌎 미장 캔들형", "🔮 미래 전망"]
+            chart_view = st.radio("차트 종류", chart_views, horizontal=True, label_visibility="collapsed", key="chart_view")
+            candle_parts = {chart_views[0]: "total", chart_views[2]: "KR", chart_views[3]: "US"}
+            memo_key, chart_range = chart_view, None
+            if chart_view in candle_parts:
+                chart_range = st.radio("표시 구간", list(CHART_RANGES), horizontal=True, label_visibility="collapsed", key="chart_range")
+                memo_key = (chart_view, chart_range)
+            if chart_view == chart_views[4]:
+                col_years, col_paths, col_method = st.columns(3)
+                mc_years = col_years.select_slider("전망 기간(년)", options=[1, 2, 3], value=1, key="mc_years")
+                mc_paths = col_paths.select_slider("경로 수", options=PROJECTION_PATHS, value=20000, key="mc_paths")
+                mc_method = col_method.radio("수익률 모형", METHODS, format_func=PROJECTION_METHODS.get, horizontal=True, key="mc_method")
+                memo_key = (chart_view, mc_years, mc_paths, mc_method)
         
-        try:
-            df_hist = st.session_state.df_hist
-            first_days_month = [group.index[0] for _, group in df_hist.groupby([df_hist.index.year, df_hist.index.month])]
-            first_days_year = [group.index[0] for _, group in df_hist.groupby(df_hist.index.year)]
-
-            def create_candle_fig(O_series, H_series, L_series, C_series, name, real_time_val):
-                if len(C_series) > 0:
-                    C_series.iloc[-1] = real_time_val
-                    if H_series.iloc[-1] < real_time_val: H_series.iloc[-1] = real_time_val
-                    if L_series.iloc[-1] > real_time_val: L_series.iloc[-1] = real_time_val
-
-                ath_val = H_series.max()
-                ath_date = H_series.idxmax()
-                last_date = C_series.index[-1]
-                zoom_start = last_date - pd.Timedelta(days=90)
-                
-                mask = (C_series.index >= zoom_start)
-                if mask.any():
-                    low_3m_val = L_series[mask].min()
-                    low_3m_date = L_series[mask].idxmin()
+            try:
+                def pyramid(part):
+                    """part 일봉 위의 주봉/월봉. 세션에 두고 보유/일봉이 바뀔 때 양 끝 구간만 다시 묶는다."""
+                    pyramids = st.session_state.setdefault("ohlc_pyramids", {})
+                    return memoized(("pyramid", part), lambda: pyramids.setdefault(part, OhlcPyramid()).update(valuation()[part]))
+
+                def candle_view(part):
+                    """(해상도, 보낼 봉) — 보이는 구간에 맞는 해상도를 그 구간의 PAN_FACTOR 배만큼"""
+                    return memoized(("candles", part, chart_range), lambda: pyramid(part).view(CHART_RANGES[chart_range]))
+
+                recorded = st.session_state.get("recorded_assets")
+
+                def build_candle(part, name, real_time_val):
+                    candles = candle_view(part)[1]
+                    fig = candle_figure(valuation()[part], name, real_time_val, gridlines(), candles, CHART_RANGES[chart_range])
+                    return add_recorded_line(fig, recorded, candles.index[0]) if part == "total" and len(candles) else fig
+
+                def build_area_fig():
+                    fig = area_figure(PORTFOLIO, valuation(), valuation()["cash"], st.session_state.total_asset, gridlines())
+                    return add_recorded_line(fig, recorded, df_hist.index[0]) if len(df_hist) else fig
+
+                def build_projection():
+                    with stage("projection"):
+                        amounts = [row["my_amt"] for row in st.session_state.stock_data_cache]
+                        fan = project(PORTFOLIO, df_hist, amounts, st.session_state.input_cash, mc_years, mc_paths, mc_method)
+                    if fan is None: return None                  # 평가액이 0 이하이거나 과거 수익률이 부족함
+                    return projection_figure(valuation()["total"]["Close"], fan, st.session_state.total_asset)
+
+                # 실시간 갱신 후에도 과거 봉은 그대로 두고 마지막 봉/현재가 표시만 바꾼다
+                chart_live = {
+                    chart_views[0]: (lambda: candle_view("total")[1], st.session_state.total_asset),
+                    chart_views[1]: (lambda: valuation()["total"], st.session_state.total_asset),
+                    chart_views[2]: (lambda: candle_view("KR")[1], st.session_state.market_stats["KR"]),
+                    chart_views[3]: (lambda: candle_view("US")[1], st.session_state.market_stats["US"]),
+                    chart_views[4]: (lambda: valuation()["total"], st.session_state.total_asset),
+                }
+                chart_builders = {
+                    chart_views[0]: lambda: build_candle("total", '총자산 캔들', st.session_state.total_asset),
+                    chart_views[1]: build_area_fig,
+                    chart_views[2]: lambda: build_candle("KR", '국장 캔들', st.session_state.market_stats["KR"]),
+                    chart_views[3]: lambda: build_candle("US", '미장 캔들', st.session_state.market_stats["US"]),
+                    chart_views[4]: build_projection,
+                }
+                with stage("chart_build"):
+                    fig = memoized(memo_key, chart_builders[chart_view])
+                    live_frame, real_time_val = chart_live[chart_view]
+                    if fig is not None: set_last_value(fig, live_frame(), real_time_val)
+                if fig is None:
+                    st.info("평가액이 0 이하이거나 과거 수익률이 부족해 미래 전망을 계산할 수 없습니다.")
                 else:
-                    low_3m_val = L_series.min()
-                    low_3m_date = L_series.idxmin()
-
-                curr_val = C_series.iloc[-1]
-                curr_date = C_series.index[-1]
-
-                fig = go.Figure(data=[go.Candlestick(x=C_series.index,
-                                open=O_series.values, high=H_series.values,
-                                low=L_series.values, close=C_series.values, name=name)])
-                
-                fig.add_hline(y=ath_val, line_dash="dash", line_color="gray", opacity=0.7)
-                fig.add_hline(y=low_3m_val, line_dash="dash", line_color="gray", opacity=0.7)
-                fig.add_hline(y=curr_val, line_dash="dash", line_color="red", opacity=0.7)
-
-                fig.add_annotation(x=ath_date, y=ath_val, text=f"📅 {ath_date.strftime('%y년 %m월 %d일')}<br>🚩 전고점: ₩{ath_val/10000:,.0f}만", showarrow=True, arrowhead=1, ax=0, ay=-45, bgcolor="white", bordercolor="gray")
-                fig.add_annotation(x=low_3m_date, y=low_3m_val, text=f"📅 {low_3m_date.strftime('%y년 %m월 %d일')}<br>📉 3개월 저점: ₩{low_3m_val/10000:,.0f}만", showarrow=True, arrowhead=1, ax=0, ay=45, bgcolor="white", bordercolor="gray")
-                fig.add_annotation(x=curr_date, y=curr_val, text=f"🔴 현재가: ₩{curr_val/10000:,.0f}만", showarrow=True, arrowhead=1, ax=70, ay=0, bgcolor="white", bordercolor="red", xanchor="left")
-
-                fig.update_yaxes(tickformat=",.0f", autorange=True, fixedrange=False) 
-                fig.update_xaxes(tickformat="%Y년 %m월 %d일", hoverformat="%Y년 %m월 %d일", rangeslider_visible=True, rangebreaks=[dict(bounds=["sat", "mon"])]) 
-                fig.update_layout(xaxis_range=[zoom_start, last_date + pd.Timedelta(days=15)], margin=dict(l=0, r=0, t=30, b=0), height=500)
-                
-                for d in first_days_month: 
-                    if d in first_days_year:
-                        fig.add_vline(x=d, line_dash="solid", line_color="black", line_width=1.5, opacity=0.8)
-                    else:
-                        fig.add_vline(x=d, line_dash="dot", line_color="rgba(150,150,150,0.5)", line_width=1)
-                
-                return fig
-
-            def get_series(col):
-                s = pd.Series(st.session_state.input_cash, index=df_hist.index) 
-                s += df_hist[col][SAMSUNG_TICKER].ffill().bfill() * SAMSUNG_QTY
-                for i, p in enumerate(all_stocks):
-                    qty = st.session_state.user_holdings[i]
-                    if qty > 0:
-                        tkr = p['ticker']
-                        if p['country'] == 'US': s += df_hist[col][tkr].ffill().bfill() * df_hist[col]['KRW=X'].ffill().bfill() * qty
-                        else: s += df_hist[col][tkr].ffill().bfill() * qty
-                return s
-
-            hist_O = get_series('Open')
-            hist_H = get_series('High')
-            hist_L = get_series('Low')
-            hist_C = get_series('Close')
-
-            def get_market_series(col, market):
-                s = pd.Series(0, index=df_hist.index)
-                if market == 'KR':
-                    s += df_hist[col][SAMSUNG_TICKER].ffill().bfill() * SAMSUNG_QTY
-                for i, p in enumerate(all_stocks):
-                    qty = st.session_state.user_holdings[i]
-                    if qty > 0 and p['country'] == market:
-                        tkr = p['ticker']
-                        if market == 'US': s += df_hist[col][tkr].ffill().bfill() * df_hist[col]['KRW=X'].ffill().bfill() * qty
-                        else: s += df_hist[col][tkr].ffill().bfill() * qty
-                return s
-
-            kr_O = get_market_series('Open', 'KR')
-            kr_H = get_market_series('High', 'KR')
-            kr_L = get_market_series('Low', 'KR')
-            kr_C = get_market_series('Close', 'KR')
-
-            us_O = get_market_series('Open', 'US')
-            us_H = get_market_series('High', 'US')
-            us_L = get_market_series('Low', 'US')
-            us_C = get_market_series('Close', 'US')
-
-            with tab1:
-                fig_total = create_candle_fig(hist_O, hist_H, hist_L, hist_C, '총자산 캔들', st.session_state.total_asset)
-                st.plotly_chart(fig_total, use_container_width=True)
-
-            with tab2:
-                s_cash = pd.Series(st.session_state.input_cash, index=df_hist.index) 
-                s_etf = pd.Series(0, index=df_hist.index)
-                s_us = pd.Series(0, index=df_hist.index)
-                s_kr = pd.Series(0, index=df_hist.index)
-                s_kr += df_hist['Close'][SAMSUNG_TICKER].ffill().bfill() * SAMSUNG_QTY
-                
-                for i, p in enumerate(all_stocks):
-                    qty = st.session_state.user_holdings[i]
-                    if qty > 0:
-                        tkr = p['ticker']
-                        if p['country'] == 'US': val = df_hist['Close'][tkr].ffill().bfill() * df_hist['Close']['KRW=X'].ffill().bfill() * qty
-                        else: val = df_hist['Close'][tkr].ffill().bfill() * qty
-                        if i < 5: s_etf += val
-                        elif p['country'] == 'US': s_us += val
-                        else: s_kr += val
-
-                real_time_total = st.session_state.total_asset
-                if len(hist_C) > 0: hist_C.iloc[-1] = real_time_total
-
-                ath_val = hist_H.max()
-                ath_date = hist_H.idxmax()
-                last_date = df_hist.index[-1]
-                zoom_start = last_date - pd.Timedelta(days=90)
-                
-                mask = (df_hist.index >= zoom_start)
-                if mask.any():
-                    low_3m_val = hist_L[mask].min()
-                    low_3m_date = hist_L[mask].idxmin()
-                else:
-                    low_3m_val = hist_L.min()
-                    low_3m_date = hist_L.idxmin()
-
-                curr_val = hist_C.iloc[-1]
-                curr_date = hist_C.index[-1]
-
-                fig_area = go.Figure()
-                fig_area.add_trace(go.Scatter(x=df_hist.index, y=s_cash, mode='none', fill='tozeroy', name='💵 예수금', stackgroup='one', fillcolor='#85BB65'))
-                fig_area.add_trace(go.Scatter(x=df_hist.index, y=s_etf, mode='none', fill='tonexty', name='🛡️ 현금성ETF', stackgroup='one', fillcolor='#FFD54F'))
-                fig_area.add_trace(go.Scatter(x=df_hist.index, y=s_us, mode='none', fill='tonexty', name='🌎 해외주식', stackgroup='one', fillcolor='#F06292'))
-                fig_area.add_trace(go.Scatter(x=df_hist.index, y=s_kr, mode='none', fill='tonexty', name='🇰🇷 국내주식', stackgroup='one', fillcolor='#64B5F6'))
-                fig_area.add_trace(go.Scatter(x=df_hist.index, y=hist_C, mode='lines', name='📈 총자산 흐름', line=dict(color='#222222', width=2)))
-                
-                fig_area.add_hline(y=ath_val, line_dash="dash", line_color="gray", opacity=0.7)
-                fig_area.add_hline(y=low_3m_val, line_dash="dash", line_color="gray", opacity=0.7)
-                fig_area.add_hline(y=curr_val, line_dash="dash", line_color="red", opacity=0.7)
-
-                fig_area.add_annotation(x=ath_date, y=ath_val, text=f"📅 {ath_date.strftime('%y년 %m월 %d일')}<br>🚩 전고점: ₩{ath_val/10000:,.0f}만", showarrow=True, arrowhead=1, ax=0, ay=-45, bgcolor="white", bordercolor="gray")
-                fig_area.add_annotation(x=low_3m_date, y=low_3m_val, text=f"📅 {low_3m_date.strftime('%y년 %m월 %d일')}<br>📉 3개월 저점: ₩{low_3m_val/10000:,.0f}만", showarrow=True, arrowhead=1, ax=0, ay=45, bgcolor="white", bordercolor="gray")
-                fig_area.add_annotation(x=curr_date, y=curr_val, text=f"🔴 현재가: ₩{curr_val/10000:,.0f}만", showarrow=True, arrowhead=1, ax=70, ay=0, bgcolor="white", bordercolor="red", xanchor="left")
-
-                fig_area.update_yaxes(tickformat=",.0f", autorange=True, fixedrange=False)
-                fig_area.update_xaxes(tickformat="%Y년 %m월 %d일", hoverformat="%Y년 %m월 %d일", rangeslider_visible=True, rangebreaks=[dict(bounds=["sat", "mon"])])
-                fig_area.update_layout(xaxis_range=[zoom_start, last_date + pd.Timedelta(days=15)], margin=dict(l=0, r=0, t=30, b=0), height=500, legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
-                
-                for d in first_days_month: 
-                    if d in first_days_year:
-                        fig_area.add_vline(x=d, line_dash="solid", line_color="black", line_width=1.5, opacity=0.8)
+                    with stage("chart_render"): st.plotly_chart(fig, use_container_width=True)
+                if chart_view in candle_parts:
+                    res, candles = candle_view(candle_parts[chart_view])
+                    pan_str = "전체를 보냅니다" if CHART_RANGES[chart_range] is None else f"그 {PAN_FACTOR}배 구간까지 끌어 볼 수 있게 보냅니다"
+                    st.caption(f"※ {RESOLUTIONS[res]} {len(candles):,}개 — 보이는 구간({chart_range})에 맞춰 해상도를 고르고, {pan_str}.")
+                if chart_view != chart_views[4]:
+                    timeline = st.session_state.get("holdings_timeline")
+                    if timeline is None or len(timeline) == 0:
+                        st.caption("※ 현재 보유수량·예수금을 3년 내내 들고 있었다고 본 값입니다. 날마다 '💾 오늘 보유 저장' 을 누르거나 거래내역을 넣으면 실제 보유 이력으로 바뀝니다.")
                     else:
-                        fig_area.add_vline(x=d, line_dash="dot", line_color="rgba(150,150,150,0.5)", line_width=1)
-                st.plotly_chart(fig_area, use_container_width=True)
-
-            with tab3:
-                kr_real_time_val = st.session_state.cat_stats["KR"]
-                fig_kr = create_candle_fig(kr_O, kr_H, kr_L, kr_C, '국장 캔들', kr_real_time_val)
-                st.plotly_chart(fig_kr, use_container_width=True)
-
-            with tab4:
-                us_real_time_val = st.session_state.cat_stats["US"] + st.session_state.cat_stats["ETF"]
-                fig_us = create_candle_fig(us_O, us_H, us_L, us_C, '미장 캔들', us_real_time_val)
-                st.plotly_chart(fig_us, use_container_width=True)
-
-        except Exception as e:
-            st.warning("차트 데이터를 불러오는 데 일시적인 문제가 발생했습니다.")
-
-    with col_pie:
-        st.subheader("🍕 자산 구성 비율")
-        tab_pie_current, tab_pie_target = st.tabs(["📊 현재 비율", "🎯 목표 비율"])
+                        src = "거래내역" if timeline.source == "ledger" else "저장된 일별 보유 스냅샷"
+                        st.caption(f"※ {src} 기준 보유 이력 ({timeline.days:,}일의 변화)으로 날짜마다 그날의 수량·예수금을 적용했습니다. 첫 기록 이전은 첫 기록 보유 그대로입니다.")
+                    if recorded is not None and len(recorded) and chart_view in (chart_views[0], chart_views[1]):
+                        st.caption(f"※ 📝 점선은 구글 시트에 실제로 기록된 총자산 {len(recorded):,}일 (마지막 {recorded.index[-1]:%Y-%m-%d})입니다.")
+                if chart_view == chart_views[4] and fig is not None:
+                    st.caption(f"※ 현재 보유수량·예수금을 그대로 둔 채 {mc_paths:,}개 경로를 원화 기준(환율 포함) 일간 수익률로 이어 붙인 결과입니다. 띠는 5~95%, 25~75% 구간입니다.")
+
+            except Exception as e:
+                st.warning("차트 데이터를 불러오는 데 일시적인 문제가 발생했습니다.")
+
+        with col_pie:
+            st.subheader("🍕 자산 구성 비율")
+            tab_pie_current, tab_pie_target = st.tabs(["📊 현재 비율", "🎯 목표 비율"])
         
-        try:
-            custom_colors = {v["name"]: v["color"] for v in brand_meta.values()}
+            try:
+                import plotly.express as px      # 파이/리스크 차트에서만 쓰므로 여기서 처음 불러온다
+                custom_colors = {v["name"]: v["color"] for v in brand_meta.values()}
             
-            # --- 현재 비율 ---
-            with tab_pie_current:
-                pie_data_cur = []
-                if st.session_state.sam_amt > 0: 
-                    pie_data_cur.append({"종목": get_brand("삼성전자")["name"], "금액": st.session_state.sam_amt})
-                for i, p in enumerate(all_stocks):
-                    if st.session_state.stock_data_cache[i]['my_amt'] > 0:
-                        pie_data_cur.append({"종목": get_brand(p['name'])["name"], "금액": st.session_state.stock_data_cache[i]['my_amt']})
-                if st.session_state.input_cash > 0: 
-                    pie_data_cur.append({"종목": get_brand("예수금")["name"], "금액": st.session_state.input_cash})
-
-                df_pie_cur = pd.DataFrame(pie_data_cur)
-                fig_pie_cur = px.pie(df_pie_cur, values='금액', names='종목', color='종목', color_discrete_map=custom_colors, hole=0.4)
-                fig_pie_cur.update_traces(textposition='inside', textinfo='percent+label')
-                fig_pie_cur.update_layout(margin=dict(l=0, r=0, t=10, b=0), height=500, showlegend=False) 
-                st.plotly_chart(fig_pie_cur, use_container_width=True)
+                # --- 현재 비율 ---
+                with tab_pie_current, stage("pie"):
+                    pie_data_cur = []
+                    for i, raw_name in enumerate(PORTFOLIO.names):
+                        if st.session_state.stock_data_cache[i]['my_amt'] > 0:
+                            pie_data_cur.append({"종목": get_brand(raw_name)["name"], "금액": st.session_state.stock_data_cache[i]['my_amt']})
+                    if st.session_state.input_cash > 0: 
+                        pie_data_cur.append({"종목": get_brand("예수금")["name"], "금액": st.session_state.input_cash})
+
+                    df_pie_cur = pd.DataFrame(pie_data_cur)
+                    fig_pie_cur = px.pie(df_pie_cur, values='금액', names='종목', color='종목', color_discrete_map=custom_colors, hole=0.4)
+                    fig_pie_cur.update_traces(textposition='inside', textinfo='percent+label')
+                    fig_pie_cur.update_layout(margin=dict(l=0, r=0, t=10, b=0), height=500, showlegend=False) 
+                    st.plotly_chart(fig_pie_cur, use_container_width=True)
             
-            # --- 목표 비율 ---
-            with tab_pie_target:
-                pie_data_tgt = []
+                # --- 목표 비율 ---
+                with tab_pie_target, stage("pie"):
+                    pie_data_tgt = []
                 
-                if st.session_state.sam_amt > 0: 
-                    pie_data_tgt.append({"종목": get_brand("삼성전자")["name"], "금액": st.session_state.sam_amt})
-                
-                for i, p in enumerate(all_stocks):
-                    if i < 5:
-                        tgt_amt = reb_budget * p['ratio']
-                    else:
-                        tgt_amt = budget_invest * p['ratio']
-                    if tgt_amt > 0:
-                        pie_data_tgt.append({"종목": get_brand(p['name'])["name"], "금액": tgt_amt})
+                    tgt_amts, tgt_cash = target_amounts(PORTFOLIO, st.session_state)
+                    for i, raw_name in enumerate(PORTFOLIO.names):
+                        if tgt_amts[i] > 0:
+                            pie_data_tgt.append({"종목": get_brand(raw_name)["name"], "금액": tgt_amts[i]})
                 
-                tgt_cash = reb_budget * 0.19
-                if tgt_cash > 0:
-                    pie_data_tgt.append({"종목": get_brand("예수금")["name"], "금액": tgt_cash})
+                    if tgt_cash > 0:
+                        pie_data_tgt.append({"종목": get_brand("예수금")["name"], "금액": tgt_cash})
                 
-                df_pie_tgt = pd.DataFrame(pie_data_tgt)
-                fig_pie_tgt = px.pie(df_pie_tgt, values='금액', names='종목', color='종목', color_discrete_map=custom_colors, hole=0.4)
-                fig_pie_tgt.update_traces(textposition='inside', textinfo='percent+label')
-                fig_pie_tgt.update_layout(margin=dict(l=0, r=0, t=10, b=0), height=500, showlegend=False) 
-                st.plotly_chart(fig_pie_tgt, use_container_width=True)
+                    df_pie_tgt = pd.DataFrame(pie_data_tgt)
+                    fig_pie_tgt = px.pie(df_pie_tgt, values='금액', names='종목', color='종목', color_discrete_map=custom_colors, hole=0.4)
+                    fig_pie_tgt.update_traces(textposition='inside', textinfo='percent+label')
+                    fig_pie_tgt.update_layout(margin=dict(l=0, r=0, t=10, b=0), height=500, showlegend=False) 
+                    st.plotly_chart(fig_pie_tgt, use_container_width=True)
                 
+            except Exception as e:
+                st.warning("비율 데이터를 표시할 수 없습니다.")
+
+        # ==========================================
+        # 6-1. 리스크 분석 (차트와 같은 일봉 종가 기준, 새 봉만 이어서 갱신)
+        # ==========================================
+        st.write("---")
+        st.subheader("⚠️ 리스크 분석 (3년 일봉)")
+        try:
+            import plotly.express as px
+            def build_risk():
+                levels, groups, holdings, bench_col = risk_levels(
+                    PORTFOLIO, df_hist, current_valuation(), PORTFOLIO.benchmark, PORTFOLIO.benchmark_usd
+                )
+                state = st.session_state.get("risk_state")
+                if state is None or (state.window, state.var_level) != (PORTFOLIO.risk_window, PORTFOLIO.var_level):
+                    state = st.session_state.risk_state = RiskState(PORTFOLIO.risk_window, PORTFOLIO.var_level)
+                return state.update(levels).report(groups, holdings, bench_col)
+
+            with stage("risk"): risk = memoized("risk", build_risk)
+            with stage("chart_render"):
+                tab_risk_sum, tab_risk_roll, tab_risk_corr = st.tabs(["📋 지표", f"📈 롤링 샤프 ({PORTFOLIO.risk_window}일)", "🔗 종목 상관관계"])
+                with tab_risk_sum:
+                    pct_cols = [c for c in risk["summary"].columns if c not in ("샤프", "베타")]
+                    st.dataframe(
+                        risk["summary"].style.format("{:.2%}", subset=pct_cols).format("{:.2f}", subset=[c for c in ("샤프", "베타") if c in risk["summary"].columns]),
+                        use_container_width=False,
+                    )
+                    bench_str = f" · 베타 기준 {PORTFOLIO.benchmark}" if "베타" in risk["summary"].columns else ""
+                    st.caption(f"※ 변동성·샤프는 연율(무위험수익률 0), VaR/CVaR 는 1일 과거 손실률 기준입니다. 현재 보유수량을 과거 가격에 적용한 값입니다{bench_str}.")
+                with tab_risk_roll:
+                    fig_roll = px.line(risk["rolling"], labels={"value": "샤프", "variable": ""})
+                    fig_roll.update_layout(margin=dict(l=0, r=0, t=10, b=0), height=400, hovermode="x unified")
+                    st.plotly_chart(fig_roll, use_container_width=True)
+                with tab_risk_corr:
+                    fig_corr = px.imshow(risk["corr"], zmin=-1, zmax=1, color_continuous_scale="RdBu_r", text_auto=".2f", aspect="auto")
+                    fig_corr.update_layout(margin=dict(l=0, r=0, t=10, b=0), height=600)
+                    st.plotly_chart(fig_corr, use_container_width=True)
         except Exception as e:
-            st.warning("비율 데이터를 표시할 수 없습니다.")
+            st.warning("리스크 지표를 계산할 수 없습니다.")
+
+    # 헤더 환율 칸: 화면을 다 그리는 동안 받아 둔 값으로 마지막에 채운다
+    fill_fx_header(fx_slot, fx_future)
+finally:
+    render_prof.end()       # st.stop()/st.rerun() 으로 빠져나가도 계측을 끝낸다
+
+# ==========================================
+# 7. 성능 디버그 패널 (단계별 시간 / 네트워크 / 캐시)
+# ==========================================
+st.session_state.profile_runs["render"] = render_prof.end().to_dict()
+
+with st.expander("🛠️ 성능 디버그", expanded=False):
+    st.radio("다음 분석 한 번 프로파일링", CAPTURE_MODES, horizontal=True, key="profile_capture")
+    st.caption("※ net_bytes 는 yfinance 가 돌려준 DataFrame 크기 기준입니다. 렌더 단계는 방금 그린 화면 기준입니다.")
+    if st.session_state.get("df_hist") is not None:
+        hist = st.session_state.df_hist
+        st.caption(f"※ 일봉 보관: {hist.shape[0]:,}일 × {hist.shape[1]}티커 × {len(hist.fields)}필드 {hist.data.dtype} = {hist.nbytes / 1024:,.0f} KB (모든 세션이 공유)")
+    startup = st.session_state.profile_runs["startup"]
+    st.caption(
+        f"※ 첫 화면(입력 패널 + 헤더 골격)까지 {startup['marks']['first_paint']:,.0f}ms, 무거운 모듈까지 {startup['wall_ms']:,.0f}ms "
+        f"({'이 프로세스 첫 실행: 모듈 import 포함' if startup['totals'].get('cold_start') else '모듈은 이미 로드됨'})"
+    )
+    for run in (st.session_state.profile_runs[k] for k in ("startup", "execute", "render") if k in st.session_state.profile_runs):
+        st.write(f"**{run['run']}** — 총 {run['wall_ms']:,.0f}ms  " + "  ".join(f"{k}={v:,}" for k, v in run["totals"].items())
+                 + "  " + "  ".join(f"{k}@{v:,.0f}ms" for k, v in run.get("marks", {}).items()))
+        df_stages = pd.DataFrame(run["stages"])
+        if not df_stages.empty:
+            agg = df_stages.fillna(0).groupby("stage", sort=False).sum(numeric_only=True)
+            agg = agg.drop(columns="wall_ms").astype(int)
+            agg.insert(0, "wall_ms", df_stages.groupby("stage", sort=False)["wall_ms"].sum().round(1))
+            agg.insert(1, "calls", df_stages.groupby("stage", sort=False).size())
+            st.dataframe(agg, use_container_width=True)
+        if run["profile"]:
+            st.code(run["profile"], language="text")
+    st.download_button(
+        "📥 JSON 내보내기", json.dumps(st.session_state.profile_runs, ensure_ascii=False, indent=2, default=float),
+        file_name=f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json", mime="application/json"
+    )
@@ -0,0 +1,161 @@
+"""저장된 일봉(PriceHistory)으로 리밸런싱 정책을 다시 돌려 보는 백테스트.
+
+    python backtest.py [--capital 30000000] [--periods 0 5 21 63 126] [--drift 0 0.02 0.05 0.1] [--fees 0 0.0015]
+
+정책은 portfolio.toml 그대로다: 리밸런싱 예산(= 총자산 − 고정 종목 평가금액)을 카테고리 base 와
+종목 ratio 로 나누고, 고정(locked) 종목은 qty 를 유지한다. 일정(period 거래일마다)과 이탈(종목/예수금 비중이
+목표에서 drift 이상 벗어나면) 조건 중 하나라도 맞으면 그날 종가로 정수 수량 매매를 한다.
+모든 일정(schedule)을 (일정 수 × 종목 수) 배열로 묶어 하루씩 한꺼번에 진행한다.
+"""
+import sys
+import argparse
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+from valuation import build_price_cube, OHLC_FIELDS
+
+TRADING_DAYS = 252
+CLOSE = OHLC_FIELDS.index("Close")
+
+@dataclass(frozen=True, eq=False)
+class BacktestResult:
+    """일정 S 개를 한 번에 돌린 결과. 배열의 마지막 축/열이 일정 순서."""
+    schedules: pd.DataFrame     # period, drift, fee_rate
+    equity: pd.DataFrame        # (날짜 × 일정) 총자산
+    rebalances: np.ndarray      # 일정별 리밸런싱 횟수
+    fees: np.ndarray            # 일정별 누적 수수료
+    turnover: np.ndarray        # 일정별 누적 매매금액 / 초기자본
+
+    def summary(self):
+        eq = self.equity.to_numpy()
+        years = max(len(eq) - 1, 1) / TRADING_DAYS
+        rets = eq[1:] / eq[:-1] - 1
+        drawdown = eq / np.maximum.accumulate(eq, axis=0) - 1
+        vol = rets.std(axis=0) * np.sqrt(TRADING_DAYS)
+        out = self.schedules.copy()
+        out["final"] = eq[-1]
+        out["cagr"] = (eq[-1] / eq[0]) ** (1 / years) - 1
+        out["vol"] = vol
+        out["sharpe"] = np.divide(rets.mean(axis=0) * TRADING_DAYS, vol, out=np.zeros_like(vol), where=vol > 0)
+        out["max_drawdown"] = drawdown.min(axis=0)
+        out["rebalances"] = self.rebalances
+        out["fees"] = self.fees
+        out["turnover"] = self.turnover
+        return out
+
+def schedule_grid(periods, drifts, fee_rates):
+    """모든 조합. period 0 = 정기 리밸런싱 없음, drift 0 = 이탈 조건 없음 (둘 다 0 이면 첫날 이후 보유만)."""
+    grid = [(p, d, f) for p in periods for d in drifts for f in fee_rates]
+    return pd.DataFrame(grid, columns=["period", "drift", "fee_rate"])
+
+def _unit_targets(pf):
+    """리밸런싱 예산 1원당 종목별 목표금액, 예수금 목표 비중"""
+    costs, _ = pf.target_costs(1.0)
+    return costs, pf.cash_share
+
+def _integer_targets(target, price, qty, locked, spendable, fee_rate=0.0):
+    """(일정 × 종목) 목표금액을 반올림 수량으로 바꾸고, 매수금액 + 예상 수수료(fee_rate × 매매금액)가
+    spendable 을 넘는 일정은 목표보다 가장 많이 넘친 종목부터 한 주씩 뺀다 (앱의 정수 리밸런싱을 일정 전체에 벡터로 근사)."""
+    safe = np.where(price > 0, price, 1.0)
+    new_qty = np.where(price > 0, np.round(target / safe), 0).astype(np.int64)
+    new_qty[:, locked] = qty[:, locked]
+    free = ~locked & (price > 0)
+    rows = np.arange(len(new_qty))
+    fee_rate = np.broadcast_to(np.asarray(fee_rate, dtype=float), rows.shape)
+    while True:
+        held = (new_qty[:, free] * price[free]).sum(axis=1)
+        fee = fee_rate * (np.abs(new_qty - qty)[:, free] * price[free]).sum(axis=1)
+        excess = np.where(free & (new_qty > 0), new_qty * price - target, -np.inf)
+        over = (held + fee > spendable) & np.isfinite(excess.max(axis=1, initial=-np.inf))
+        if not over.any(): break
+        k = excess.argmax(axis=1)
+        new_qty[rows[over], k[over]] -= 1
+    return new_qty
+
+def run_backtest(pf, hist, schedules, capital):
+    """schedules: schedule_grid() 형식 DataFrame. 첫 거래일에 capital 로 시작해 모든 일정이 한 번 리밸런싱한다."""
+    cube = build_price_cube(hist, pf.tickers, pf.usd)
+    price = cube[:, :, CLOSE]                                   # (D, T) 원화 종가
+    n_days, n_tkr = price.shape
+    n_sched = len(schedules)
+    period = schedules["period"].to_numpy(dtype=np.int64)
+    drift = schedules["drift"].to_numpy(dtype=float)
+    fee_rate = schedules["fee_rate"].to_numpy(dtype=float)[:, None]
+
+    unit_cost, cash_share = _unit_targets(pf)
+    locked = pf.locked
+    tradable = ~locked
+
+    qty = np.zeros((n_sched, n_tkr), dtype=np.int64)
+    qty[:, locked] = pf.locked_qty[locked]
+    cash = np.full(n_sched, float(capital)) - (qty * price[0]).sum(axis=1)
+    last_rebalance = np.zeros(n_sched, dtype=np.int64)
+
+    equity = np.empty((n_days, n_sched))
+    rebalances = np.zeros(n_sched, dtype=np.int64)
+    fees = np.zeros(n_sched)
+    traded = np.zeros(n_sched)
+
+    for day in range(n_days):
+        p = price[day]
+        value = qty * p                                          # (S, T)
+        total = value.sum(axis=1) + cash
+        budget = total - value[:, locked].sum(axis=1)
+        target = budget[:, None] * unit_cost[None, :]            # (S, T)
+
+        if day == 0:
+            due = np.ones(n_sched, dtype=bool)
+        else:
+            safe_budget = np.where(budget > 0, budget, 1.0)[:, None]
+            gap = np.abs(value - target)[:, tradable] / safe_budget
+            cash_gap = np.abs(cash / safe_budget[:, 0] - cash_share)
+            worst = np.maximum(gap.max(axis=1, initial=0.0), cash_gap)
+            due = ((period > 0) & (day - last_rebalance >= period)) | ((drift > 0) & (worst > drift))
+
+        if due.any():
+            new_qty = _integer_targets(target, p, qty, locked, budget * (1 - cash_share), fee_rate[:, 0])
+            trade_amt = (np.abs(new_qty - qty) * p).sum(axis=1)
+            fee = fee_rate[:, 0] * trade_amt
+            new_cash = cash + ((qty - new_qty) * p).sum(axis=1) - fee
+            qty = np.where(due[:, None], new_qty, qty)
+            cash = np.where(due, new_cash, cash)
+            fees += np.where(due, fee, 0.0)
+            traded += np.where(due, trade_amt, 0.0)
+            rebalances += due & (trade_amt > 0) & (day > 0)       # 첫날 진입은 리밸런싱으로 세지 않는다
+            last_rebalance = np.where(due, day, last_rebalance)
+
+        equity[day] = (qty * p).sum(axis=1) + cash
+
+    return BacktestResult(
+        schedules=schedules.reset_index(drop=True),
+        equity=pd.DataFrame(equity, index=hist.index),
+        rebalances=rebalances,         # 매매가 있었던 리밸런싱 날 수 (첫날 진입 제외)
+        fees=fees, turnover=traded / capital,
+    )
+
+def main(argv=None):
+    from portfolio import PORTFOLIO_FILE, load_portfolio
+    from history_store import load_history
+    from engine import FX_TICKER
+
+    parser = argparse.ArgumentParser(description="리밸런싱 정책 백테스트 (일정 × 이탈 기준 × 수수료 조합)")
+    parser.add_argument("--capital", type=float, default=30_000_000, help="시작 자본 (원, 고정 종목 평가금액 포함)")
+    parser.add_argument("--periods", type=int, nargs="+", default=[0, 5, 21, 63, 126, 252], help="정기 리밸런싱 간격 (거래일, 0 = 없음)")
+    parser.add_argument("--drift", type=float, nargs="+", default=[0, 0.01, 0.02, 0.03, 0.05, 0.1], help="이탈 기준 (예산 대비 비중 차이, 0 = 없음)")
+    parser.add_argument("--fees", type=float, nargs="+", default=[0.0, 0.0015], help="매매금액 대비 수수료율")
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--portfolio", default=PORTFOLIO_FILE, help="포트폴리오 설정 파일")
+    parser.add_argument("-o", "--output", help="결과 CSV 경로")
+    args = parser.parse_args(argv)
+
+    pf = load_portfolio(args.portfolio)
+    hist = load_history(list(pf.tickers) + [FX_TICKER], years=args.years)
+    result = run_backtest(pf, hist, schedule_grid(args.periods, args.drift, args.fees), args.capital)
+    summary = result.summary().sort_values("sharpe", ascending=False)
+    if args.output: summary.to_csv(args.output, index=False, encoding="utf-8-sig")
+    with pd.option_context("display.width", 200, "display.max_rows", 30):
+        print(summary.head(20).to_string(index=False, float_format=lambda v: f"{v:,.4f}"))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+"""yfinance 응답을 로컬 fixture 로 재생해 파이프라인 단계별 시간을 재는 오프라인 벤치마크.
+
+    python benchmark.py --record                     # 현재 portfolio.toml 종목의 실제 응답을 fixture 로 저장 (네트워크 필요)
+    python benchmark.py -o bench.json [--sizes 16 100 500] [--repeat 5]
+
+단계: quote_snapshot → evaluate → history_cold / history_warm (임시 sqlite) → valuation
+→ valuation_timeline (같은 평가를 합성 보유 이력 TIMELINE_CHANGES 건으로, 날짜마다 다른 수량·예수금)
+→ tables (행 구성 + Styler 렌더) → figures (캔들/영역 차트 생성 + to_json, 캔들은 앱 기본 구간의 다중 해상도 봉).
+크기 16 은 기록된 fixture 가 있으면 그것을, 없으면 합성 데이터를 쓴다. 100/500 같은 크기는
+portfolio.toml 종목을 복제한 합성 포트폴리오와 합성 시세로 잰다. 결과는 JSON 으로 저장한다.
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import pickle
+import argparse
+import platform
+import tempfile
+import dataclasses
+import numpy as np
+import pandas as pd
+import yfinance as yf
+import quotes
+import history_store
+from portfolio import PORTFOLIO_FILE, load_portfolio, parse_master_input
+from engine import FX_TICKER, MarketSnapshot, evaluate, session_values
+from valuation import value_holdings
+from holdings_timeline import from_changes, CASH
+from charts import month_starts, candle_figure, area_figure
+from ohlc_pyramid import OhlcPyramid, CHART_RANGES
+from tables import (
+    build_holding_table, style_stock_view, style_summary_table, style_pnl_table,
+)
+
+FIXTURE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "yf_recorded.pkl")
+HISTORY_YEARS = 3
+TIMELINE_CHANGES = 5000
+FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+
+# ==========================================
+# fixture: {"daily": 7일 일봉, "minute": 당일 1분봉, "history": 3년 일봉} — yf.download 와 같은 (Price, Ticker) 컬럼
+# ==========================================
+def record_fixtures(tickers, path=FIXTURE_FILE):
+    tickers = list(tickers)
+    start = (pd.Timestamp.today().normalize() - pd.DateOffset(years=HISTORY_YEARS) - pd.Timedelta(days=14)).strftime("%Y-%m-%d")
+    fixtures = {
+        "daily": yf.download(tickers, period="7d", progress=False),
+        "minute": yf.download(tickers, period="1d", interval="1m", prepost=True, progress=False),
+        "history": yf.download(tickers, start=start, progress=False),
+    }
+    empty = [k for k, df in fixtures.items() if df.empty]
+    if empty:
+        raise RuntimeError(f"yfinance 응답이 비어 있어 기록하지 않았습니다: {', '.join(empty)}")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        pickle.dump(fixtures, f)
+    return fixtures
+
+def load_fixtures(path=FIXTURE_FILE):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+def _synthetic_frame(tkr, index, base):
+    """티커 이름으로 시드를 고정한 기하 랜덤워크 OHLCV"""
+    rng = np.random.default_rng(zlib.crc32(tkr.encode()))
+    close = base * np.exp(np.cumsum(rng.normal(0, 0.015, len(index))))
+    open_ = close * np.exp(rng.normal(0, 0.004, len(index)))
+    spread = np.abs(rng.normal(0, 0.006, len(index)))
+    return pd.DataFrame({
+        "Open": open_, "High": np.maximum(open_, close) * (1 + spread), "Low": np.minimum(open_, close) * (1 - spread),
+        "Close": close, "Volume": rng.integers(10_000, 10_000_000, len(index)).astype(float),
+    }, index=index)
+
+def _wide(frames):
+    df = pd.concat(frames, axis=1).swaplevel(0, 1, axis=1).sort_index(axis=1)
+    df.columns.names = ["Price", "Ticker"]
+    return df
+
+def synthetic_fixtures(tickers, end=None):
+    end = pd.Timestamp(end or pd.Timestamp.today().normalize())
+    days = pd.bdate_range(end - pd.DateOffset(years=HISTORY_YEARS) - pd.Timedelta(days=14), end, name="Date")
+    minutes = pd.date_range(end + pd.Timedelta(hours=9), periods=390, freq="min", name="Datetime")
+    history, minute = {}, {}
+    for tkr in tickers:
+        base = 1400.0 if tkr == FX_TICKER else (80000.0 if tkr.endswith(".KS") else 150.0)
+        history[tkr] = _synthetic_frame(tkr, days, base)
+        last = history[tkr]["Close"].iloc[-1]
+        minute[tkr] = _synthetic_frame(tkr + ":1m", minutes, 1.0) * [last, last, last, last, 1]
+    history = _wide(history)
+    return {"daily": history.iloc[-5:], "minute": _wide(minute), "history": history}
+
+# ==========================================
+# 재생: yf.download / yf.Ticker 를 fixture 조회로 바꿔치기
+# ==========================================
+class Replay:
+    """with 블록 안에서 yfinance 호출을 fixture 로 답하고, 호출 수와 돌려준 프레임 크기를 센다."""
+
+    def __init__(self, fixtures):
+        self.fixtures = fixtures
+        self.calls = 0
+        self.bytes = 0
+
+    def download(self, tickers, period=None, interval="1d", start=None, **kwargs):
+        self.calls += 1
+        if interval == "1m": df = self.fixtures["minute"]
+        elif start is not None: df = self.fixtures["history"].loc[pd.Timestamp(start):]
+        elif period in ("5d", "7d"): df = self.fixtures["daily"]
+        else: df = self.fixtures["history"]
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        have = [t for t in tickers if t in df.columns.get_level_values("Ticker")]
+        out = df.loc[:, df.columns.get_level_values("Ticker").isin(have)].copy()
+        self.bytes += int(out.memory_usage(deep=False).sum())
+        return out
+
+    def ticker(self, tkr):
+        replay = self
+        class _Ticker:
+            fast_info = {}
+            def history(self, period="1mo", interval="1d", prepost=False, **kwargs):
+                df = replay.download([tkr], period=period, interval=interval)
+                return df.xs(tkr, axis=1, level="Ticker") if len(df.columns) else pd.DataFrame(columns=FIELDS)
+        return _Ticker()
+
+    def __enter__(self):
+        self._saved = yf.download, yf.Ticker
+        yf.download, yf.Ticker = self.download, self.ticker
+        return self
+
+    def __exit__(self, *exc):
+        yf.download, yf.Ticker = self._saved
+
+# ==========================================
+# 합성 포트폴리오 / 입력
+# ==========================================
+def scaled_portfolio(pf, n):
+    """pf 종목을 n 개가 될 때까지 복제한다. 복제본은 새 티커를 받고 비중은 나눠 가지며, 고정 종목은 원본만 고정."""
+    if n == len(pf): return pf
+    src = np.arange(n) % len(pf)
+    copies = np.bincount(src, minlength=len(pf))
+    rep = np.arange(n) // len(pf)
+    tickers = tuple(t if r == 0 else (f"SYN{i:04d}.KS" if t.endswith(".KS") else f"SYN{i:04d}") for i, (t, r) in enumerate(zip(np.array(pf.tickers)[src], rep)))
+    names = tuple(nm if r == 0 else f"{nm}#{r}" for nm, r in zip(np.array(pf.names)[src], rep))
+    pick = lambda seq: tuple(np.array(seq)[src])
+    return dataclasses.replace(
+        pf, names=names, aliases=names, tickers=tickers, countries=pick(pf.countries),
+        labels=names, colors=pick(pf.colors), cat_idx=pf.cat_idx[src],
+        ratios=pf.ratios[src] / copies[src], locked=pf.locked[src] & (rep == 0), locked_qty=np.where(rep == 0, pf.locked_qty[src], 0),
+    )
+
+def sample_input(pf, seed=0):
+    rng = np.random.default_rng(seed)
+    n, n_free = len(pf), int((~pf.locked).sum())
+    values = [10_000_000] + list(rng.integers(0, 60, n_free)) + list(rng.integers(50, 200_000, n)) + list(rng.integers(-500_000, 500_000, n))
+    return " ".join(str(v) for v in values)
+
+def sample_timeline(pf, index, n=TIMELINE_CHANGES, seed=0):
+    """index 기간에 고르게 흩어진 n 건의 (날짜, 종목 또는 예수금) 보유 변화"""
+    rng = np.random.default_rng(seed)
+    dates = np.asarray(index)[rng.integers(0, len(index), n)]
+    targets = np.array(list(pf.tickers) + [CASH])[rng.integers(0, len(pf) + 1, n)]
+    changes = [
+        (str(pd.Timestamp(d).date()), t, 0.0 if t == CASH else float(q), float(c))
+        for d, t, q, c in zip(dates, targets, rng.integers(-5, 6, n), rng.normal(0, 200_000, n))
+    ]
+    return from_changes(pf, changes, "synthetic")
+
+# ==========================================
+# 단계별 측정
+# ==========================================
+def _timed(results, stage, replay, repeat, fn):
+    calls0, bytes0 = replay.calls, replay.bytes
+    samples, out = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        samples.append(time.perf_counter() - t0)
+    results[stage] = {
+        "min_sec": min(samples), "median_sec": float(np.median(samples)), "max_sec": max(samples), "repeat": repeat,
+        "yf_calls": (replay.calls - calls0) // repeat, "yf_bytes": (replay.bytes - bytes0) // repeat,
+    }
+    return out
+
+def run_size(pf, fixtures, repeat):
+    stages = {}
+    specs = list(zip(pf.tickers, pf.countries)) + [(FX_TICKER, "FX")]
+    pf_input = parse_master_input(pf, sample_input(pf))
+    with Replay(fixtures) as replay, tempfile.TemporaryDirectory() as tmp:
+        quotes_map, failed = _timed(stages, "quote_snapshot", replay, repeat, lambda: quotes.get_quote_snapshot(specs))
+        snapshot = MarketSnapshot(
+            tickers=pf.tickers, quotes=np.array([quotes_map[t] for t in pf.tickers], dtype=float).reshape(-1, 5),
+            exchange_rate=float(quotes_map[FX_TICKER][0]), failed=tuple(failed),
+        )
+        ev = _timed(stages, "evaluate", replay, repeat, lambda: evaluate(pf, snapshot, pf_input))
+        state = session_values(pf, ev)
+
+        tickers = list(pf.tickers) + [FX_TICKER]
+        db = lambda k: os.path.join(tmp, f"history{k}.sqlite")
+        cold = iter(range(repeat))
+        _timed(stages, "history_cold", replay, repeat, lambda: history_store.load_history(tickers, HISTORY_YEARS, db(next(cold))))
+        df_hist = _timed(stages, "history_warm", replay, repeat, lambda: history_store.load_history(tickers, HISTORY_YEARS, db(0)))
+
+        valued = _timed(stages, "valuation", replay, repeat, lambda: value_holdings(pf, df_hist, state["user_holdings"], state["input_cash"]))
+        timeline = sample_timeline(pf, df_hist.index)
+        _timed(stages, "valuation_timeline", replay, repeat, lambda: value_holdings(
+            pf, df_hist, *timeline.step_matrix(df_hist.index, state["user_holdings"], state["input_cash"])
+        ))
+
+        def tables():
+            table = build_holding_table(pf, state)
+            return [
+                style_stock_view(table, "전체", "실제금액숫자").to_html(),
+                style_summary_table(table.summary).to_html(),
+                style_pnl_table(table.pnl).to_html(),
+            ]
+        html = _timed(stages, "tables", replay, repeat, tables)
+
+        def figures():
+            gridlines = month_starts(df_hist.index)
+            days = CHART_RANGES["3개월"]
+            candles = {part: OhlcPyramid().update(valued[part]).view(days)[1] for part in ("total", "KR", "US")}
+            figs = [
+                candle_figure(valued["total"], "총자산 캔들", state["total_asset"], gridlines, candles["total"], days),
+                area_figure(pf, valued, state["input_cash"], state["total_asset"], gridlines),
+                candle_figure(valued["KR"], "국장 캔들", state["market_stats"]["KR"], gridlines, candles["KR"], days),
+                candle_figure(valued["US"], "미장 캔들", state["market_stats"]["US"], gridlines, candles["US"], days),
+            ]
+            return [fig.to_json() for fig in figs]
+        payloads = _timed(stages, "figures", replay, repeat, figures)
+
+    stages["tables"]["html_bytes"] = sum(len(h.encode()) for h in html)
+    stages["figures"]["json_bytes"] = sum(len(p.encode()) for p in payloads)
+    return {"tickers": len(pf), "history_rows": len(df_hist), "stages": stages}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="오프라인 파이프라인 벤치마크")
+    parser.add_argument("-o", "--output", default="bench.json", help="결과 JSON 경로")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[16, 100, 500], help="종목 수 (portfolio.toml 보다 크면 합성)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--portfolio", default=PORTFOLIO_FILE, help="포트폴리오 설정 파일")
+    parser.add_argument("--fixtures", default=FIXTURE_FILE, help="기록된 yfinance 응답 (없으면 합성)")
+    parser.add_argument("--record", action="store_true", help="실제 yfinance 응답을 --fixtures 경로에 기록하고 끝낸다")
+    args = parser.parse_args(argv)
+
+    pf = load_portfolio(args.portfolio)
+    if args.record:
+        try: record_fixtures(list(pf.tickers) + [FX_TICKER], args.fixtures)
+        except RuntimeError as e:
+            print(e, file=sys.stderr)
+            return 1
+        print(f"fixture 저장 → {args.fixtures}")
+        return 0
+
+    recorded = load_fixtures(args.fixtures) if os.path.exists(args.fixtures) else None
+    runs = []
+    for n in args.sizes:
+        pf_n = scaled_portfolio(pf, n)
+        use_recorded = recorded is not None and n == len(pf)
+        fixtures = recorded if use_recorded else synthetic_fixtures(list(pf_n.tickers) + [FX_TICKER])
+        run = {"source": "recorded" if use_recorded else "synthetic", **run_size(pf_n, fixtures, args.repeat)}
+        runs.append(run)
+        print(f"[{n:>4} 종목 / {run['source']}] " + "  ".join(f"{k} {v['median_sec'] * 1000:,.1f}ms" for k, v in run["stages"].items()))
+
+    report = {
+        "created": pd.Timestamp.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(), "platform": platform.platform(),
+        "versions": {"pandas": pd.__version__, "numpy": np.__version__, "yfinance": getattr(yf, "__version__", "")},
+        "runs": runs,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"결과 저장 → {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+import plotly.graph_objects as go
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# 차트 공통 요소
+# ==========================================
+def _segments(dates):
+    """세로선마다 (d, 0) → (d, 1) 선분을 None 으로 끊어 하나의 x/y 목록으로 만든다."""
+    xs, ys = [], []
+    for d in dates:
+        xs += [d, d, None]
+        ys += [0, 1, None]
+    return xs, ys
+
+def add_month_gridlines(fig, first_days_month, first_days_year):
+    """월 시작일(점선)과 연 시작일(실선) 구분선을 shape 수십 개 대신 선 trace 두 개로 그린다.
+    구분선은 0~1 고정 범위의 보조 y축(y2)에 올려서 본 y축 자동 범위에 영향을 주지 않는다."""
+    year_set = set(first_days_year)
+    styles = [
+        ([d for d in first_days_month if d not in year_set], dict(color="rgba(150,150,150,0.5)", width=1, dash="dot")),
+        ([d for d in first_days_month if d in year_set], dict(color="rgba(0,0,0,0.8)", width=1.5, dash="solid")),
+    ]
+    for dates, line in styles:
+        if not dates: continue
+        xs, ys = _segments(dates)
+        fig.add_trace(go.Scatter(x=xs, y=ys, yaxis="y2", mode="lines", line=line, hoverinfo="skip", showlegend=False))
+    fig.update_layout(yaxis2=dict(overlaying="y", range=[0, 1], visible=False, fixedrange=True))
+    return fig
+
+def month_starts(index):
+    """(월 시작일 목록, 연 시작일 목록) — 거래일 기준"""
+    s = pd.Series(index, index=index)
+    first_days_month = list(s.groupby([index.year, index.month]).first())
+    first_days_year = list(s.groupby(index.year).first())
+    return first_days_month, first_days_year
+
+def _add_markers(fig, H_series, L_series, C_series, zoom_days=90):
+    """전고점 / 3개월 저점 / 현재가 점선과 주석, 최근 zoom_days 일 확대 (None = 전체)"""
+    ath_val = H_series.max()
+    ath_date = H_series.idxmax()
+    last_date = C_series.index[-1]
+    zoom_start = C_series.index[0] if zoom_days is None else last_date - pd.Timedelta(days=zoom_days)
+
+    mask = (C_series.index >= last_date - pd.Timedelta(days=90))
+    if mask.any():
+        low_3m_val = L_series[mask].min()
+        low_3m_date = L_series[mask].idxmin()
+    else:
+        low_3m_val = L_series.min()
+        low_3m_date = L_series.idxmin()
+
+    curr_val = C_series.iloc[-1]
+    curr_date = C_series.index[-1]
+
+    fig.add_hline(y=ath_val, line_dash="dash", line_color="gray", opacity=0.7)
+    fig.add_hline(y=low_3m_val, line_dash="dash", line_color="gray", opacity=0.7)
+    fig.add_hline(y=curr_val, line_dash="dash", line_color="red", opacity=0.7)
+
+    fig.add_annotation(x=ath_date, y=ath_val, text=f"📅 {ath_date.strftime('%y년 %m월 %d일')}<br>🚩 전고점: ₩{ath_val/10000:,.0f}만", showarrow=True, arrowhead=1, ax=0, ay=-45, bgcolor="white", bordercolor="gray")
+    fig.add_annotation(x=low_3m_date, y=low_3m_val, text=f"📅 {low_3m_date.strftime('%y년 %m월 %d일')}<br>📉 3개월 저점: ₩{low_3m_val/10000:,.0f}만", showarrow=True, arrowhead=1, ax=0, ay=45, bgcolor="white", bordercolor="gray")
+    fig.add_annotation(x=curr_date, y=curr_val, text=f"🔴 현재가: ₩{curr_val/10000:,.0f}만", showarrow=True, arrowhead=1, ax=70, ay=0, bgcolor="white", bordercolor="red", xanchor="left")
+
+    fig.update_yaxes(tickformat=",.0f", autorange=True, fixedrange=False)
+    fig.update_xaxes(tickformat="%Y년 %m월 %d일", hoverformat="%Y년 %m월 %d일", rangeslider_visible=True, rangebreaks=[dict(bounds=["sat", "mon"])])
+    fig.update_layout(xaxis_range=[zoom_start, last_date + pd.Timedelta(days=15)], margin=dict(l=0, r=0, t=30, b=0), height=500)
+    return fig
+
+# ==========================================
+# 자산 성장 차트
+# ==========================================
+def _with_live_bar(frame, real_time_val):
+    O_series, H_series, L_series, C_series = (frame[f].copy() for f in ("Open", "High", "Low", "Close"))
+    if len(C_series) > 0:
+        C_series.iloc[-1] = real_time_val
+        if H_series.iloc[-1] < real_time_val: H_series.iloc[-1] = real_time_val
+        if L_series.iloc[-1] > real_time_val: L_series.iloc[-1] = real_time_val
+    return O_series, H_series, L_series, C_series
+
+def candle_figure(frame, name, real_time_val, gridlines, candles=None, zoom_days=90):
+    """OHLC 평가금액 DataFrame 으로 캔들 차트. 마지막 봉 종가는 실시간 값으로 바꾼다.
+    candles 를 주면 (주봉/월봉이나 잘라 낸 구간) 그것을 그리고, 전고점/저점 표시는 frame 일봉 전체로 잡는다."""
+    _, H_series, L_series, C_series = _with_live_bar(frame, real_time_val)
+    bars = _with_live_bar(frame if candles is None else candles, real_time_val)
+    x = bars[3].index
+
+    fig = go.Figure(data=[go.Candlestick(x=x,
+                    open=bars[0].values, high=bars[1].values,
+                    low=bars[2].values, close=bars[3].values, name=name)])
+    _add_markers(fig, H_series, L_series, C_series, zoom_days)
+    if len(x): gridlines = tuple([d for d in dates if d >= x[0]] for dates in gridlines)
+    return add_month_gridlines(fig, *gridlines)
+
+def area_figure(pf, valued, cash, real_time_total, gridlines):
+    """예수금 + 카테고리별 누적 영역과 총자산 선"""
+    index = valued["total"].index
+    hist_H, hist_L = valued["total"]["High"], valued["total"]["Low"]
+    hist_C = valued["total"]["Close"].copy()
+    s_cash = pd.Series(cash, index=index)
+    if len(hist_C) > 0: hist_C.iloc[-1] = real_time_total
+
+    fig_area = go.Figure()
+    fig_area.add_trace(go.Scatter(x=index, y=s_cash, mode='none', fill='tozeroy', name=pf.cash_label, stackgroup='one', fillcolor=pf.cash_color))
+    for c in reversed(pf.categories):
+        fig_area.add_trace(go.Scatter(x=index, y=valued["cat"][c.name]["Close"], mode='none', fill='tonexty', name=c.area_label, stackgroup='one', fillcolor=c.area_color))
+    fig_area.add_trace(go.Scatter(x=index, y=hist_C, mode='lines', name='📈 총자산 흐름', line=dict(color='#222222', width=2)))
+
+    _add_markers(fig_area, hist_H, hist_L, hist_C)
+    fig_area.update_layout(legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
+    return add_month_gridlines(fig_area, *gridlines)
+
+def add_recorded_line(fig, recorded, start=None):
+    """시트에 실제로 기록된 날짜별 총자산(Series)을 점선으로 겹친다. start 이전 기록은 빼서 x축을 넓히지 않는다."""
+    if recorded is None or len(recorded) == 0: return fig
+    if start is not None: recorded = recorded[recorded.index >= start]
+    if len(recorded) == 0: return fig
+    fig.add_trace(go.Scatter(
+        x=recorded.index, y=recorded.values, mode="lines+markers", name="📝 기록된 총자산",
+        line=dict(color="#FF6D00", width=1.5, dash="dot"), marker=dict(size=4),
+    ))
+    return fig
+
+def _with_last(values, last):
+    values = np.array(values, dtype=float)
+    values[-1] = last
+    return values
+
+def set_last_value(fig, frame, real_time_val):
+    """이미 만든 캔들/영역 차트의 마지막 봉과 현재가 선·주석만 실시간 값으로 바꾼다 (과거 구간은 그대로).
+    frame 은 그 차트를 만들 때 쓴 OHLC 평가금액 (마지막 봉 고가/저가 원래 값 확인용)."""
+    if len(frame) == 0: return fig
+    for trace in fig.data:
+        if trace.type == "candlestick":
+            trace.close = _with_last(trace.close, real_time_val)
+            trace.high = _with_last(trace.high, max(frame["High"].iloc[-1], real_time_val))
+            trace.low = _with_last(trace.low, min(frame["Low"].iloc[-1], real_time_val))
+        elif trace.type == "scatter" and trace.mode == "lines" and trace.name == '📈 총자산 흐름':
+            trace.y = _with_last(trace.y, real_time_val)
+    for shape in fig.layout.shapes:
+        if shape.line.color == "red": shape.update(y0=real_time_val, y1=real_time_val)
+    for ann in fig.layout.annotations:
+        if ann.text.startswith("🔴 현재가"):
+            ann.update(y=real_time_val, text=f"🔴 현재가: ₩{real_time_val/10000:,.0f}만")
+    return fig
+
+# ==========================================
+# 미래 전망 (몬테카를로 백분위 부채꼴)
+# ==========================================
+def projection_figure(hist_close, fan, real_time_val, lookback_days=365):
+    """최근 lookback_days 총자산 종가 선 + 미래 5/25/50/75/95 백분위 띠"""
+    hist_C = hist_close[hist_close.index >= hist_close.index[-1] - pd.Timedelta(days=lookback_days)].copy()
+    if len(hist_C) > 0: hist_C.iloc[-1] = real_time_val
+    x = [hist_C.index[-1]] + list(fan.index)
+
+    def band(col):
+        return [hist_C.iloc[-1]] + list(fan[col])
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=hist_C.index, y=hist_C, mode='lines', name='📈 총자산 흐름', line=dict(color='#222222', width=2)))
+    for lo_col, hi_col, color, name in (("p5", "p95", "rgba(66,133,244,0.15)", "5~95%"), ("p25", "p75", "rgba(66,133,244,0.35)", "25~75%")):
+        fig.add_trace(go.Scatter(x=x, y=band(lo_col), mode='lines', line=dict(width=0), hoverinfo="skip", showlegend=False))
+        fig.add_trace(go.Scatter(x=x, y=band(hi_col), mode='lines', line=dict(width=0), fill='tonexty', fillcolor=color, name=name))
+    fig.add_trace(go.Scatter(x=x, y=band("p50"), mode='lines', name='중앙값', line=dict(color='#1A73E8', width=2, dash='dash')))
+
+    end = fan.iloc[-1]
+    fig.add_annotation(
+        x=fan.index[-1], y=end["p50"], xanchor="left", showarrow=False, bgcolor="white", bordercolor="#1A73E8",
+        text=f"📅 {fan.index[-1].strftime('%y년 %m월')}<br>중앙값 ₩{end['p50']/10000:,.0f}만<br>5% ₩{end['p5']/10000:,.0f}만 ~ 95% ₩{end['p95']/10000:,.0f}만",
+    )
+    fig.update_yaxes(tickformat=",.0f")
+    fig.update_xaxes(tickformat="%Y년 %m월", hoverformat="%Y년 %m월 %d일")
+    fig.update_layout(
+        margin=dict(l=0, r=0, t=30, b=0), height=500, hovermode="x unified",
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+    )
+    return fig
@@ -0,0 +1,83 @@
+"""여러 계좌의 master_input 줄을 한 번에 평가하는 배치 실행기.
+
+    python cli.py accounts.txt -o report.csv [--holdings holdings.csv] [--workers 8]
+
+입력 파일은 한 줄에 계좌 하나 (앱의 master_input 과 같은 숫자 나열).
+'계좌명<TAB>숫자…' 형식이면 앞부분을 계좌 이름으로 쓰고, 빈 줄과 # 주석은 건너뛴다.
+시세는 한 번만 받아 모든 계좌가 공유한다. 출력 확장자가 .parquet 이면 Parquet 으로 쓴다.
+"""
+import os
+import sys
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from portfolio import PORTFOLIO_FILE, load_portfolio, parse_master_input
+from engine import fetch_snapshot, evaluate, summary_row, holding_rows
+
+_worker_state = {}
+
+def read_accounts(path):
+    accounts = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"): continue
+            name, _, numbers = line.rpartition("\t")
+            accounts.append((name or f"line{line_no}", numbers))
+    return accounts
+
+def _init_worker(pf, snapshot, with_holdings):
+    _worker_state.update(pf=pf, snapshot=snapshot, with_holdings=with_holdings)
+
+def _evaluate_account(account):
+    name, numbers = account
+    pf, snapshot = _worker_state["pf"], _worker_state["snapshot"]
+    try:
+        ev = evaluate(pf, snapshot, parse_master_input(pf, numbers))
+    except ValueError as e:
+        return {"account": name, "error": str(e)}, []
+    details = [{"account": name, **row} for row in holding_rows(pf, ev)] if _worker_state["with_holdings"] else []
+    return {"account": name, "error": "", **summary_row(pf, ev)}, details
+
+def evaluate_accounts(pf, snapshot, accounts, workers=None, with_holdings=False):
+    """(요약 DataFrame, 종목별 상세 DataFrame) 을 돌려준다."""
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        _init_worker(pf, snapshot, with_holdings)
+        results = list(map(_evaluate_account, accounts))
+    else:
+        chunksize = max(len(accounts) // (workers * 4), 1)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(pf, snapshot, with_holdings)) as pool:
+            results = list(pool.map(_evaluate_account, accounts, chunksize=chunksize))
+    summary = pd.DataFrame([r for r, _ in results])
+    holdings = pd.DataFrame([row for _, rows in results for row in rows])
+    return summary, holdings
+
+def write_table(df, path):
+    if path.endswith(".parquet"): df.to_parquet(path, index=False)
+    else: df.to_csv(path, index=False, encoding="utf-8-sig")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="여러 계좌 포트폴리오 일괄 평가")
+    parser.add_argument("accounts", help="계좌별 master_input 이 한 줄씩 들어 있는 파일")
+    parser.add_argument("-o", "--output", default="report.csv", help="계좌별 요약 (.csv 또는 .parquet)")
+    parser.add_argument("--holdings", help="종목별 상세를 저장할 경로 (.csv 또는 .parquet)")
+    parser.add_argument("--portfolio", default=PORTFOLIO_FILE, help="포트폴리오 설정 파일")
+    parser.add_argument("--workers", type=int, default=None, help="프로세스 수 (기본: CPU 수, 1 이면 단일 프로세스)")
+    args = parser.parse_args(argv)
+
+    pf = load_portfolio(args.portfolio)
+    accounts = read_accounts(args.accounts)
+    snapshot = fetch_snapshot(pf)
+    if snapshot.failed:
+        print(f"시세 조회 실패: {', '.join(snapshot.failed)} (0원으로 계산)", file=sys.stderr)
+
+    summary, holdings = evaluate_accounts(pf, snapshot, accounts, args.workers, with_holdings=bool(args.holdings))
+    write_table(summary, args.output)
+    if args.holdings: write_table(holdings, args.holdings)
+    errors = int((summary["error"] != "").sum()) if not summary.empty else 0
+    print(f"{len(summary)}개 계좌 평가 완료 → {args.output}" + (f" (입력 오류 {errors}건)" if errors else ""))
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
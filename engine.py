@@ -0,0 +1,187 @@
+from dataclasses import dataclass
+import numpy as np
+from quotes import get_quote_snapshot, get_exchange_rate
+from quote_cache import QUOTE_CACHE
+from rebalance import solve_integer_rebalance
+
+# ==========================================
+# 평가 / 손익 / 리밸런싱 계산 엔진 (Streamlit 없이 import 가능)
+# ==========================================
+FX_TICKER = "KRW=X"
+
+@dataclass(frozen=True, eq=False)
+class MarketSnapshot:
+    """포트폴리오 종목 순서대로 정렬된 시세 한 벌. 여러 계좌가 같이 쓴다."""
+    tickers: tuple
+    quotes: np.ndarray        # (종목 수, 5): 현재가, 등락률, D-1 종가, D-1 등락률, D-2 종가
+    exchange_rate: float
+    failed: tuple
+
+def fetch_snapshot(pf, fx_fallback=get_exchange_rate):
+    specs = list(zip(pf.tickers, pf.countries)) + [(FX_TICKER, "FX")]
+    quotes, failed = QUOTE_CACHE.get_many(specs, get_quote_snapshot)
+    exchange_rate = quotes[FX_TICKER][0] if quotes[FX_TICKER][0] > 0 else fx_fallback()
+    return MarketSnapshot(
+        tickers=pf.tickers,
+        quotes=np.array([quotes[t] for t in pf.tickers], dtype=float).reshape(-1, 5),
+        exchange_rate=float(exchange_rate),
+        failed=tuple(failed),
+    )
+
+@dataclass(frozen=True, eq=False)
+class Evaluation:
+    # 종목별 배열 (포트폴리오 종목 순서)
+    price_krw: np.ndarray
+    price_usd: np.ndarray
+    change_pct: np.ndarray
+    prev_change_pct: np.ndarray
+    qty: np.ndarray
+    my_amt: np.ndarray
+    prev_amt: np.ndarray
+    prev2_amt: np.ndarray
+    today_profit: np.ndarray
+    avg_p: np.ndarray
+    actual_avg_p: np.ndarray
+    real_p: np.ndarray
+    unreal_p: np.ndarray
+    tot_p: np.ndarray
+    principal: np.ndarray
+    return_pct: np.ndarray
+    target_costs: np.ndarray
+    target_ratios: np.ndarray
+    target_qty: np.ndarray
+    # 카테고리별 배열 (pf.categories 순서)
+    cat_cur: np.ndarray
+    cat_prev: np.ndarray
+    cat_prev2: np.ndarray
+    # 합계
+    cash: float
+    exchange_rate: float
+    total_asset: float
+    total_today_profit: float
+    total_daily_return_pct: float
+    total_d1_change_pct: float
+    locked_amt: float
+    rebalance_budget: float
+    # 리밸런싱 후 예상: 수수료, 예수금 (= 리밸런싱 예산 − 목표수량 매수금액 − 수수료), 목표 대비 추적오차
+    trade_fees: float
+    cash_after: float
+    tracking_error: float
+    plan_exact: bool           # 목표수량이 오차 최소임이 확인됐는지 (False = 탐색 한도 안의 근사해)
+
+def target_quantities(pf, price_krw, target_costs, qty):
+    """예산(목표금액 합) 안에서 전 종목 정수 수량을 함께 정한다. 고정 종목은 0."""
+    plan = solve_integer_rebalance(
+        price_krw, target_costs, qty, budget=target_costs.sum(), tradable=~pf.locked,
+        fee_rate=pf.fee_rate, min_trade=pf.min_trade,
+    )
+    return np.where(pf.locked, 0, plan.qty), plan
+
+def evaluate(pf, snapshot, pf_input):
+    price, change_pct, prev_close, prev_change_pct, d2_close = snapshot.quotes.T
+    qty = pf_input.qty
+    avg_p, real_p = pf_input.avg_prices, pf_input.realized
+
+    fx = np.where(pf.usd, snapshot.exchange_rate, 1.0)
+    price_krw = price * fx
+    my_amt = qty * price_krw
+    prev_amt = prev_close * fx * qty
+    prev2_amt = d2_close * fx * qty
+
+    unreal_p = np.where(avg_p > 0, (price_krw - avg_p) * qty, 0.0)
+    tot_p = real_p + unreal_p
+    actual_avg_p = avg_p - np.divide(real_p, qty, out=np.zeros(len(pf)), where=qty > 0)
+    return_pct = np.where(actual_avg_p > 0, (price_krw - actual_avg_p) / np.where(actual_avg_p > 0, actual_avg_p, 1) * 100, 0.0)
+
+    total_asset = my_amt.sum() + pf_input.cash
+    total_prev = pf_input.cash + prev_amt.sum()
+    total_prev2 = pf_input.cash + prev2_amt.sum()
+    total_today_profit = (my_amt - prev_amt).sum()
+    locked_amt = my_amt[pf.locked].sum()
+    rebalance_budget = total_asset - locked_amt
+    target_costs, target_ratios = pf.target_costs(rebalance_budget)
+    target_qty, plan = target_quantities(pf, price_krw, target_costs, qty)
+
+    n_cat = len(pf.categories)
+    return Evaluation(
+        price_krw=price_krw, price_usd=np.where(pf.usd, price, 0.0),
+        change_pct=change_pct, prev_change_pct=prev_change_pct,
+        qty=qty, my_amt=my_amt, prev_amt=prev_amt, prev2_amt=prev2_amt, today_profit=my_amt - prev_amt,
+        avg_p=avg_p, actual_avg_p=actual_avg_p, real_p=real_p, unreal_p=unreal_p, tot_p=tot_p,
+        principal=my_amt - tot_p, return_pct=return_pct,
+        target_costs=target_costs, target_ratios=target_ratios,
+        target_qty=target_qty,
+        cat_cur=np.bincount(pf.cat_idx, my_amt, n_cat),
+        cat_prev=np.bincount(pf.cat_idx, prev_amt, n_cat),
+        cat_prev2=np.bincount(pf.cat_idx, prev2_amt, n_cat),
+        cash=pf_input.cash, exchange_rate=snapshot.exchange_rate,
+        total_asset=total_asset, total_today_profit=total_today_profit,
+        total_daily_return_pct=(total_today_profit / total_prev) * 100 if total_prev > 0 else 0,
+        total_d1_change_pct=((total_prev - total_prev2) / total_prev2) * 100 if total_prev2 > 0 else 0,
+        locked_amt=locked_amt, rebalance_budget=rebalance_budget,
+        trade_fees=plan.fees, cash_after=rebalance_budget - plan.cost - plan.fees, tracking_error=plan.tracking_error,
+        plan_exact=plan.exact,
+    )
+
+def session_values(pf, ev):
+    """화면(표/차트)이 읽는 값들. 앱은 st.session_state 에, 벤치마크는 dict 에 담는다."""
+    cat_labels = pf.category_names
+    cat_stats = {}
+    for k, c in enumerate(pf.categories):
+        cat_stats.update({c.code: ev.cat_cur[k], c.code + "_P": ev.cat_prev[k], c.code + "_P2": ev.cat_prev2[k]})
+    countries = np.array(pf.countries)
+    return {
+        "total_asset": ev.total_asset,
+        "locked_amt": ev.locked_amt,
+        "rebalance_budget": ev.rebalance_budget,
+        "total_today_profit": ev.total_today_profit,
+        "total_daily_return_pct": ev.total_daily_return_pct,
+        "total_d1_change_pct": ev.total_d1_change_pct,
+        "exc_rate": ev.exchange_rate,
+        "stock_data_cache": [{
+            "price_krw": ev.price_krw[i], "price_usd": ev.price_usd[i], "my_amt": ev.my_amt[i], 
+            "change_pct": ev.change_pct[i], "today_profit": ev.today_profit[i], "prev_change_pct": ev.prev_change_pct[i],
+            "avg_p": ev.avg_p[i], "actual_avg_p": ev.actual_avg_p[i], "real_p": ev.real_p[i], 
+            "unreal_p": ev.unreal_p[i], "tot_p": ev.tot_p[i], "principal": ev.principal[i], 
+            "return_pct": ev.return_pct[i], "cat_label": cat_labels[i]
+        } for i in range(len(pf))],
+        "target_qty": ev.target_qty,
+        "trade_fees": ev.trade_fees,
+        "cash_after": ev.cash_after,
+        "tracking_error": ev.tracking_error,
+        "plan_exact": ev.plan_exact,
+        "user_holdings": ev.qty,
+        "input_cash": ev.cash,
+        "cat_stats": cat_stats,
+        "market_stats": {m: ev.my_amt[countries == m].sum() for m in ("KR", "US")},
+    }
+
+def summary_row(pf, ev):
+    """계좌 하나를 한 줄로 요약 (배치 리포트용)"""
+    trade = np.where(pf.locked, 0, ev.target_qty - ev.qty)
+    row = {
+        "total_asset": ev.total_asset, "cash": ev.cash,
+        "today_profit": ev.total_today_profit, "daily_return_pct": ev.total_daily_return_pct,
+        "d1_change_pct": ev.total_d1_change_pct, "rebalance_budget": ev.rebalance_budget,
+        "realized": ev.real_p.sum(), "unrealized": ev.unreal_p.sum(), "total_pnl": ev.tot_p.sum(),
+        "principal": ev.principal.sum(),
+        "buy_orders": int((trade > 0).sum()), "sell_orders": int((trade < 0).sum()),
+        "total_buy_cost": float((ev.target_qty * ev.price_krw).sum()),
+        "trade_fees": ev.trade_fees, "cash_after": ev.cash_after, "tracking_error": ev.tracking_error,
+        "plan_exact": ev.plan_exact,
+    }
+    for k, c in enumerate(pf.categories):
+        row[f"{c.code}_amt"] = ev.cat_cur[k]
+        row[f"{c.code}_today_profit"] = ev.cat_cur[k] - ev.cat_prev[k]
+    return row
+
+def holding_rows(pf, ev):
+    """종목별 상세 (배치 리포트용)"""
+    trade = np.where(pf.locked, 0, ev.target_qty - ev.qty)
+    return [{
+        "name": pf.names[i], "ticker": pf.tickers[i], "category": pf.categories[pf.cat_idx[i]].name,
+        "qty": int(ev.qty[i]), "price_krw": ev.price_krw[i], "amount": ev.my_amt[i],
+        "target_amount": ev.target_costs[i], "target_qty": int(ev.target_qty[i]), "trade_qty": int(trade[i]),
+        "today_profit": ev.today_profit[i], "actual_avg_p": ev.actual_avg_p[i],
+        "realized": ev.real_p[i], "unrealized": ev.unreal_p[i], "total_pnl": ev.tot_p[i], "return_pct": ev.return_pct[i],
+    } for i in range(len(pf))]
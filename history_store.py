@@ -0,0 +1,99 @@
+import os
+import sqlite3
+from contextlib import closing
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from price_history import PriceHistory
+from profiling import count
+
+# ==========================================
+# 로컬 일봉 저장소 (SQLite, 티커 × 날짜)
+# ==========================================
+HISTORY_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "history.sqlite")
+HISTORY_FIELDS = ["Open", "High", "Low", "Close"]
+TAIL_OVERLAP_DAYS = 7      # 마지막 저장 봉 이전 며칠을 다시 받아 수정주가 변동을 감지
+ADJUST_TOLERANCE = 0.005   # 겹친 구간 종가가 0.5% 이상 바뀌면 (분할/배당 조정) 전체를 다시 받음
+
+def _connect(db_path):
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    con = sqlite3.connect(db_path, timeout=30)
+    con.execute("CREATE TABLE IF NOT EXISTS bars (ticker TEXT, date TEXT, open REAL, high REAL, low REAL, close REAL, PRIMARY KEY (ticker, date))")
+    con.execute("CREATE TABLE IF NOT EXISTS coverage (ticker TEXT PRIMARY KEY, start TEXT)")
+    return con
+
+def _download_rows(tickers, **kwargs):
+    """yf.download 결과를 {티커: OHLC 프레임} 으로 나눈다 (종가 없는 날은 제외)."""
+    df = yf.download(tickers, progress=False, **kwargs)
+    rows = {}
+    if df is None or df.empty: return rows
+    for tkr in tickers:
+        try:
+            if isinstance(df.columns, pd.MultiIndex): sub = pd.DataFrame({f: df[f][tkr] for f in HISTORY_FIELDS})
+            else: sub = df[HISTORY_FIELDS]
+        except KeyError:
+            continue
+        sub = sub.dropna(subset=["Close"])
+        if not sub.empty: rows[tkr] = sub
+    return rows
+
+def _upsert(con, tkr, frame):
+    con.executemany(
+        "INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?)",
+        [(tkr, d.strftime("%Y-%m-%d"), o, h, l, c) for d, o, h, l, c in frame[HISTORY_FIELDS].itertuples()]
+    )
+
+def _stored_closes(con, tkr, since):
+    cur = con.execute("SELECT date, close FROM bars WHERE ticker = ? AND date >= ?", (tkr, since))
+    return {d: c for d, c in cur.fetchall()}
+
+def update_history(tickers, start, db_path=HISTORY_DB):
+    """저장소를 start 이후 최신 봉까지 채운다. 이미 있는 티커는 마지막 봉 이후 꼬리만 받는다."""
+    start_str = start.strftime("%Y-%m-%d")
+    with closing(_connect(db_path)) as con, con:
+        full, tail = [], {}
+        for tkr in tickers:
+            cov = con.execute("SELECT start FROM coverage WHERE ticker = ?", (tkr,)).fetchone()
+            last = con.execute("SELECT MAX(date) FROM bars WHERE ticker = ?", (tkr,)).fetchone()[0]
+            if cov is None or last is None or cov[0] > start_str: full.append(tkr)
+            else: tail[tkr] = last
+
+        if tail:
+            since = (pd.Timestamp(min(tail.values())) - pd.Timedelta(days=TAIL_OVERLAP_DAYS)).strftime("%Y-%m-%d")
+            fetched = _download_rows(list(tail), start=since)
+            for tkr, last in tail.items():
+                frame = fetched.get(tkr)
+                if frame is None: continue
+                stored = _stored_closes(con, tkr, since)
+                # 마지막 저장 봉은 장중 값이었을 수 있으므로 그 이전의 확정 봉끼리만 비교
+                overlap = [(stored[d], c) for d, c in zip(frame.index.strftime("%Y-%m-%d"), frame["Close"]) if d in stored and d < last]
+                if any(abs(c - old) > ADJUST_TOLERANCE * abs(old) for old, c in overlap if old):
+                    full.append(tkr)
+                else:
+                    _upsert(con, tkr, frame)
+
+        count("history_tail", len(tail))
+        count("history_full", len(full))
+        if full:
+            fetched = _download_rows(full, start=start_str)
+            for tkr in full:
+                if tkr not in fetched: continue
+                con.execute("DELETE FROM bars WHERE ticker = ?", (tkr,))
+                _upsert(con, tkr, fetched[tkr])
+                con.execute("INSERT OR REPLACE INTO coverage VALUES (?, ?)", (tkr, start_str))
+
+def read_history(tickers, start, db_path=HISTORY_DB, dtype=np.float32):
+    """저장소에서 OHLC 만 담은 PriceHistory (티커 순서 = tickers, 없는 칸은 NaN) 를 만든다."""
+    with closing(_connect(db_path)) as con, con:
+        marks = ",".join("?" * len(tickers))
+        rows = con.execute(
+            f"SELECT date, ticker, open, high, low, close FROM bars WHERE date >= ? AND ticker IN ({marks})",
+            [start.strftime("%Y-%m-%d")] + list(tickers)
+        ).fetchall()
+    return PriceHistory.from_rows(rows, tickers, dtype)
+
+def load_history(tickers, years=3, db_path=HISTORY_DB, dtype=np.float32):
+    """최근 years 년 일봉. 처음 한 번만 전체를 받고, 이후 실행은 빠진 꼬리만 받아 덧붙인다."""
+    start = pd.Timestamp.today().normalize() - pd.DateOffset(years=years)
+    update_history(tickers, start, db_path)
+    return read_history(tickers, start, db_path, dtype)
@@ -0,0 +1,102 @@
+import os
+import sqlite3
+from contextlib import closing
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+from profiling import count
+
+# ==========================================
+# 날짜별 보유수량·예수금 이력 (희소 계단 함수)
+# 변화가 있었던 (날짜, 종목) 만 들고 있다가 일봉 날짜축에 맞춰 (날짜 × 종목) 수량 행렬로 한 번에 편다.
+# 기준은 현재 보유(앱 입력)이고, 각 봉의 보유 = 현재 보유 − 그 봉 뒤에 생긴 변화 합 이다.
+# 그래서 거래내역/스냅샷이 일부 기간만 덮어도 마지막 봉은 항상 현재 보유와 맞고, 그 이전은 첫 기록 그대로 본다.
+# ==========================================
+HOLDINGS_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "holdings.sqlite")
+CASH = ""                  # 변화/스냅샷 행에서 예수금을 나타내는 티커 자리
+SCHEMA_VERSION = 2         # 스냅샷 표 모양이 바뀌면 올린다 (예전 표는 지움: 보유자 구분이 없던 공용 스냅샷)
+
+@dataclass(frozen=True, eq=False)
+class HoldingsTimeline:
+    """같은 길이 배열로 든 변화 목록. source: "ledger" (거래내역) / "snapshots" (분석 실행 때 저장한 보유)"""
+    dates: np.ndarray          # datetime64, 그날 장 마감 후 보유에 반영
+    idx: np.ndarray            # pf.tickers 인덱스 (-1 = 예수금만 변함)
+    dqty: np.ndarray
+    dcash: np.ndarray          # 원화
+    source: str = ""
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def days(self):
+        return len(np.unique(self.dates))
+
+    def fingerprint(self):
+        return (self.source, len(self), hash((self.dates.tobytes(), self.idx.tobytes(), self.dqty.tobytes(), self.dcash.tobytes())))
+
+    def step_matrix(self, index, qty, cash):
+        """index 날짜마다의 (날짜 × 종목) 보유수량과 (날짜,) 예수금. 변화는 같은 날 또는 그 뒤 첫 봉부터 보인다.
+        현재 보유에서 거꾸로 빼다 음수가 되는 칸(기록 밖 입고/입금)은 0 으로 둔다."""
+        n_days, n_tkr = len(index), len(qty)
+        dates = pd.DatetimeIndex(self.dates)
+        if index.tz is not None: dates = dates.tz_localize(index.tz)
+        rows = index.searchsorted(dates, side="left")                  # index 밖(더 뒤)이면 n_days
+        delta = np.zeros((n_days + 1, n_tkr + 1))                       # 마지막 열 = 예수금
+        np.add.at(delta, (rows, self.idx), self.dqty)                   # idx -1 (예수금만) 은 dqty 가 0
+        np.add.at(delta[:, -1], rows, self.dcash)
+        after = np.cumsum(delta[::-1], axis=0)[::-1]                    # after[r] = r 번째 봉부터 생긴 변화 합
+        levels = np.append(np.asarray(qty, dtype=float), float(cash))[None, :] - after[1:]
+        if (levels < 0).any(): count("timeline_clipped", int((levels < 0).sum()))
+        np.maximum(levels, 0.0, out=levels)
+        return levels[:, :-1], levels[:, -1]
+
+def from_changes(pf, changes, source):
+    """[(날짜 'YYYY-MM-DD', 티커, 수량 변화, 예수금 변화)] → HoldingsTimeline. 포트폴리오에 없는 티커는 뺀다."""
+    pos = {t: k for k, t in enumerate(pf.tickers)}
+    pos[CASH] = -1
+    rows = [(d, pos[t], q, c) for d, t, q, c in changes if t in pos and (q or c)]
+    if not rows:
+        return HoldingsTimeline(np.zeros(0, dtype="datetime64[ns]"), np.zeros(0, dtype=np.intp), np.zeros(0), np.zeros(0), source)
+    dates, idx, dqty, dcash = zip(*rows)
+    return HoldingsTimeline(
+        dates=pd.to_datetime(list(dates)).to_numpy(), idx=np.array(idx, dtype=np.intp),
+        dqty=np.array(dqty, dtype=float), dcash=np.array(dcash, dtype=float), source=source,
+    )
+
+# ==========================================
+# 일별 보유 스냅샷 (SQLite) — 거래내역이 없을 때의 이력
+# 사용자가 "오늘 보유 저장" 을 눌렀을 때만 쓰고, 보유자 id(앱은 주소의 holder 값)마다 따로 둔다.
+# ==========================================
+def _connect(db_path):
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    con = sqlite3.connect(db_path, timeout=30)
+    if con.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+        con.execute("DROP TABLE IF EXISTS snapshots")
+        con.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    con.execute("CREATE TABLE IF NOT EXISTS snapshots (holder TEXT, date TEXT, ticker TEXT, qty REAL, PRIMARY KEY (holder, date, ticker))")
+    return con
+
+def record_snapshot(pf, pf_input, holder, date=None, db_path=HOLDINGS_DB):
+    """holder 의 date(기본: 오늘) 보유수량·예수금을 저장한다. 같은 날 다시 부르면 덮어쓴다."""
+    date = date or pd.Timestamp.now().strftime("%Y-%m-%d")
+    rows = [(holder, date, t, float(q)) for t, q in zip(pf.tickers, pf_input.qty)] + [(holder, date, CASH, float(pf_input.cash))]
+    with closing(_connect(db_path)) as con, con:
+        con.execute("DELETE FROM snapshots WHERE holder = ? AND date = ?", (holder, date))
+        con.executemany("INSERT INTO snapshots VALUES (?, ?, ?, ?)", rows)
+
+def snapshot_changes(holder, db_path=HOLDINGS_DB):
+    """holder 의 스냅샷을 날짜순으로 이웃끼리 비교해 바뀐 칸만 [(날짜, 티커, 수량 변화, 예수금 변화)] 로.
+    나중에 추가된 종목은 그 전 스냅샷에서 0 으로 본다."""
+    if not os.path.exists(db_path): return []
+    with closing(_connect(db_path)) as con:
+        frame = pd.read_sql_query("SELECT date, ticker, qty FROM snapshots WHERE holder = ?", con, params=(holder,))
+    if frame.empty: return []
+    wide = frame.pivot(index="date", columns="ticker", values="qty").sort_index().fillna(0.0)
+    diff = np.diff(wide.to_numpy(), axis=0)
+    rows, cols = np.nonzero(diff)
+    dates, tickers = wide.index[1:], wide.columns
+    return [
+        (dates[r], tickers[c], 0.0, diff[r, c]) if tickers[c] == CASH else (dates[r], tickers[c], diff[r, c], 0.0)
+        for r, c in zip(rows, cols)
+    ]
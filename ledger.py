@@ -0,0 +1,403 @@
+"""증권사 거래내역 CSV (매수/매도/배당/환전) 로 보유수량·원화 평단가·실현손익을 만드는 원장.
+
+    python ledger.py kr_trades.csv us_trades.csv [--method fifo|avg] [--cash 10000000] [--fx 1380]
+
+파일을 한 줄씩 읽으며 종목별 보유 로트(FIFO) 또는 평균단가에 바로 반영하므로 행 수와 무관하게
+메모리는 열린 로트 수만큼만 쓴다. 최신순으로 내보낸 파일은 끝에서부터 거꾸로 읽는다.
+상태(로트, 실현손익, 마지막 환율, 원장별 반영 위치, 날짜·종목별 보유/현금 변화)는 SQLite 에 저장하고, 같은 원장을 다시 넣으면
+이미 반영한 날짜·행은 건너뛰고 새 거래만 더한다. 마지막에 앱 master_input 한 줄을 출력한다.
+"""
+import io
+import os
+import re
+import sys
+import csv
+import copy
+import codecs
+import sqlite3
+import argparse
+from collections import Counter, deque, defaultdict, namedtuple
+from contextlib import closing
+import numpy as np
+from portfolio import PORTFOLIO_FILE, PortfolioInput, load_portfolio
+from profiling import count
+
+LEDGER_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "ledger.sqlite")
+METHODS = ("fifo", "avg")
+ENCODINGS = ("utf-8-sig", "cp949")          # 국내 증권사 내보내기는 대개 cp949
+BLOCK_BYTES = 1 << 16
+
+# 증권사마다 다른 머리글 → 표준 열 (소문자·공백 정리 후 비교)
+COLUMNS = {
+    "date": ("date", "trade date", "settlement date", "거래일자", "거래일", "일자", "체결일자", "체결일"),
+    "kind": ("action", "type", "transaction type", "activity", "거래구분", "거래종류", "구분", "적요명", "적요"),
+    "ticker": ("symbol", "ticker", "종목코드", "종목번호", "티커"),
+    "name": ("name", "description", "security", "종목명"),
+    "qty": ("quantity", "qty", "shares", "수량", "거래수량", "체결수량"),
+    "price": ("price", "단가", "체결단가", "거래단가"),
+    "amount": ("amount", "net amount", "거래금액", "정산금액", "금액"),
+    "fee": ("fee", "fees", "commission", "수수료"),
+    "tax": ("tax", "taxes", "withholding", "세금", "제세금", "원천징수"),
+    "currency": ("currency", "통화", "통화코드"),
+    "fx_rate": ("fx rate", "exchange rate", "환율", "적용환율"),
+}
+# 거래구분 → 종류. 앞쪽부터 부분 일치로 찾는다 ('외화매수' 가 매수로 잡히지 않도록 환전이 먼저)
+KINDS = (
+    ("fx", ("환전", "외화매수", "외화매도", "currency exchange", "fx", "forex")),
+    ("dividend", ("배당", "dividend", "div")),
+    ("sell", ("매도", "sell", "sold")),
+    ("buy", ("매수", "buy", "bought")),
+)
+
+Trade = namedtuple("Trade", "date kind ticker qty price amount fee tax currency fx_rate")
+
+class LedgerError(ValueError):
+    pass
+
+# ==========================================
+# CSV 읽기 (한 줄씩, 필요하면 끝에서부터)
+# ==========================================
+def _number(text):
+    """'1,234', '₩1,234', '$(12.5)', '-' 같은 칸을 float 로 (비면 0)"""
+    try: return float(text)
+    except ValueError: pass
+    text = text.strip().replace(",", "").replace("₩", "").replace("$", "")
+    if not text or text == "-": return 0.0
+    if text.startswith("(") and text.endswith(")"): text = "-" + text[1:-1]
+    return float(text)
+
+_ISO = re.compile(r"(\d{4})[-./]?(\d{1,2})[-./]?(\d{1,2})")
+_US = re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4})")
+
+def _date(text):
+    """'2024-01-02' / '2024.01.02' / '20240102' / '01/02/2024' → '2024-01-02'"""
+    m = _US.match(text.strip())
+    if m: return f"{m[3]}-{int(m[1]):02d}-{int(m[2]):02d}"
+    m = _ISO.match(text.strip())
+    if not m: raise LedgerError(f"날짜를 읽을 수 없습니다: {text!r}")
+    return f"{m[1]}-{int(m[2]):02d}-{int(m[3]):02d}"
+
+def _kind(text):
+    text = text.strip().lower()
+    for kind, words in KINDS:
+        if any(w in text for w in words): return kind
+    return None
+
+def _encoding(fh):
+    """파일 전체를 블록 단위로 디코딩해 보고 처음 성공하는 인코딩 (앞부분이 ASCII 뿐인 CP949 파일도 잡는다)"""
+    for enc in ENCODINGS:
+        decoder = codecs.getincrementaldecoder(enc)()
+        fh.seek(0)
+        try:
+            for block in iter(lambda: fh.read(BLOCK_BYTES), b""): decoder.decode(block)
+            decoder.decode(b"", final=True)
+        except UnicodeDecodeError:
+            continue
+        fh.seek(0)
+        return enc
+    raise LedgerError("CSV 인코딩을 알 수 없습니다 (UTF-8 / CP949 만 지원)")
+
+def _reverse_lines(fh, enc, start):
+    """start 바이트 이후를 마지막 줄부터 한 줄씩 (블록 단위로 거꾸로 읽음)"""
+    fh.seek(0, io.SEEK_END)
+    pos, rest = fh.tell(), b""
+    while pos > start:
+        size = min(BLOCK_BYTES, pos - start)
+        pos -= size
+        fh.seek(pos)
+        lines = (fh.read(size) + rest).split(b"\n")
+        rest = lines.pop(0)
+        for line in reversed(lines):
+            if line.strip(): yield line.decode(enc)
+    if rest.strip(): yield rest.decode(enc)
+
+def _header_map(header):
+    norm = [" ".join(h.strip().lower().split()) for h in header]
+    cols = {}
+    for key, names in COLUMNS.items():
+        for name in names:
+            if name in norm:
+                cols[key] = norm.index(name)
+                break
+    missing = [k for k in ("date", "kind", "qty") if k not in cols] + ([] if "ticker" in cols or "name" in cols else ["ticker"])
+    if missing: raise LedgerError(f"필수 열이 없습니다: {', '.join(missing)} (머리글: {', '.join(header)})")
+    return cols
+
+def read_trades(fh, resolve=lambda code, name: code or name, currency_of=lambda ticker: "KRW"):
+    """바이너리 파일 객체에서 Trade 를 시간순으로 하나씩 돌려준다 (모르는 거래구분 행은 건너뜀).
+    resolve(종목코드, 종목명) → 티커, currency_of(티커) → 통화 열이 없을 때의 통화."""
+    try:
+        yield from _read_trades(fh, resolve, currency_of)
+    except UnicodeDecodeError as e:
+        raise LedgerError(f"CSV 를 {e.encoding} 로 읽다 깨진 글자를 만났습니다") from e
+
+def _read_trades(fh, resolve, currency_of):
+    enc = _encoding(fh)
+    header_line = fh.readline()
+    body_start = fh.tell()
+    cols = _header_map(next(csv.reader([header_line.decode(enc)])))
+    width = max(cols.values()) + 1
+    i_date, i_kind, i_tkr, i_name, i_qty, i_price, i_amt, i_fee, i_tax, i_cur, i_fx = (
+        cols.get(k, width) for k in ("date", "kind", "ticker", "name", "qty", "price", "amount", "fee", "tax", "currency", "fx_rate"))
+    pad = [""] * (width + 1)          # 없는 열은 맨 뒤 빈 칸을 가리킨다
+
+    # 첫 행과 마지막 행 날짜로 정렬 방향을 정한다 (최신순이면 끝에서부터 읽음)
+    first = next(csv.reader([fh.readline().decode(enc)]), None)
+    last = next(csv.reader(_reverse_lines(fh, enc, body_start)), None)
+    if not first or not last: return
+    descending = _date((first + pad)[i_date]) > _date((last + pad)[i_date])
+    if descending:
+        lines = _reverse_lines(fh, enc, body_start)
+    else:
+        fh.seek(body_start)
+        lines = io.TextIOWrapper(fh, encoding=enc, newline="")
+
+    # 거래구분/날짜/종목 문자열은 반복되므로 한 번만 해석한다
+    kinds, dates, tickers = {}, {}, {}
+    prev = ""
+    try:
+        for row in csv.reader(lines):
+            if len(row) <= width: row += pad[:width + 1 - len(row)]
+            else: row.append("")
+            raw_kind = row[i_kind]
+            kind = kinds.get(raw_kind)
+            if kind is None: kind = kinds[raw_kind] = _kind(raw_kind) or ""
+            if not kind:
+                if any(c.strip() for c in row): count("ledger_skipped")
+                continue
+            raw_date = row[i_date]
+            date = dates.get(raw_date)
+            if date is None: date = dates[raw_date] = _date(raw_date)
+            if date < prev: raise LedgerError(f"거래가 시간순이 아닙니다: {prev} 다음에 {date}")
+            prev = date
+            key = (row[i_tkr], row[i_name])
+            ticker = tickers.get(key)
+            if ticker is None: ticker = tickers[key] = resolve(key[0].strip(), key[1].strip())
+            yield Trade(
+                date=date, kind=kind, ticker=ticker,
+                qty=abs(_number(row[i_qty])), price=abs(_number(row[i_price])),
+                amount=abs(_number(row[i_amt])), fee=abs(_number(row[i_fee])), tax=abs(_number(row[i_tax])),
+                currency=(row[i_cur].strip().upper() or currency_of(ticker)), fx_rate=_number(row[i_fx]),
+            )
+    finally:
+        if not descending: lines.detach()
+
+def portfolio_resolver(pf):
+    """(resolve, currency_of): 증권사 종목코드('005930', 'AAPL')/종목명을 portfolio.toml 티커로"""
+    lookup = {}
+    for t, name, alias, country in zip(pf.tickers, pf.names, pf.aliases, pf.countries):
+        for key in (t, t.split(".")[0], name, alias):
+            lookup.setdefault(key.upper(), t)
+    countries = dict(zip(pf.tickers, pf.countries))
+    resolve = lambda code, name: lookup.get(code.upper()) or lookup.get(name.upper()) or code or name
+    currency_of = lambda ticker: "USD" if countries.get(ticker) == "US" else "KRW"
+    return resolve, currency_of
+
+# ==========================================
+# 원가 계산 상태
+# ==========================================
+class CostBasisBook:
+    """CostBasisBook(method).ingest(source, trades, fx_fallback) → positions() / to_input(pf, cash)
+    종목마다 [수량, 주당 원화원가] 로트를 deque 로 든다. avg 는 로트를 하나로 합쳐 이동평균을 쓴다.
+    원장(source)마다 (마지막 날짜, 그 날짜에 반영한 행 수) 를 기억해 다시 넣은 파일의 옛 거래는 건너뛴다."""
+
+    def __init__(self, method="fifo"):
+        if method not in METHODS: raise LedgerError(f"method 는 {METHODS} 중 하나여야 합니다: {method}")
+        self.method = method
+        self.lots = defaultdict(deque)
+        self.realized = defaultdict(float)
+        self.dividends = defaultdict(float)
+        self.fx = {}                  # 통화 -> 마지막 환전/거래 환율
+        self.sources = {}             # 원장 이름 -> (마지막 날짜, 그 날짜에 반영한 행 수)
+        self.changes = defaultdict(lambda: [0.0, 0.0])     # (날짜, 티커) -> [수량 변화, 원화 현금 변화] (보유 이력용)
+        self.counts = Counter()
+
+    def _rate(self, t, fx_fallback):
+        if t.currency == "KRW": return 1.0
+        if t.fx_rate > 0:
+            self.fx[t.currency] = t.fx_rate
+            return t.fx_rate
+        if t.currency in self.fx: return self.fx[t.currency]
+        self.counts["fx_fallback"] += 1
+        return fx_fallback
+
+    def apply(self, t, fx_fallback=0.0):
+        """거래 하나를 반영한다 (시간순으로 불러야 함)."""
+        if t.kind == "fx":
+            if t.fx_rate > 0 and t.currency != "KRW": self.fx[t.currency] = t.fx_rate
+            return
+        rate = self._rate(t, fx_fallback)
+        if t.kind == "dividend":
+            net = ((t.amount or t.qty * t.price) - t.tax) * rate
+            self.realized[t.ticker] += net
+            self.dividends[t.ticker] += net
+            self.changes[(t.date, t.ticker)][1] += net
+            return
+        if t.qty <= 0: return
+        gross = t.qty * t.price if t.price > 0 else t.amount
+        lots = self.lots[t.ticker]
+        change = self.changes[(t.date, t.ticker)]
+        if t.kind == "buy":
+            change[0] += t.qty
+            change[1] -= (gross + t.fee) * rate
+            unit = (gross + t.fee) * rate / t.qty
+            if self.method == "avg" and lots:
+                q, c = lots[0]
+                lots[0] = [q + t.qty, (q * c + t.qty * unit) / (q + t.qty)]
+            else:
+                lots.append([t.qty, unit])
+            return
+        # 매도: 앞 로트부터 (avg 는 로트가 하나) 원가를 빼고 실현손익을 더한다
+        remaining, basis = t.qty, 0.0
+        while remaining > 1e-12 and lots:
+            q, c = lots[0]
+            take = min(q, remaining)
+            basis += take * c
+            remaining -= take
+            if take >= q - 1e-12: lots.popleft()
+            else: lots[0] = [q - take, c]
+        if remaining > 1e-12: self.counts["oversold"] += 1       # 원장 이전 보유분 (원가 0 으로 처리)
+        proceeds = (gross - t.fee - t.tax) * rate
+        self.realized[t.ticker] += proceeds - basis
+        change[0] -= t.qty
+        change[1] += proceeds
+
+    def ingest(self, source, trades, fx_fallback=0.0):
+        """source 원장의 거래를 반영한다. 이미 반영한 날짜 이전 행과 그 날짜의 앞 n 행은 건너뛴다."""
+        last_date, seen = self.sources.get(source, ("", 0))
+        cur_date, n_cur, applied = last_date, 0, 0      # 이번 파일에서 cur_date 날짜 행을 몇 개 봤는지
+        for t in trades:
+            if t.date < last_date: continue
+            if t.date != cur_date: cur_date, n_cur = t.date, 0
+            n_cur += 1
+            if t.date == last_date and n_cur <= seen: continue
+            self.apply(t, fx_fallback)
+            applied += 1
+        if cur_date > last_date or n_cur > seen: self.sources[source] = (cur_date, n_cur)
+        else: self.sources.setdefault(source, (last_date, seen))
+        self.counts["applied"] += applied
+        count("ledger_rows", applied)
+        return applied
+
+    def positions(self):
+        """{티커: (수량, 원화 평단가, 실현손익(배당 포함), 배당)}"""
+        out = {}
+        for tkr in set(self.lots) | set(self.realized):
+            qty = sum(q for q, _ in self.lots.get(tkr, ()))
+            cost = sum(q * c for q, c in self.lots.get(tkr, ()))
+            out[tkr] = (qty, cost / qty if qty > 1e-12 else 0.0, self.realized.get(tkr, 0.0), self.dividends.get(tkr, 0.0))
+        return out
+
+    def change_rows(self):
+        """[(날짜, 티커, 수량 변화, 원화 현금 변화)] 날짜순 (holdings_timeline.from_changes 입력)"""
+        return sorted((d, t, q, c) for (d, t), (q, c) in self.changes.items())
+
+    def to_input(self, pf, cash):
+        """앱 PortfolioInput (고정 종목 수량은 설정값 그대로). 포트폴리오에 없는 티커는 무시한다."""
+        pos = self.positions()
+        qty, avg, real = (np.array([pos.get(t, (0, 0, 0, 0))[k] for t in pf.tickers], dtype=float) for k in range(3))
+        return PortfolioInput(
+            cash=float(cash), qty=np.where(pf.locked, pf.locked_qty, np.round(qty)).astype(np.int64),
+            avg_prices=avg, realized=real,
+        )
+
+# ==========================================
+# 상태 저장 (SQLite)
+# ==========================================
+def _connect(db_path):
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    con = sqlite3.connect(db_path, timeout=30)
+    con.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+    con.execute("CREATE TABLE IF NOT EXISTS lots (ticker TEXT, seq INTEGER, qty REAL, cost REAL, PRIMARY KEY (ticker, seq))")
+    con.execute("CREATE TABLE IF NOT EXISTS pnl (ticker TEXT PRIMARY KEY, realized REAL, dividends REAL)")
+    con.execute("CREATE TABLE IF NOT EXISTS fx (currency TEXT PRIMARY KEY, rate REAL)")
+    con.execute("CREATE TABLE IF NOT EXISTS sources (name TEXT PRIMARY KEY, last_date TEXT, seen INTEGER)")
+    con.execute("CREATE TABLE IF NOT EXISTS changes (date TEXT, ticker TEXT, qty REAL, cash REAL, PRIMARY KEY (date, ticker))")
+    return con
+
+def load_book(method="fifo", db_path=LEDGER_DB):
+    """저장된 상태를 읽는다. 저장된 방식이 method 와 다르면 빈 상태 (원장을 처음부터 다시 넣어야 함)."""
+    book = CostBasisBook(method)
+    if not os.path.exists(db_path): return book
+    with closing(_connect(db_path)) as con:
+        stored = con.execute("SELECT value FROM meta WHERE key = 'method'").fetchone()
+        if stored is None or stored[0] != method:
+            count("ledger_reset")
+            return book
+        for tkr, q, c in con.execute("SELECT ticker, qty, cost FROM lots ORDER BY ticker, seq"):
+            book.lots[tkr].append([q, c])
+        for tkr, real, div in con.execute("SELECT ticker, realized, dividends FROM pnl"):
+            book.realized[tkr], book.dividends[tkr] = real, div
+        book.fx = dict(con.execute("SELECT currency, rate FROM fx").fetchall())
+        book.sources = {name: (d, n) for name, d, n in con.execute("SELECT name, last_date, seen FROM sources")}
+        for d, tkr, q, c in con.execute("SELECT date, ticker, qty, cash FROM changes"):
+            book.changes[(d, tkr)] = [q, c]
+    return book
+
+def save_book(book, db_path=LEDGER_DB):
+    with closing(_connect(db_path)) as con, con:
+        for table in ("meta", "lots", "pnl", "fx", "sources", "changes"): con.execute(f"DELETE FROM {table}")
+        con.execute("INSERT INTO meta VALUES ('method', ?)", (book.method,))
+        con.executemany("INSERT INTO lots VALUES (?, ?, ?, ?)", [(t, k, q, c) for t, lots in book.lots.items() for k, (q, c) in enumerate(lots)])
+        con.executemany("INSERT INTO pnl VALUES (?, ?, ?)", [(t, book.realized.get(t, 0.0), book.dividends.get(t, 0.0)) for t in set(book.realized) | set(book.dividends)])
+        con.executemany("INSERT INTO fx VALUES (?, ?)", list(book.fx.items()))
+        con.executemany("INSERT INTO sources VALUES (?, ?, ?)", [(n, d, s) for n, (d, s) in book.sources.items()])
+        con.executemany("INSERT INTO changes VALUES (?, ?, ?, ?)", book.change_rows())
+
+def reset_book(db_path=LEDGER_DB):
+    """저장된 상태를 지운다 (원장을 고쳐서 처음부터 다시 넣을 때)."""
+    if os.path.exists(db_path): os.remove(db_path)
+
+def apply_files(book, pf, files, fx_fallback=0.0):
+    """[(원장 이름, 바이너리 파일 객체)] 를 book 의 복사본에 이어 반영한다. → (새 CostBasisBook, 새로 반영한 행 수)
+    읽다가 LedgerError 가 나면 book 은 그대로다 (앱은 세션마다 book 을 들고 이것만 부른다)."""
+    book = copy.deepcopy(book)
+    resolve, currency_of = portfolio_resolver(pf)
+    applied = sum(book.ingest(name, read_trades(fh, resolve, currency_of), fx_fallback) for name, fh in files)
+    return book, applied
+
+def ingest_files(pf, files, method="fifo", fx_fallback=0.0, db_path=LEDGER_DB):
+    """저장된 상태(CLI)에 이어 반영하고 저장한다. → (CostBasisBook, 새로 반영한 행 수)"""
+    book, applied = apply_files(load_book(method, db_path), pf, files, fx_fallback)
+    save_book(book, db_path)
+    return book, applied
+
+def master_input_line(pf, pf_input):
+    """앱 입력칸 형식 한 줄: 현금 + 보유수량(고정 제외) + 평단가 + 실현손익"""
+    values = [pf_input.cash] + list(pf_input.qty[~pf.locked]) + list(pf_input.avg_prices) + list(pf_input.realized)
+    return " ".join(f"{v:.0f}" for v in values)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="증권사 거래내역 CSV 로 보유수량·평단가·실현손익 계산")
+    parser.add_argument("files", nargs="+", help="거래내역 CSV (파일 이름이 원장 이름, 같은 원장을 다시 넣으면 새 거래만 반영)")
+    parser.add_argument("--method", choices=METHODS, default="fifo", help="원가 계산 방식 (fifo = 선입선출, avg = 이동평균)")
+    parser.add_argument("--cash", type=float, default=0.0, help="master_input 에 넣을 예수금 (원)")
+    parser.add_argument("--fx", type=float, default=0.0, help="환율 정보가 없는 외화 거래에 쓸 환율 (기본: 현재 환율)")
+    parser.add_argument("--portfolio", default=PORTFOLIO_FILE, help="포트폴리오 설정 파일")
+    parser.add_argument("--db", default=LEDGER_DB, help="원장 상태 저장 경로")
+    parser.add_argument("--reset", action="store_true", help="저장된 상태를 지우고 처음부터 반영")
+    args = parser.parse_args(argv)
+    if args.reset: reset_book(args.db)
+
+    pf = load_portfolio(args.portfolio)
+    fx = args.fx
+    if fx <= 0:
+        from quotes import get_exchange_rate
+        fx = get_exchange_rate()
+    handles = [open(path, "rb") for path in args.files]
+    try:
+        book, applied = ingest_files(pf, [(os.path.basename(p), fh) for p, fh in zip(args.files, handles)], args.method, fx, args.db)
+    except LedgerError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        for fh in handles: fh.close()
+
+    print(f"새 거래 {applied:,}건 반영" + "".join(f" · {k} {v:,}건" for k, v in book.counts.items() if k != "applied"))
+    for tkr, (qty, avg, real, div) in sorted(book.positions().items()):
+        print(f"{tkr:>12}  수량 {qty:>12,.4g}  평단 ₩{avg:>14,.0f}  실현 ₩{real:>14,.0f}  (배당 ₩{div:,.0f})")
+    print(master_input_line(pf, book.to_input(pf, args.cash)))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
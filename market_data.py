@@ -0,0 +1,109 @@
+import time
+import threading
+from concurrent.futures import Future
+from engine import fetch_snapshot
+from history_store import load_history
+from quotes import get_exchange_rate
+from quote_cache import LIVE_TTL_SEC, open_markets
+from profiling import count
+
+# ==========================================
+# 프로세스 전체가 같이 쓰는 시세/일봉 서비스
+# - 같은 키(티커 묶음)를 동시에 요청하면 먼저 온 요청 하나만 받아 오고 나머지는 그 결과를 기다린다
+# - 돌려주는 일봉(PriceHistory)은 모든 세션이 같은 객체를 공유한다 (배열은 쓰기 금지)
+# - 백그라운드 스레드 하나가 장중에만 시세와 오래된 일봉을 미리 갱신해 둔다
+#   (IDLE_TTL_SEC 동안 아무 세션도 찾지 않은 포트폴리오/일봉은 갱신 대상과 메모리에서 뺀다)
+# ==========================================
+HISTORY_TTL_SEC = 3600     # 일봉은 1시간마다 꼬리만 다시 받는다 (history_store 가 증분으로 받음)
+IDLE_TTL_SEC = 1800        # 이만큼 요청이 없던 키는 백그라운드 갱신을 멈추고 버린다
+
+class MarketDataService:
+    def __init__(self, refresh_sec=LIVE_TTL_SEC, history_ttl=HISTORY_TTL_SEC, idle_ttl=IDLE_TTL_SEC):
+        self.refresh_sec = refresh_sec
+        self.history_ttl = history_ttl
+        self.idle_ttl = idle_ttl
+        self._lock = threading.Lock()
+        self._inflight = {}        # key -> Future (진행 중인 조회)
+        self._history = {}         # (티커 튜플, years) -> (받은 시각, PriceHistory)
+        self._portfolios = {}      # 티커 튜플 -> Portfolio (백그라운드 시세 갱신 대상)
+        self._accessed = {}        # ("snapshot", 티커 튜플) / ("history", 티커 튜플, years) -> 마지막 요청 시각
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _coalesced(self, key, fn):
+        """같은 key 의 조회가 진행 중이면 새로 받지 않고 그 결과를 기다린다."""
+        with self._lock:
+            fut = self._inflight.get(key)
+            owner = fut is None
+            if owner: fut = self._inflight[key] = Future()
+        if not owner:
+            count("market_data_coalesced")
+            return fut.result()
+        try:
+            fut.set_result(fn())
+        except BaseException as e:
+            fut.set_exception(e)
+        finally:
+            with self._lock: self._inflight.pop(key, None)
+        return fut.result()
+
+    # --- 시세 ---
+    def snapshot(self, pf, fx_fallback=get_exchange_rate):
+        """MarketSnapshot (티커별 수명은 quote_cache 가 관리). 처음 본 포트폴리오는 백그라운드 갱신 대상에 넣는다."""
+        with self._lock:
+            self._portfolios.setdefault(pf.tickers, pf)
+            self._accessed[("snapshot", pf.tickers)] = time.time()
+        self._ensure_thread()
+        return self._coalesced(("snapshot", pf.tickers), lambda: fetch_snapshot(pf, fx_fallback=fx_fallback))
+
+    # --- 일봉 ---
+    def history(self, tickers, years=3):
+        """최근 years 년 일봉 PriceHistory. 같은 티커 묶음이면 모든 세션이 같은 객체를 받는다."""
+        key = (tuple(tickers), years)
+        with self._lock: self._accessed[("history",) + key] = time.time()
+        hit = self._history.get(key)
+        if hit and time.time() - hit[0] < self.history_ttl:
+            count("market_data_hit")
+            return hit[1]
+        return self._coalesced(("history",) + key, lambda: self._load_history(key))
+
+    def _load_history(self, key):
+        tickers, years = key
+        hist = load_history(list(tickers), years=years)
+        self._history[key] = (time.time(), hist)
+        return hist
+
+    # --- 백그라운드 갱신 ---
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive(): return
+            self._thread = threading.Thread(target=self._run, name="market-data-refresh", daemon=True)
+            self._thread.start()
+
+    def _evict_idle(self):
+        """idle_ttl 동안 요청이 없던 포트폴리오와 일봉을 갱신 대상·메모리에서 뺀다."""
+        cutoff = time.time() - self.idle_ttl
+        with self._lock:
+            for key in [k for k, t in self._accessed.items() if t < cutoff]:
+                del self._accessed[key]
+                if key[0] == "snapshot": self._portfolios.pop(key[1], None)
+                else: self._history.pop(key[1:], None)
+                count("market_data_evicted")
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_sec):
+            self._evict_idle()
+            with self._lock: portfolios = list(self._portfolios.values())
+            markets = open_markets({c for pf in portfolios for c in pf.countries})
+            if not markets: continue            # 장이 모두 닫혀 있으면 시세도 일봉도 바뀌지 않는다
+            for pf in portfolios:
+                if not open_markets(pf.countries): continue
+                try: self._coalesced(("snapshot", pf.tickers), lambda: fetch_snapshot(pf))
+                except: pass
+            for key, (loaded_at, _) in list(self._history.items()):
+                if time.time() - loaded_at < self.history_ttl: continue
+                try: self._coalesced(("history",) + key, lambda: self._load_history(key))
+                except: pass
+
+    def stop(self):
+        self._stop.set()
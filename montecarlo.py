@@ -0,0 +1,137 @@
+import os
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from valuation import build_price_cube, OHLC_FIELDS
+
+# ==========================================
+# 총자산 미래 전망 (몬테카를로)
+# 종목별 원화 일간 로그수익률(환율 포함)을 과거에서 통째로 뽑거나(bootstrap) 다변량 정규분포로 만들어
+# 현재 보유금액에 누적한다. 경로를 저장하지 않고 날짜별 히스토그램만 더해 가며 백분위를 구한다.
+# ==========================================
+TRADING_DAYS = 252
+CLOSE = OHLC_FIELDS.index("Close")
+PERCENTILES = (5, 25, 50, 75, 95)
+METHODS = ("bootstrap", "mvn")
+HIST_BINS = 512            # 날짜별 히스토그램 칸 수
+HIST_SIGMAS = 6.0          # 날짜별 히스토그램 범위: 예상 평균 ± 6σ (밖은 양 끝 칸에 넣음)
+CHUNK_ELEMS = 4_000_000    # 한 번에 만드는 경로 × 일수 × 종목 원소 수 (float32 ≈ 16MB)
+MVN_MAX_STEPS = 126        # mvn 은 k 일 합이 정확히 N(kμ, kΣ) 이므로 경로당 이 개수 이하의 시점만 뽑고 사이 날짜는 보간
+
+_pool = None               # (ProcessPoolExecutor, 작업자 수)
+_pool_lock = threading.Lock()
+
+def _get_pool(workers):
+    """프로세스 풀은 한 번 만들어 계속 쓴다 (spawn: Streamlit 스레드에서 fork 하지 않음).
+    작업자 수가 바뀌면 새로 만들고, 옛 풀은 맡은 일만 끝내고 닫힌다."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool[1] != workers:
+            if _pool is not None: _pool[0].shutdown(wait=False)
+            _pool = (ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")), workers)
+        return _pool[0]
+
+@atexit.register
+def _shutdown_pool():
+    with _pool_lock:
+        if _pool is not None: _pool[0].shutdown(wait=False, cancel_futures=True)
+
+def fit_inputs(pf, hist, amounts):
+    """보유금액이 있는 종목만 골라 (과거 일수 × 종목) 원화 로그수익률과 현재 보유금액을 돌려준다."""
+    closes = build_price_cube(hist, pf.tickers, pf.usd)[:, :, CLOSE]
+    held = np.asarray(amounts, dtype=float) > 0
+    closes = closes[:, held]
+    valid = (closes[1:] > 0) & (closes[:-1] > 0)
+    log_ret = np.where(valid, np.log(np.where(valid, closes[1:], 1.0) / np.where(valid, closes[:-1], 1.0)), 0.0)
+    return log_ret, np.asarray(amounts, dtype=float)[held]
+
+def _bin_edges(log_ret, weights, cash, t):
+    """시점 t (영업일 수 배열) 의 log(V_t / V_0) 히스토그램 범위. 과거 포트폴리오 일간 로그수익률의 평균/표준편차로 잡는다."""
+    v0 = weights.sum() + cash
+    port = np.log((np.exp(log_ret) @ weights + cash) / v0)
+    mu, sigma = port.mean(), max(port.std(), 1e-6)
+    return mu * t - HIST_SIGMAS * sigma * np.sqrt(t), mu * t + HIST_SIGMAS * sigma * np.sqrt(t)
+
+def _simulate(seed, n_paths, days, method, log_ret, weights, cash, lo, hi, step=1):
+    """n_paths 경로를 CHUNK_ELEMS 단위로 만들고 (days × HIST_BINS) 히스토그램 카운트만 돌려준다.
+    mvn 은 한 칸이 step 영업일이다 (bootstrap 은 항상 1일)."""
+    rng = np.random.default_rng(seed)
+    n_assets = log_ret.shape[1]
+    r32 = log_ret.astype(np.float32)
+    w32 = weights.astype(np.float32)
+    v0 = weights.sum() + cash
+    if method == "mvn":
+        mean = (log_ret.mean(axis=0) * step).astype(np.float32)
+        cov = np.cov(log_ret, rowvar=False).reshape(n_assets, n_assets)
+        chol = (np.linalg.cholesky(cov + np.eye(n_assets) * 1e-12).T * np.sqrt(step)).astype(np.float32)
+
+    counts = np.zeros(days * HIST_BINS, dtype=np.int64)
+    offsets = (np.arange(days) * HIST_BINS)[None, :]
+    scale = (HIST_BINS / (hi - lo))[None, :]
+    chunk = max(CHUNK_ELEMS // max(days * n_assets, 1), 1)
+    for start in range(0, n_paths, chunk):
+        n = min(chunk, n_paths - start)
+        if method == "mvn":
+            paths = rng.standard_normal((n, days, n_assets), dtype=np.float32) @ chol
+            paths += mean
+        else:
+            paths = r32[rng.integers(0, len(r32), size=(n, days))]
+        np.cumsum(paths, axis=1, out=paths)
+        np.exp(paths, out=paths)
+        value = paths @ w32 + np.float32(cash)                       # (n, days)
+        b = ((np.log(value / v0) - lo[None, :]) * scale).astype(np.int64)
+        np.clip(b, 0, HIST_BINS - 1, out=b)
+        counts += np.bincount((b + offsets).ravel(), minlength=days * HIST_BINS)
+    return counts.reshape(days, HIST_BINS)
+
+def _percentiles(counts, lo, hi, qs):
+    """날짜별 히스토그램에서 백분위 (칸 안은 선형 보간). 결과는 log(V_t / V_0)."""
+    cum = np.cumsum(counts, axis=1)
+    total = cum[:, -1:]
+    width = (hi - lo) / HIST_BINS
+    out = np.empty((len(counts), len(qs)))
+    for j, q in enumerate(qs):
+        target = total[:, 0] * q / 100
+        k = np.minimum((cum < target[:, None]).sum(axis=1), HIST_BINS - 1)
+        rows = np.arange(len(counts))
+        before = np.where(k > 0, cum[rows, np.maximum(k - 1, 0)], 0)
+        inside = np.divide(target - before, counts[rows, k], out=np.full(len(k), 0.5), where=counts[rows, k] > 0)
+        out[:, j] = lo + (k + np.clip(inside, 0, 1)) * width
+    return out
+
+def project(pf, hist, amounts, cash, years=1, n_paths=20000, method="bootstrap", seed=0, workers=None):
+    """현재 보유금액(amounts, 원화)과 예수금(cash, 그대로 유지)으로 years 년 뒤까지 총자산 백분위.
+    (미래 영업일 × PERCENTILES) DataFrame. 작업은 workers 개 프로세스에 나눠 돌리고 결과 히스토그램을 더한다."""
+    log_ret, weights = fit_inputs(pf, hist, amounts)
+    v0 = weights.sum() + cash
+    if v0 <= 0 or len(log_ret) < 2: return None
+    days = TRADING_DAYS * years
+    index = pd.bdate_range(hist.index[-1] + pd.Timedelta(days=1), periods=days)
+    if len(weights) == 0:
+        return pd.DataFrame(cash, index=index, columns=[f"p{q}" for q in PERCENTILES])
+
+    step = -(-days // MVN_MAX_STEPS) if method == "mvn" else 1
+    t = np.arange(step, days + step, step)                             # 시뮬레이션 시점 (마지막은 days 이상)
+    lo, hi = _bin_edges(log_ret, weights, cash, t)
+    workers = workers or os.cpu_count() or 1
+    n_tasks = min(workers, max(n_paths // 2000, 1))
+    split = np.array_split(np.arange(n_paths), n_tasks)
+    seeds = np.random.SeedSequence(seed).spawn(n_tasks)
+    args = [(s, len(part), len(t), method, log_ret, weights, cash, lo, hi, step) for s, part in zip(seeds, split)]
+
+    counts = np.zeros((len(t), HIST_BINS), dtype=np.int64)
+    if n_tasks == 1:
+        counts += _simulate(*args[0])
+    else:
+        pool = _get_pool(workers)
+        for fut in as_completed([pool.submit(_simulate, *a) for a in args]):
+            counts += fut.result()
+
+    pct = _percentiles(counts, lo, hi, PERCENTILES)
+    if step > 1:                                                       # 시점 사이 날짜는 로그 백분위를 선형 보간 (0일은 0)
+        pct = np.column_stack([np.interp(np.arange(1, days + 1), np.r_[0, t], np.r_[0.0, col]) for col in pct.T])
+    fan = v0 * np.exp(pct)
+    return pd.DataFrame(fan, index=index, columns=[f"p{q}" for q in PERCENTILES])
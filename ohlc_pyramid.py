@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+from price_history import OHLC_FIELDS
+from profiling import count
+
+# ==========================================
+# 캔들 차트용 다중 해상도 OHLC (일봉 → 주봉 → 월봉)
+# 일봉 평가금액 위에 주봉/월봉을 미리 묶어 두고, 보이는 구간에 들어갈 봉 수가
+# VISIBLE_CANDLES 이하인 가장 촘촘한 해상도만 브라우저로 보낸다.
+# 새 봉이 붙거나 3년 창 앞이 잘리면 양 끝 구간만 다시 묶는다.
+# ==========================================
+RESOLUTIONS = {"D": "일봉", "W": "주봉", "M": "월봉"}
+CHART_RANGES = {"3개월": 92, "1년": 366, "3년": 1100, "전체": None}    # 보이는 구간 (달력 일수, None = 전체)
+VISIBLE_CANDLES = 160      # 보이는 구간에 이보다 많은 봉이 들어가면 한 단계 거친 해상도로
+PAN_FACTOR = 4             # 보이는 구간의 몇 배까지 보내서 끌어 보기(pan)를 허용할지
+
+def _bucket_keys(index, res):
+    """날짜마다 묶음 번호 (W: 그 주 월요일, M: 연*12+월)"""
+    if res == "W": return (index.normalize() - pd.to_timedelta(index.weekday, unit="D")).asi8
+    return index.year.to_numpy() * 12 + index.month.to_numpy()
+
+def aggregate(frame, res):
+    """일봉 OHLC DataFrame 을 res 단위로 묶는다. 봉 날짜는 구간의 첫 거래일."""
+    if res == "D" or len(frame) == 0: return frame
+    keys = _bucket_keys(frame.index, res)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)] - 1
+    o, h, l, c = (frame[f].to_numpy(dtype=float) for f in OHLC_FIELDS)
+    values = np.column_stack([o[starts], np.maximum.reduceat(h, starts), np.minimum.reduceat(l, starts), c[ends]])
+    return pd.DataFrame(values, index=frame.index[starts], columns=OHLC_FIELDS)
+
+class OhlcPyramid:
+    """OhlcPyramid().update(daily).view(visible_days) → (해상도, 보낼 봉 DataFrame)
+    daily 의 마지막 봉은 장중 값일 수 있으므로 다음 update 때 그 봉이 든 구간을 항상 다시 묶는다."""
+
+    def __init__(self):
+        self.daily = None
+        self.levels = {}
+
+    def level(self, res):
+        return self.daily if res == "D" else self.levels[res]
+
+    def _rebuild(self, daily):
+        count("pyramid_full")
+        self.daily = daily
+        self.levels = {res: aggregate(daily, res) for res in RESOLUTIONS if res != "D"}
+        return self
+
+    def update(self, daily):
+        old = self.daily
+        if old is None or len(old) < 2 or len(daily) < 2 or list(old.columns) != list(daily.columns):
+            return self._rebuild(daily)
+        start = int(old.index.searchsorted(daily.index[0]))
+        keep = len(old) - 1 - start              # 그대로 믿을 확정 봉 수 (이전 마지막 봉 제외)
+        if keep < 1 or len(daily) < keep or not daily.index[:keep].equals(old.index[start:start + keep]):
+            return self._rebuild(daily)
+        if not np.allclose(daily.to_numpy(dtype=float)[:keep], old.to_numpy(dtype=float)[start:start + keep], rtol=1e-9, atol=0):
+            return self._rebuild(daily)
+
+        count("pyramid_incremental")
+        first, tail_from = daily.index[0], old.index[-1]
+        for res, lvl in self.levels.items():
+            # 창 앞이 잘려 반쪽이 된 첫 구간과, 이전 마지막 봉이 들어 있던 구간부터는 다시 묶는다
+            tail_start = lvl.index[lvl.index.searchsorted(tail_from, side="right") - 1]
+            mid = lvl[(lvl.index >= first) & (lvl.index < tail_start)]
+            if len(mid):
+                parts = [aggregate(daily[daily.index < mid.index[0]], res), mid, aggregate(daily[daily.index >= tail_start], res)]
+                self.levels[res] = pd.concat([p for p in parts if len(p)])
+            else:
+                self.levels[res] = aggregate(daily, res)
+        self.daily = daily
+        return self
+
+    def pick(self, visible_days, max_candles=VISIBLE_CANDLES):
+        """보이는 구간에 봉이 max_candles 개 이하로 들어가는 가장 촘촘한 해상도"""
+        for res in RESOLUTIONS:
+            lvl = self.level(res)
+            n = len(lvl) if visible_days is None else int((lvl.index >= lvl.index[-1] - pd.Timedelta(days=visible_days)).sum())
+            if n <= max_candles: return res
+        return res
+
+    def view(self, visible_days, pan=PAN_FACTOR):
+        """(해상도, 보이는 구간의 pan 배까지 자른 봉 DataFrame)"""
+        res = self.pick(visible_days)
+        lvl = self.level(res)
+        if visible_days is None or len(lvl) == 0: return res, lvl
+        return res, lvl[lvl.index >= lvl.index[-1] - pd.Timedelta(days=visible_days * pan)]
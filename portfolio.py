@@ -0,0 +1,149 @@
+import os
+import tomllib
+from dataclasses import dataclass
+import numpy as np
+
+# ==========================================
+# 포트폴리오 설정 파일 (portfolio.toml) 로더
+# ==========================================
+PORTFOLIO_FILE = os.environ.get("PORTFOLIO_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "portfolio.toml"))
+
+@dataclass(frozen=True)
+class Category:
+    name: str          # 표/필터에 쓰는 이름 (국장, 미장, 현금성 …)
+    code: str          # cat_stats 키 (KR, US, ETF …)
+    base: str          # 종목 ratio 기준: "budget" = 리밸런싱 예산, "invest" = 투자 예산
+    button: str
+    label: str
+    area_label: str
+    area_color: str
+
+@dataclass(frozen=True, eq=False)
+class Portfolio:
+    """종목별 속성을 같은 순서의 튜플/배열로 들고 있는 읽기 전용 포트폴리오."""
+    names: tuple
+    aliases: tuple
+    tickers: tuple
+    countries: tuple
+    labels: tuple
+    colors: tuple
+    cat_idx: np.ndarray       # 종목별 categories 인덱스
+    ratios: np.ndarray
+    locked: np.ndarray        # 매매불가(고정) 종목 여부
+    locked_qty: np.ndarray
+    categories: tuple         # Category 목록
+    invest_share: float
+    cash_share: float
+    invest_display: float
+    cash_label: str
+    cash_color: str
+    fee_rate: float           # 리밸런싱 수량 계산 시 매매금액 대비 수수료율
+    min_trade: float          # 이 금액 미만 매매는 하지 않음
+    benchmark: str            # 리스크 패널 베타 기준 티커 ("" = 없음)
+    benchmark_usd: bool
+    risk_window: int          # 롤링 샤프 창 (거래일)
+    var_level: float
+
+    def __len__(self):
+        return len(self.tickers)
+
+    @property
+    def usd(self):
+        return np.array([c == "US" for c in self.countries])
+
+    @property
+    def category_names(self):
+        return [self.categories[k].name for k in self.cat_idx]
+
+    @property
+    def input_size(self):
+        """master_input 숫자 개수: 현금 1 + 보유수량(고정 제외) + 평단가 + 실현손익"""
+        return 1 + int((~self.locked).sum()) + 2 * len(self)
+
+    def category(self, name):
+        return next(c for c in self.categories if c.name == name)
+
+    def target_costs(self, rebalance_budget):
+        """종목별 목표금액과 표시용 목표비중 (고정 종목은 0)"""
+        invest = np.array([self.categories[k].base == "invest" for k in self.cat_idx])
+        costs = np.where(invest, rebalance_budget * self.invest_share, rebalance_budget) * self.ratios
+        shown = np.where(invest, self.invest_display, 1.0) * self.ratios
+        return np.where(self.locked, 0.0, costs), np.where(self.locked, 0.0, shown)
+
+    def brand_meta(self):
+        meta = {n: {"name": l, "color": c} for n, l, c in zip(self.names, self.labels, self.colors)}
+        meta["예수금"] = {"name": self.cash_label, "color": self.cash_color}
+        return meta
+
+@dataclass(frozen=True, eq=False)
+class PortfolioInput:
+    cash: float
+    qty: np.ndarray           # 전 종목 보유수량 (고정 종목은 설정값)
+    avg_prices: np.ndarray
+    realized: np.ndarray
+
+def load_portfolio(path=PORTFOLIO_FILE):
+    with open(path, "rb") as f:
+        cfg = tomllib.load(f)
+
+    categories = tuple(Category(
+        name=c["name"], code=c["code"], base=c.get("base", "invest"),
+        button=c.get("button", c["name"]), label=c.get("label", f"{c['name']} 총합"),
+        area_label=c.get("area_label", c["name"]), area_color=c.get("area_color", "#9E9E9E"),
+    ) for c in cfg["categories"])
+    cat_names = [c.name for c in categories]
+
+    holdings = cfg["holdings"]
+    tickers = [h["ticker"] for h in holdings]
+    if len(set(tickers)) != len(tickers):
+        raise ValueError(f"{path}: 중복된 티커가 있습니다")
+    for h in holdings:
+        if h["category"] not in cat_names:
+            raise ValueError(f"{path}: {h['name']} 의 카테고리 '{h['category']}' 가 categories 에 없습니다")
+        if h.get("locked") and "qty" not in h:
+            raise ValueError(f"{path}: 고정 종목 {h['name']} 에 qty 가 없습니다")
+
+    budget = cfg.get("budget", {})
+    cash = cfg.get("cash", {})
+    rebalance = cfg.get("rebalance", {})
+    risk = cfg.get("risk", {})
+    return Portfolio(
+        names=tuple(h["name"] for h in holdings),
+        aliases=tuple(h.get("alias", h["name"]) for h in holdings),
+        tickers=tuple(tickers),
+        countries=tuple(h["country"] for h in holdings),
+        labels=tuple(h.get("label", h["name"]) for h in holdings),
+        colors=tuple(h.get("color", "#9E9E9E") for h in holdings),
+        cat_idx=np.array([cat_names.index(h["category"]) for h in holdings], dtype=np.intp),
+        ratios=np.array([float(h.get("ratio", 0.0)) for h in holdings]),
+        locked=np.array([bool(h.get("locked", False)) for h in holdings]),
+        locked_qty=np.array([int(h.get("qty", 0)) if h.get("locked") else 0 for h in holdings], dtype=np.int64),
+        categories=categories,
+        invest_share=float(budget.get("invest", 1.0)),
+        cash_share=float(budget.get("cash", 0.0)),
+        invest_display=float(budget.get("invest_display", budget.get("invest", 1.0))),
+        cash_label=cash.get("label", "💵 예수금"),
+        cash_color=cash.get("color", "#85BB65"),
+        fee_rate=float(rebalance.get("fee_rate", 0.0)),
+        min_trade=float(rebalance.get("min_trade", 0.0)),
+        benchmark=risk.get("benchmark", ""),
+        benchmark_usd=risk.get("benchmark_country", "KR") == "US",
+        risk_window=int(risk.get("window", 63)),
+        var_level=float(risk.get("var_level", 0.95)),
+    )
+
+def parse_master_input(pf, text):
+    """'현금 보유수량… 평단가… 실현손익…' 한 줄을 PortfolioInput 으로. 숫자가 아니면 ValueError.
+    모자란 숫자는 0 으로 채운다."""
+    values = np.array(text.replace(",", "").split(), dtype=float) if text.strip() else np.zeros(0)
+    values = np.concatenate([values, np.zeros(max(pf.input_size - len(values), 0))])
+
+    n, n_free = len(pf), int((~pf.locked).sum())
+    qty = pf.locked_qty.copy()
+    qty[~pf.locked] = values[1:1 + n_free].astype(np.int64)
+    return PortfolioInput(
+        cash=float(values[0]),
+        qty=qty,
+        avg_prices=values[1 + n_free:1 + n_free + n],
+        realized=values[1 + n_free + n:1 + n_free + 2 * n],
+    )
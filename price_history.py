@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# 메모리 일봉 컨테이너: (필드 × 날짜 × 티커) 연속 배열 하나 + 공유 날짜 인덱스
+# yf.download 의 MultiIndex 프레임 대신 쓰며, 쓰지 않는 Volume/Adj Close 는 담지 않는다.
+# 배열은 쓰기 금지로 만들어 세션/스레드가 같은 객체를 그대로 공유한다.
+# ==========================================
+OHLC_FIELDS = ["Open", "High", "Low", "Close"]
+
+def _ffill(a):
+    rows = np.arange(len(a))[:, None]
+    idx = np.where(np.isnan(a), 0, rows)
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    return a[idx, np.arange(a.shape[1])[None, :]]
+
+def _ffill_bfill(a):
+    """(날짜 × 열) 배열을 열마다 앞 값으로, 그래도 비면 뒤 값으로 채운다 (DataFrame.ffill().bfill() 과 같음)."""
+    if len(a) == 0: return a
+    return _ffill(_ffill(a)[::-1])[::-1]
+
+class PriceHistory:
+    """index: 날짜(DatetimeIndex), tickers: 티커 튜플, data: (필드 × 날짜 × 티커) 읽기 전용 배열 (없는 칸은 NaN)"""
+    __slots__ = ("index", "tickers", "fields", "data", "_col")
+
+    def __init__(self, index, tickers, data, fields=OHLC_FIELDS):
+        data = np.ascontiguousarray(data)
+        if data.shape != (len(fields), len(index), len(tickers)):
+            raise ValueError(f"PriceHistory: 배열 모양 {data.shape} 이 (필드 {len(fields)}, 날짜 {len(index)}, 티커 {len(tickers)}) 와 다릅니다")
+        data.flags.writeable = False
+        self.index = pd.DatetimeIndex(index)
+        self.tickers = tuple(tickers)
+        self.fields = tuple(fields)
+        self.data = data
+        self._col = {t: k for k, t in enumerate(self.tickers)}
+
+    @classmethod
+    def from_rows(cls, rows, tickers, dtype=np.float32):
+        """[(날짜 문자열, 티커, 시가, 고가, 저가, 종가), ...] (SQLite 행) 으로 만든다. tickers 순서 그대로."""
+        tickers = list(tickers)
+        if not rows:
+            return cls(pd.DatetimeIndex([], name="Date"), tickers, np.empty((len(OHLC_FIELDS), 0, len(tickers)), dtype=dtype))
+        dates, tkrs, *values = zip(*rows)
+        uniq, d_idx = np.unique(np.array(dates), return_inverse=True)
+        col = {t: k for k, t in enumerate(tickers)}
+        t_idx = np.fromiter((col[t] for t in tkrs), dtype=np.intp, count=len(tkrs))
+        data = np.full((len(OHLC_FIELDS), len(uniq), len(tickers)), np.nan, dtype=dtype)
+        data[:, d_idx, t_idx] = np.array(values, dtype=float)
+        return cls(pd.DatetimeIndex(pd.to_datetime(uniq), name="Date"), tickers, data)
+
+    @classmethod
+    def from_frame(cls, df, tickers=None, dtype=np.float32):
+        """yf.download 형식 (Price, Ticker) 컬럼 프레임에서 OHLC 만 꺼낸다."""
+        if isinstance(df.columns, pd.MultiIndex):
+            tickers = list(tickers or dict.fromkeys(df.columns.get_level_values(1)))
+            cols = pd.MultiIndex.from_product([OHLC_FIELDS, tickers])
+            flat = df.reindex(columns=cols).to_numpy(dtype=dtype)
+            data = flat.reshape(len(df), len(OHLC_FIELDS), len(tickers)).transpose(1, 0, 2)
+        else:
+            tickers = list(tickers or ["?"])[:1]
+            data = df.reindex(columns=OHLC_FIELDS).to_numpy(dtype=dtype).T[:, :, None]
+        return cls(df.index, tickers, data)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, ticker):
+        return ticker in self._col
+
+    @property
+    def shape(self):
+        return len(self.index), len(self.tickers)
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes + self.index.nbytes
+
+    def column(self, field, ticker):
+        """한 티커 한 필드 (읽기 전용 뷰, 없는 티커면 None)"""
+        k = self._col.get(ticker)
+        return None if k is None else self.data[self.fields.index(field), :, k]
+
+    def block(self, tickers, fields=OHLC_FIELDS, fill=True):
+        """(날짜 × 티커 × 필드) float64 배열. 없는 티커는 NaN 열. fill 이면 티커·필드별 ffill → bfill."""
+        cols = np.array([self._col.get(t, -1) for t in tickers], dtype=np.intp)
+        f_idx = [self.fields.index(f) for f in fields]
+        out = self.data[np.ix_(f_idx, np.arange(len(self.index)), np.maximum(cols, 0))].astype(float)
+        out[:, :, cols < 0] = np.nan
+        out = out.transpose(1, 2, 0)
+        if fill and len(out):
+            d, t, f = out.shape
+            out = _ffill_bfill(out.reshape(d, t * f)).reshape(d, t, f)
+        return out
@@ -0,0 +1,154 @@
+import io
+import time
+import pstats
+import cProfile
+import threading
+import contextvars
+from collections import Counter
+from contextlib import contextmanager
+
+# ==========================================
+# 단계별 계측 (벽시계 시간, 시점 표시, yfinance 호출/응답 크기, 캐시 적중)
+# 실행 중인 ProfileRun 은 contextvar 로 찾으므로 계측 지점은 Streamlit 을 몰라도 된다.
+# ==========================================
+CAPTURE_MODES = ("끄기", "cProfile", "pyinstrument")
+_current = contextvars.ContextVar("profile_run", default=None)
+
+class ProfileRun:
+    """begin_run(...) 으로 시작해 end() 로 끝낸다. with 로 쓰면 st.stop()/st.rerun() 같은 예외로 빠져나가도 끝난다."""
+
+    def __init__(self, name, capture="끄기"):
+        self.name = name
+        self.capture = capture
+        self.stages = []            # {"stage", "wall_ms", 카운터…}
+        self.marks = {}             # 시점 이름 -> 시작부터 ms (예: 첫 화면)
+        self.totals = Counter()
+        self.wall_ms = 0.0
+        self.profile_text = ""
+        self._open = []
+        self._lock = threading.Lock()
+        self._profiler = None
+        self._token = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.end()
+        return False
+
+    def start(self):
+        if self.capture == "cProfile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self.capture == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+                self._profiler = Profiler()
+                self._profiler.start()
+            except ImportError:
+                self.profile_text = "pyinstrument 가 설치되어 있지 않습니다 (pip install pyinstrument)"
+        self._token = _current.set(self)
+        self._t0 = time.perf_counter()
+        return self
+
+    def end(self):
+        """계측을 멈춘다. 이미 끝났으면 아무것도 하지 않는다 (finally/with 에서 다시 불러도 됨)."""
+        if self._token is None: return self
+        self.wall_ms = (time.perf_counter() - self._t0) * 1000
+        try: _current.reset(self._token)
+        except (ValueError, RuntimeError): _current.set(None)     # 다른 context 에서 끝내는 경우
+        self._token = None
+        if isinstance(self._profiler, cProfile.Profile):
+            self._profiler.disable()
+            out = io.StringIO()
+            pstats.Stats(self._profiler, stream=out).sort_stats("cumulative").print_stats(40)
+            self.profile_text = out.getvalue()
+        elif self._profiler is not None:
+            self._profiler.stop()
+            self.profile_text = self._profiler.output_text(unicode=True)
+        self._profiler = None
+        return self
+
+    def count(self, key, n=1):
+        with self._lock:
+            self.totals[key] += n
+            if self._open: self._open[-1][key] += n
+
+    def mark(self, name):
+        self.marks[name] = (time.perf_counter() - self._t0) * 1000
+
+    @contextmanager
+    def stage(self, name):
+        counters = Counter()
+        with self._lock: self._open.append(counters)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall_ms = (time.perf_counter() - t0) * 1000
+            with self._lock:
+                self._open.remove(counters)
+                self.stages.append({"stage": name, "wall_ms": wall_ms, **counters})
+
+    def to_dict(self):
+        return {
+            "run": self.name, "wall_ms": self.wall_ms, "capture": self.capture,
+            "stages": self.stages, "marks": self.marks, "totals": dict(self.totals), "profile": self.profile_text,
+        }
+
+def begin_run(name, capture="끄기"):
+    return ProfileRun(name, capture).start()
+
+@contextmanager
+def stage(name):
+    """실행 중인 ProfileRun 이 없으면 아무것도 하지 않는다."""
+    run = _current.get()
+    if run is None:
+        yield
+        return
+    with run.stage(name):
+        yield
+
+def count(key, n=1):
+    run = _current.get()
+    if run is not None: run.count(key, n)
+
+def mark(name):
+    """실행 중인 ProfileRun 에 '시작부터 지금까지' 시점을 남긴다."""
+    run = _current.get()
+    if run is not None: run.mark(name)
+
+def submit(pool, fn, *args):
+    """스레드 풀 작업에도 현재 ProfileRun 이 보이도록 context 를 복사해 넘긴다."""
+    return pool.submit(contextvars.copy_context().run, fn, *args)
+
+# ==========================================
+# yfinance 호출 계측: 호출 수와 받은 프레임 크기(bytes)
+# ==========================================
+def _frame_bytes(df):
+    try: return int(df.memory_usage(deep=False).sum())
+    except: return 0
+
+def install_network_meter():
+    """yf.download / Ticker.history 를 한 번만 감싼다 (여러 번 불러도 안전).
+    yfinance 는 여기서 처음 불러오므로 이 모듈만 import 해서는 무거운 라이브러리가 따라오지 않는다."""
+    import yfinance as yf
+    if getattr(yf.download, "_metered", False): return
+
+    download = yf.download
+    def metered_download(*args, **kwargs):
+        df = download(*args, **kwargs)
+        count("net_calls")
+        count("net_bytes", _frame_bytes(df))
+        return df
+    metered_download._metered = True
+    yf.download = metered_download
+
+    history = yf.Ticker.history
+    def metered_history(self, *args, **kwargs):
+        df = history(self, *args, **kwargs)
+        count("net_calls")
+        count("net_bytes", _frame_bytes(df))
+        return df
+    yf.Ticker.history = metered_history
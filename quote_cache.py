@@ -0,0 +1,148 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import closing
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from profiling import count
+
+# ==========================================
+# 장 운영시간 (공휴일은 고려하지 않음)
+# ==========================================
+KST = timezone(timedelta(hours=9))
+NY = ZoneInfo("America/New_York")
+
+# (시작, 종료) 현지 시각, 분 단위
+KRX_HOURS = (9 * 60, 15 * 60 + 30)
+US_HOURS = {"pre": (4 * 60, 9 * 60 + 30), "regular": (9 * 60 + 30, 16 * 60), "post": (16 * 60, 20 * 60)}
+
+LIVE_TTL_SEC = 60         # 장중에는 1분
+FX_TTL_SEC = 600          # 환율은 평일 내내 움직이므로 10분
+CLOSE_GRACE_MIN = 30      # 장 마감 직후에는 종가가 늦게 확정되므로 이 동안은 장중처럼 짧게 캐시 (국장 16:00 까지)
+
+def _minutes(dt):
+    return dt.hour * 60 + dt.minute
+
+def market_session(country, now=None):
+    """'regular' / 'pre' / 'post' / 'closed' 중 하나"""
+    now = now or datetime.now(timezone.utc)
+    if country == "KR":
+        local = now.astimezone(KST)
+        if local.weekday() < 5 and KRX_HOURS[0] <= _minutes(local) < KRX_HOURS[1]: return "regular"
+        return "closed"
+    if country == "FX":
+        return "regular" if now.astimezone(NY).weekday() < 5 else "closed"
+    local = now.astimezone(NY)
+    if local.weekday() < 5:
+        for name, (start, end) in US_HOURS.items():
+            if start <= _minutes(local) < end: return name
+    return "closed"
+
+def open_markets(countries, now=None):
+    """countries 중 지금 거래 중(프리/애프터 포함)인 시장"""
+    return sorted({c for c in countries if market_session(c, now) != "closed"})
+
+def next_open(country, now=None):
+    """다음 장 시작 시각 (미장은 프리마켓 시작 기준)"""
+    now = now or datetime.now(timezone.utc)
+    tz, open_min = (KST, KRX_HOURS[0]) if country == "KR" else (NY, US_HOURS["pre"][0] if country != "FX" else 0)
+    local = now.astimezone(tz)
+    day = local.replace(hour=open_min // 60, minute=open_min % 60, second=0, microsecond=0)
+    if day <= local: day += timedelta(days=1)
+    while day.weekday() >= 5: day += timedelta(days=1)
+    return day
+
+def _after_close(country, now):
+    """장 마감(미장은 애프터마켓 마감) 후 CLOSE_GRACE_MIN 분 안인지"""
+    if country == "FX": return False
+    tz, close_min = (KST, KRX_HOURS[1]) if country == "KR" else (NY, US_HOURS["post"][1])
+    local = now.astimezone(tz)
+    return local.weekday() < 5 and close_min <= _minutes(local) < close_min + CLOSE_GRACE_MIN
+
+def quote_ttl(country, now=None):
+    """지금 받은 시세를 몇 초 동안 재사용해도 되는지"""
+    now = now or datetime.now(timezone.utc)
+    if market_session(country, now) != "closed":
+        return FX_TTL_SEC if country == "FX" else LIVE_TTL_SEC
+    if _after_close(country, now): return LIVE_TTL_SEC
+    return max((next_open(country, now) - now).total_seconds(), LIVE_TTL_SEC)
+
+# ==========================================
+# 2단 캐시: 프로세스 내 LRU + 재시작에도 남는 디스크(SQLite)
+# ==========================================
+QUOTE_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "quotes.sqlite")
+
+class QuoteCache:
+    def __init__(self, db_path=QUOTE_DB, max_entries=512):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._mem = OrderedDict()   # ticker -> (expires_at, quote)
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        con = sqlite3.connect(self.db_path, timeout=30)
+        con.execute("CREATE TABLE IF NOT EXISTS quotes (ticker TEXT PRIMARY KEY, quote TEXT, expires_at REAL)")
+        return con
+
+    def _remember(self, tkr, expires_at, quote):
+        with self._lock:
+            self._mem[tkr] = (expires_at, quote)
+            self._mem.move_to_end(tkr)
+            while len(self._mem) > self.max_entries: self._mem.popitem(last=False)
+
+    def get(self, tkr):
+        now = time.time()
+        with self._lock:
+            hit = self._mem.get(tkr)
+            if hit and hit[0] > now:
+                self._mem.move_to_end(tkr)
+                return hit[1]
+        try:
+            with closing(self._connect()) as con:
+                row = con.execute("SELECT quote, expires_at FROM quotes WHERE ticker = ?", (tkr,)).fetchone()
+        except sqlite3.Error:
+            return None
+        if row and row[1] > now:
+            quote = tuple(json.loads(row[0]))
+            self._remember(tkr, row[1], quote)
+            return quote
+        return None
+
+    def put_many(self, quotes, countries):
+        now = time.time()
+        rows = []
+        for tkr, quote in quotes.items():
+            expires_at = now + quote_ttl(countries.get(tkr, "US"))
+            quote = tuple(float(v) for v in quote)
+            self._remember(tkr, expires_at, quote)
+            rows.append((tkr, json.dumps(quote), expires_at))
+        try:
+            with closing(self._connect()) as con, con:
+                con.executemany("INSERT OR REPLACE INTO quotes VALUES (?, ?, ?)", rows)
+        except sqlite3.Error:
+            pass
+
+    def get_many(self, specs, fetch):
+        """캐시에 없는 티커만 fetch(specs) -> (quotes, failed) 로 받아 채운다. 반환 형식은 fetch 와 같다."""
+        specs = list(dict.fromkeys(specs))
+        quotes = {}
+        missing = []
+        for tkr, country in specs:
+            hit = self.get(tkr)
+            if hit is not None: quotes[tkr] = hit
+            else: missing.append((tkr, country))
+        count("quote_cache_hit", len(quotes))
+        count("quote_cache_miss", len(missing))
+        failed = []
+        if missing:
+            fetched, failed = fetch(missing)
+            quotes.update(fetched)
+            good = {tkr: q for tkr, q in fetched.items() if tkr not in failed and q[0] > 0}
+            self.put_many(good, dict(missing))
+        return quotes, failed
+
+QUOTE_CACHE = QuoteCache()
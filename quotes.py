@@ -0,0 +1,114 @@
+import yfinance as yf
+import pandas as pd
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, wait
+from profiling import submit
+
+# ==========================================
+# 실시간 시세 조회 (Streamlit 없이도 사용)
+# ==========================================
+def get_exchange_rate():
+    try: 
+        hist = yf.Ticker("KRW=X").history(period="5d")
+        return hist['Close'].dropna().iloc[-1]
+    except: 
+        return 1400.0
+
+def _fetch_price_and_change(ticker, country):
+    stock = yf.Ticker(ticker)
+    hist = stock.history(period="7d")
+    
+    if len(hist) >= 3:
+        d2_close = hist['Close'].iloc[-3]
+        d1_close = hist['Close'].iloc[-2]
+        prev_change_pct = ((d1_close - d2_close) / d2_close) * 100
+    else:
+        d2_close = 0
+        d1_close = stock.fast_info.get('previous_close', 0)
+        prev_change_pct = 0.0
+
+    if country == "KR":
+        try: current_price = stock.fast_info['last_price']
+        except: current_price = hist['Close'].iloc[-1] if not hist.empty else 0
+    else:
+        df_intra = stock.history(period="1d", interval="1m", prepost=True)
+        if not df_intra.empty: current_price = df_intra['Close'].iloc[-1]
+        else: current_price = stock.fast_info.get('last_price', d1_close)
+
+    if d1_close > 0 and current_price > 0: change_pct = ((current_price - d1_close) / d1_close) * 100
+    else: change_pct = 0.0
+    
+    return current_price, change_pct, d1_close, prev_change_pct, d2_close
+
+EMPTY_QUOTE = (0, 0.0, 0, 0.0, 0)
+
+def get_real_price_and_change(ticker, country):
+    try: return _fetch_price_and_change(ticker, country)
+    except: return EMPTY_QUOTE
+
+QUOTE_MAX_WORKERS = 16
+QUOTE_TIMEOUT_SEC = 10
+
+def get_all_quotes(specs, timeout=QUOTE_TIMEOUT_SEC):
+    """[(ticker, country), ...] 를 스레드 풀로 동시에 조회한다.
+    반환값: ({ticker: (현재가, 등락률, D-1종가, D-1등락률, D-2종가)}, [실패 티커])
+    시간 안에 끝나지 않았거나 예외가 난 티커는 EMPTY_QUOTE 로 채우고 실패 목록에 담는다."""
+    specs = list(dict.fromkeys(specs))
+    quotes, failed = {}, []
+    pool = ThreadPoolExecutor(max_workers=min(QUOTE_MAX_WORKERS, max(len(specs), 1)))
+    try:
+        futures = {submit(pool, _fetch_price_and_change, tkr, country): tkr for tkr, country in specs}
+        done, _ = wait(futures, timeout=timeout)
+        for fut, tkr in futures.items():
+            if fut in done and fut.exception() is None:
+                quotes[tkr] = fut.result()
+            else:
+                quotes[tkr] = EMPTY_QUOTE
+                failed.append(tkr)
+    finally:
+        # 응답 없는 요청 때문에 화면이 멈추지 않도록 남은 작업은 기다리지 않는다
+        pool.shutdown(wait=False, cancel_futures=True)
+    return quotes, failed
+
+def _field_frame(df, field, tickers):
+    """yf.download 결과에서 한 필드(Close 등)를 (날짜 × 티커) 프레임으로 꺼낸다."""
+    if df is None or df.empty: return pd.DataFrame(columns=tickers, dtype=float)
+    if isinstance(df.columns, pd.MultiIndex): frame = df[field]
+    else: frame = df[[field]].set_axis(tickers[:1], axis=1)
+    return frame.reindex(columns=tickers).astype(float)
+
+def _nth_last_valid(frame, n):
+    """티커별로 NaN 을 건너뛴 뒤에서 n번째 값 (없으면 NaN)"""
+    valid = frame.notna()
+    rank_from_end = valid.iloc[::-1].cumsum().iloc[::-1]
+    return frame.where(valid & rank_from_end.eq(n)).max()
+
+def get_quote_snapshot(specs, timeout=QUOTE_TIMEOUT_SEC):
+    """모든 티커의 일봉 7일 + 1분봉 당일 데이터를 yf.download 두 번으로 받아 한꺼번에 계산한다.
+    반환 형식은 get_all_quotes 와 같고, 배치에서 빠진 티커만 개별 조회로 다시 시도한다."""
+    specs = list(dict.fromkeys(specs))
+    tickers = [tkr for tkr, _ in specs]
+    try:
+        daily = yf.download(tickers, period="7d", progress=False, timeout=timeout)
+        intra = yf.download(tickers, period="1d", interval="1m", prepost=True, progress=False, timeout=timeout)
+    except:
+        return get_all_quotes(specs, timeout)
+
+    close = _field_frame(daily, "Close", tickers)
+    n_rows = close.notna().sum()
+    last_close = _nth_last_valid(close, 1)
+    d1_close = _nth_last_valid(close, 2).where(n_rows >= 3, last_close).fillna(0)
+    d2_close = _nth_last_valid(close, 3).where(n_rows >= 3, 0).fillna(0)
+    current = _field_frame(intra, "Close", tickers).ffill().iloc[-1:].max().reindex(tickers)
+    current = current.fillna(last_close).fillna(0)
+
+    change_pct = pd.Series(np.where((d1_close > 0) & (current > 0), (current - d1_close) / d1_close.where(d1_close > 0, 1) * 100, 0.0), index=tickers)
+    prev_change_pct = pd.Series(np.where(d2_close > 0, (d1_close - d2_close) / d2_close.where(d2_close > 0, 1) * 100, 0.0), index=tickers)
+
+    quotes = {tkr: (current[tkr], change_pct[tkr], d1_close[tkr], prev_change_pct[tkr], d2_close[tkr]) for tkr in tickers}
+    missing = [(tkr, country) for tkr, country in specs if current[tkr] <= 0]
+    failed = []
+    if missing:
+        retry, failed = get_all_quotes(missing, timeout)
+        quotes.update(retry)
+    return quotes, failed
@@ -0,0 +1,217 @@
+from bisect import bisect_left
+from dataclasses import dataclass
+from itertools import accumulate
+import numpy as np
+
+# ==========================================
+# 정수 리밸런싱: 종목별 round() 대신 예산 안에서 전 종목 수량을 함께 정한다
+# 목적함수: Σ(수량×가격 − 목표금액)² 최소 (= 목표비중과의 차이 최소)
+# 제약: Σ 매수금액 + 수수료 ≤ 예산, 최소 거래금액 미만 매매는 하지 않음
+# 휴리스틱(DP + 한 주씩 채우기/교환)으로 답을 구한 뒤, 그 답을 상한으로 분기한정 탐색을 돌려 최적을 확인/개선한다.
+# 탐색이 종목 수/노드 한도 안에 끝나면 최적해(exact=True), 아니면 그때까지 찾은 가장 좋은 근사해(exact=False).
+# ==========================================
+@dataclass(frozen=True, eq=False)
+class RebalancePlan:
+    qty: np.ndarray            # 종목별 목표수량 (매매 대상이 아닌 종목은 현재 수량)
+    cost: float                # Σ 목표수량 × 가격
+    fees: float                # Σ |매매금액| × 수수료율
+    residual_cash: float       # 예산 − cost − fees
+    tracking_error: float      # √Σ((수량×가격 − 목표금액) / 예산)²
+    exact: bool                # 목적함수 최솟값임이 확인됐는지 (False 면 탐색 한도 안의 근사해)
+
+DP_BUCKETS = 2048     # 예산 여유분을 몇 칸으로 나눠 배낭 DP 를 풀지 (칸이 많을수록 정확, 느림)
+EXACT_MAX_TICKERS = 30     # 매매 대상 종목이 이보다 많으면 분기한정 탐색을 하지 않는다 (휴리스틱 답 = 근사해)
+EXACT_MAX_NODES = 50_000   # 분기한정 탐색 노드 한도 (넘으면 그때까지의 최선을 근사해로 쓴다, 최악 ≈ 0.3초)
+
+def _spend(qty, price, current, fee_rate, active):
+    return ((qty * price) + fee_rate * np.abs(qty - current) * price)[active].sum()
+
+def _marginal_cost(qty, price, current, fee_rate, sign):
+    """한 주 더하기(+1)/빼기(-1) 에 드는(아끼는) 돈: 매수 쪽이면 수수료가 붙고, 매도 쪽이면 수수료만큼 덜 든다"""
+    buying = (qty > current) if sign < 0 else (qty >= current)
+    return price * np.where(buying, 1 + fee_rate, 1 - fee_rate)
+
+def _shed(qty, price, target, current, fee_rate, budget, movable):
+    """예산 안에 들 때까지 '늘어나는 오차 ÷ 아끼는 돈' 이 가장 작은 종목부터 한 주씩 뺀다."""
+    qty = qty.copy()
+    active = price > 0
+    while _spend(qty, price, current, fee_rate, active) > budget + 1e-6:
+        can = movable & (qty > 0) & active
+        if not can.any(): break
+        idx = np.flatnonzero(can)
+        loss = price[idx] * (price[idx] + 2 * (target[idx] - qty[idx] * price[idx]))
+        k = idx[np.argmin(loss / _marginal_cost(qty, price, current, fee_rate, -1)[idx])]
+        qty[k] -= 1
+    return qty
+
+def _choose_steps(base, price, target, current, fee_rate, budget, active):
+    """종목마다 내림 수량 base 에서 -1 / 0 / +1 중 하나를 고르는 다중선택 배낭 문제를 DP 로 푼다.
+    비용은 올림으로 칸에 맞추므로 고른 답은 항상 예산 안이다. 예산이 모자라면 None."""
+    steps = np.array([-1, 0, 1])
+    q = base[:, None] + steps[None, :]
+    spend = q * price[:, None] + fee_rate * np.abs(q - current[:, None]) * price[:, None]
+    err = (q * price[:, None] - target[:, None]) ** 2
+    spend[(q < 0) | ~active[:, None]] = np.inf
+    spend[~active, 1] = 0.0
+    err[~active] = 0.0
+
+    floor_spend = spend.min(axis=1)
+    capacity = budget - floor_spend.sum()
+    if capacity < 0: return None
+    n_buckets = DP_BUCKETS
+    unit = capacity / n_buckets if capacity > 0 else 1.0
+    with np.errstate(invalid="ignore"):
+        weight = np.ceil((spend - floor_spend[:, None]) / unit - 1e-9)
+
+    weight = np.where(weight <= n_buckets, weight, -1).astype(np.int64)   # -1 = 고를 수 없음
+    size = n_buckets + 1
+    best = np.full(size, np.inf)
+    best[0] = 0.0
+    pick = np.zeros((len(price), size), dtype=np.int8)
+    cand = np.empty((3, size))
+    for i, (w_row, e_row) in enumerate(zip(weight.tolist(), err.tolist())):
+        cand.fill(np.inf)
+        for k, (w, e) in enumerate(zip(w_row, e_row)):
+            if w >= 0: np.add(best[:size - w], e, out=cand[k, w:])
+        pick[i] = cand.argmin(axis=0)
+        best = cand.min(axis=0)
+
+    c = int(np.argmin(best))
+    if not np.isfinite(best[c]): return None
+    choice = np.zeros(len(price), dtype=np.int64)
+    for i in range(len(price) - 1, -1, -1):
+        k = pick[i, c]
+        choice[i] = steps[k]
+        c -= int(weight[i, k])
+    return base + np.where(active, choice, 0)
+
+def _relaxed_bounds(target):
+    """종목 뒷부분 target[d:] 마다, 남은 돈 room 에서의 오차 하한 함수.
+    정수·수수료를 무시하고 (매수금액 ≤ 실제 지출) Σ y ≤ room, y ≥ 0 에서 Σ(y − 목표금액)² 를 최소로 하면
+    y = max(목표 − λ, 0) 꼴이고, 이 값은 room 에 대해 볼록·감소한다."""
+    bounds = []
+    for d in range(len(target) + 1):
+        s = sorted((max(x, 0.0) for x in target[d:]), reverse=True)
+        cs = list(accumulate(s))
+        g = [c - (k + 1) * v for k, (c, v) in enumerate(zip(cs, s))]       # room 이 g[k] 보다 크면 위 k+1 개는 λ 만큼 깎인다
+        sq = list(accumulate(v * v for v in s))
+        neg = sum(min(x, 0.0) ** 2 for x in target[d:])
+        bounds.append((cs, g, sq, neg))
+    def bound(d, room):
+        cs, g, sq, neg = bounds[d]
+        if not cs or room >= cs[-1]: return neg
+        k = bisect_left(g, room)
+        if k == 0: return sq[-1] + neg
+        lam = (cs[k - 1] - room) / k
+        return k * lam * lam + sq[-1] - sq[k - 1] + neg
+    return bound
+
+def _exact_search(qty, price, target, current, fee_rate, budget, active):
+    """qty(예산 안의 답)를 상한으로 하는 분기한정 탐색. (더 좋거나 같은 수량, 최적 확인 여부)
+    비싼 종목부터 목표에 가까운 수량에서 위/아래로 넓혀 가며, 하한(고른 종목 오차 + 나머지 완화 하한)이
+    지금까지의 최선 이상이고 멀어질수록 커지기만 하면(볼록) 그 방향을 끊는다."""
+    idx = np.flatnonzero(active)
+    if len(idx) > EXACT_MAX_TICKERS: return qty, False
+    idx = idx[np.argsort(-price[idx], kind="stable")]
+    p, t, cur = price[idx].tolist(), target[idx].tolist(), current[idx].tolist()
+    n = len(idx)
+    bound = _relaxed_bounds(t)
+    min_spend = list(accumulate((fee_rate * c * x for c, x in zip(reversed(cur), reversed(p))), initial=0.0))[::-1]  # 뒤 종목을 다 팔 때의 수수료
+
+    inc = qty[idx].tolist()
+    best_err = sum((q * x - y) ** 2 for q, x, y in zip(inc, p, t))
+    if _spend(qty, price, current, fee_rate, active) > budget + 1e-6: best_err = np.inf
+    best = [best_err, inc]
+    chosen = [0] * n
+    nodes = [0]
+
+    def dfs(d, spent, err):
+        if d == n:
+            if err < best[0] - 1e-9: best[:] = [err, chosen.copy()]
+            return True
+        nodes[0] += 1
+        if nodes[0] > EXACT_MAX_NODES: return False
+        center = int(round(max(t[d], 0.0) / p[d]))
+        for qs in (range(center, -1, -1), range(center + 1, 1 << 62)):
+            prev = np.inf
+            for q in qs:
+                sp = spent + q * p[d] + fee_rate * abs(q - cur[d]) * p[d]
+                if sp + min_spend[d + 1] > budget + 1e-6:
+                    if q > center: break                    # 위로는 지출만 는다
+                    continue
+                e = err + (q * p[d] - t[d]) ** 2
+                b = e + bound(d + 1, budget - sp)
+                if b < best[0] - 1e-9:
+                    chosen[d] = q
+                    if not dfs(d + 1, sp, e): return False
+                elif b > prev: break
+                prev = b
+        return True
+
+    done = dfs(0, 0.0, 0.0)
+    if not np.isfinite(best[0]): return qty, False
+    out = qty.copy()
+    out[idx] = best[1]
+    return out, done
+
+def solve_integer_rebalance(price, target_costs, current_qty, budget, tradable, fee_rate=0.0, min_trade=0.0):
+    """price / target_costs / current_qty / tradable 은 같은 순서의 종목별 배열, budget 은 매매 대상 종목에 쓸 돈.
+    0) 종목별 반올림이 예산 안이면 그대로 쓴다 (제약이 없을 때의 최적)
+    1) 목표금액 내림 수량에서 종목마다 -1/0/+1 주를 배낭 DP 로 함께 고른다
+    2) DP 칸 올림으로 남은 돈은 '줄어드는 오차 ÷ 드는 돈' 이 큰 종목부터 한 주씩 더 채운다
+    3) 한 주를 다른 종목으로 옮겨 오차가 줄면 옮긴다
+    4) 3) 의 답을 상한으로 분기한정 탐색해 오차가 최소인 수량을 확인/개선한다 (종목 수/노드 한도를 넘으면 plan.exact=False)
+    5) 최소 거래금액 미만의 매매는 현재 수량으로 되돌리고, 그 때문에 예산을 넘으면 덜 아픈 종목부터 한 주씩 뺀다"""
+    price = np.asarray(price, dtype=float)
+    target = np.asarray(target_costs, dtype=float)
+    current = np.asarray(current_qty, dtype=np.int64)
+    active = np.asarray(tradable, dtype=bool) & (price > 0)
+    safe = np.where(active, price, 1.0)
+    budget = float(budget)
+
+    # 종목별 반올림이 예산 안이면 그것이 곧 최적 (오차는 종목마다 따로 최소)
+    rounded = np.where(active, np.round(np.maximum(target, 0) / safe), current).astype(np.int64)
+    if _spend(rounded, price, current, fee_rate, active) <= budget:
+        return _plan(rounded, price, target, current, fee_rate, budget, active, min_trade, exact=True)
+
+    base = np.where(active, np.floor(np.maximum(target, 0) / safe), current).astype(np.int64)
+    qty = _choose_steps(base, np.where(active, price, 0.0), target, current, fee_rate, budget, active)
+    if qty is None: qty = base
+
+    qty = _shed(qty, price, target, current, fee_rate, budget, active)
+    for _ in range(2 * len(price)):
+        left = budget - _spend(qty, price, current, fee_rate, active)
+        resid = target - qty * safe
+        gain = np.where(active, safe * (2 * resid - safe), -np.inf)
+        add_cost = _marginal_cost(qty, price, current, fee_rate, +1)
+        ok = active & (gain > 1e-6) & (add_cost <= left + 1e-6)
+        if ok.any():
+            idx = np.flatnonzero(ok)
+            k = idx[np.argmax(gain[idx] / add_cost[idx])]
+            qty[k] += 1
+            continue
+        # 한 주 빼서 다른 종목에 한 주 더하는 교환으로 오차가 줄면 반복
+        loss = np.where(active & (qty > 0), safe * (safe + 2 * resid), np.inf)
+        delta = loss[:, None] - gain[None, :]
+        delta[left + _marginal_cost(qty, price, current, fee_rate, -1)[:, None] - add_cost[None, :] < -1e-6] = np.inf
+        np.fill_diagonal(delta, np.inf)
+        i, j = np.unravel_index(np.argmin(delta), delta.shape)
+        if not delta[i, j] < -1e-6: break
+        qty[i] -= 1
+        qty[j] += 1
+
+    qty, exact = _exact_search(qty, price, target, current, fee_rate, budget, active)
+    return _plan(qty, price, target, current, fee_rate, budget, active, min_trade, exact)
+
+def _plan(qty, price, target, current, fee_rate, budget, active, min_trade, exact):
+    if min_trade > 0:
+        small = active & (qty != current) & (np.abs(qty - current) * price < min_trade)
+        qty = np.where(small, current, qty)
+        qty = _shed(qty, price, target, current, fee_rate, budget, active & ~small)
+    cost = float((qty * price)[active].sum())
+    fees = float(fee_rate * (np.abs(qty - current) * price)[active].sum())
+    gap = np.where(active, qty * price - target, 0.0)
+    return RebalancePlan(
+        qty=qty, cost=cost, fees=fees, residual_cash=budget - cost - fees,
+        tracking_error=float(np.sqrt((gap ** 2).sum()) / budget) if budget > 0 else 0.0, exact=exact,
+    )
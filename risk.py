@@ -0,0 +1,179 @@
+import numpy as np
+import pandas as pd
+from valuation import build_price_cube, OHLC_FIELDS, FX_TICKER
+from profiling import count
+
+# ==========================================
+# 리스크 지표: 변동성, 최대낙폭(MDD), 샤프/롤링 샤프, 벤치마크 베타, 종목 상관, 과거 VaR/CVaR
+# 차트와 같은 일봉 종가로 (날짜 × 시계열) 수익률 행렬을 만들고, 합계·교차곱·정렬된 수익률을
+# 들고 있다가 새 봉이 붙거나 3년 창이 밀리면 바뀐 봉만 빼고 더한다.
+# ==========================================
+TRADING_DAYS = 252
+CLOSE = OHLC_FIELDS.index("Close")
+PORTFOLIO_COL = "포트폴리오"
+
+def risk_levels(pf, hist, valued, benchmark=None, benchmark_usd=False, fx_ticker=FX_TICKER):
+    """(날짜 × 시계열) 원화 종가 수준과 열 구분.
+    열 순서: 포트폴리오 총자산, 카테고리별 평가금액, 종목별 원화 종가, 벤치마크(있으면)"""
+    closes = build_price_cube(hist, pf.tickers, pf.usd, fx_ticker)[:, :, CLOSE]
+    groups = [PORTFOLIO_COL] + list(valued["cat"])
+    cols = [valued["total"]["Close"].to_numpy()] + [f["Close"].to_numpy() for f in valued["cat"].values()]
+    cols += list(closes.T)
+
+    bench_col = None
+    if benchmark and benchmark in hist and not np.isnan(hist.column("Close", benchmark)).all():
+        bench, fx = hist.block([benchmark, fx_ticker], fields=["Close"])[:, :, 0].T
+        cols.append(bench * fx if benchmark_usd else bench)
+        bench_col = benchmark
+
+    names = groups + list(pf.names) + ([bench_col] if bench_col else [])
+    levels = pd.DataFrame(np.column_stack(cols), index=hist.index, columns=names)
+    return levels, groups, list(pf.names), bench_col
+
+def _returns(levels, prev):
+    """prev → levels 한 칸 수익률. 이전 값이 0(보유 없음/결측)이면 0."""
+    return np.divide(levels, prev, out=np.ones_like(levels), where=prev > 0) - 1
+
+class RiskState:
+    """RiskState(window, var_level).update(levels).report(groups, holdings, bench_col)
+    levels 의 마지막 봉은 장중 값일 수 있으므로 다음 update 때 항상 빼고 다시 넣는다."""
+
+    def __init__(self, window=63, var_level=0.95):
+        self.window = window
+        self.var_level = var_level
+        self.levels = None
+
+    # --- 전체 재계산 (열이 바뀌었거나, 보유/과거 봉이 바뀌어 이어 붙일 수 없을 때) ---
+    def _rebuild(self, levels):
+        count("risk_full")
+        values = levels.to_numpy(dtype=float)
+        self.levels = levels
+        self.returns = _returns(values[1:], values[:-1])
+        self.n = len(self.returns)
+        self.s1 = self.returns.sum(axis=0)
+        self.cross = self.returns.T @ self.returns
+        self.sorted = np.sort(self.returns, axis=0)
+        self._accumulate_drawdown(values)
+        self.rolling = self._rolling_sharpe(self.returns)
+        return self
+
+    def _accumulate_drawdown(self, values):
+        self.peak = np.maximum.accumulate(values, axis=0)
+        dd = np.divide(values, self.peak, out=np.ones_like(values), where=self.peak > 0) - 1
+        self.mdd = np.minimum.accumulate(dd, axis=0)
+
+    def _rolling_sharpe(self, rets):
+        """rets 각 행에서 끝나는 window 일 샤프 (연율). 앞쪽 window-1 행은 NaN."""
+        w = self.window
+        out = np.full(rets.shape, np.nan)
+        if len(rets) < w: return out
+        c1 = np.vstack([np.zeros(rets.shape[1]), np.cumsum(rets, axis=0)])
+        c2 = np.vstack([np.zeros(rets.shape[1]), np.cumsum(rets ** 2, axis=0)])
+        mean = (c1[w:] - c1[:-w]) / w
+        var = np.maximum((c2[w:] - c2[:-w]) / w - mean ** 2, 0) * w / (w - 1)
+        std = np.sqrt(var)
+        out[w - 1:] = np.divide(mean, std, out=np.zeros_like(mean), where=std > 1e-12) * np.sqrt(TRADING_DAYS)
+        return out
+
+    def _remove(self, rets):
+        self.n -= len(rets)
+        self.s1 -= rets.sum(axis=0)
+        self.cross -= rets.T @ rets
+        # 열마다 같은 개수를 지우므로 정렬 배열 모양은 (n, 열) 그대로 유지된다. 같은 값이 여럿이면 다음 칸을 지운다.
+        keep = np.ones(self.sorted.shape, dtype=bool)
+        for j, col in enumerate(self.sorted.T):
+            for v in rets[:, j]:
+                i = int(np.searchsorted(col, v))
+                while not keep[i, j]: i += 1
+                keep[i, j] = False
+        self.sorted = self.sorted.T[keep.T].reshape(self.sorted.shape[1], -1).T
+
+    def _insert(self, rets):
+        self.n += len(rets)
+        self.s1 += rets.sum(axis=0)
+        self.cross += rets.T @ rets
+        merged = np.concatenate([self.sorted, rets], axis=0)
+        merged.sort(axis=0, kind="stable")
+        self.sorted = merged
+
+    # --- 새 levels 반영 ---
+    def update(self, levels):
+        old = self.levels
+        if old is None or list(old.columns) != list(levels.columns) or len(old) < 3 or len(levels) < 2:
+            return self._rebuild(levels)
+        start = int(old.index.searchsorted(levels.index[0]))
+        keep = len(old) - 1 - start          # 이어서 쓸 확정 봉 수 (이전 마지막 봉 제외)
+        if keep < 2 or len(levels) < keep or not levels.index[:keep].equals(old.index[start:start + keep]):
+            return self._rebuild(levels)
+        new_vals = levels.to_numpy(dtype=float)
+        if not np.allclose(new_vals[:keep], old.to_numpy(dtype=float)[start:start + keep], rtol=1e-9, atol=0, equal_nan=True):
+            return self._rebuild(levels)
+
+        count("risk_incremental")
+        # 1) 창 앞에서 빠진 봉과 이전 마지막 봉의 수익률을 뺀다
+        dropped = np.vstack([self.returns[:start], self.returns[-1:]])
+        self.returns = self.returns[start:-1]
+        self.rolling = self.rolling[start:-1]
+        if start: self.rolling[:self.window - 1] = np.nan
+        self._remove(dropped)
+
+        # 2) 새 봉(들)의 수익률을 더한다
+        added = _returns(new_vals[keep:], new_vals[keep - 1:-1])
+        self._insert(added)
+        self.returns = np.vstack([self.returns, added])
+        tail = self._rolling_sharpe(self.returns[-(len(added) + self.window - 1):])
+        self.rolling = np.vstack([self.rolling, tail[-len(added):]])
+
+        # 3) 낙폭: 창 시작이 밀렸으면 다시 누적, 아니면 새 봉만 이어서 누적
+        if start:
+            self._accumulate_drawdown(new_vals)
+        else:
+            self.peak, self.mdd = self.peak[:keep], self.mdd[:keep]
+            for row in new_vals[keep:]:
+                peak = np.maximum(self.peak[-1], row)
+                dd = np.divide(row, peak, out=np.ones_like(row), where=peak > 0) - 1
+                self.peak = np.vstack([self.peak, peak])
+                self.mdd = np.vstack([self.mdd, np.minimum(self.mdd[-1], dd)])
+        self.levels = levels
+        return self
+
+    # --- 지표 ---
+    def stats(self):
+        """열별 (평균, 공분산 행렬). 표본 공분산 (n-1)."""
+        mean = self.s1 / self.n
+        cov = (self.cross - self.n * np.outer(mean, mean)) / max(self.n - 1, 1)
+        return mean, cov
+
+    def var_cvar(self):
+        """1일 과거 VaR / CVaR (손실을 양수 비율로)"""
+        k = max(int(np.floor((1 - self.var_level) * self.n)), 1)
+        tail = self.sorted[:k]
+        return -tail[-1], -tail.mean(axis=0)
+
+    def report(self, groups, holdings, bench_col=None):
+        """{"summary": 그룹별 지표 DataFrame, "rolling": 그룹별 롤링 샤프, "corr": 종목 상관 행렬}"""
+        cols = list(self.levels.columns)
+        mean, cov = self.stats()
+        std = np.sqrt(np.maximum(np.diag(cov), 0))
+        var, cvar = self.var_cvar()
+        g = [cols.index(c) for c in groups]
+        summary = pd.DataFrame({
+            "변동성": std[g] * np.sqrt(TRADING_DAYS),
+            "최대낙폭": self.mdd[-1, g],
+            "샤프": np.divide(mean[g], std[g], out=np.zeros(len(g)), where=std[g] > 1e-12) * np.sqrt(TRADING_DAYS),
+            f"VaR{self.var_level:.0%}": var[g],
+            f"CVaR{self.var_level:.0%}": cvar[g],
+        }, index=groups)
+        if bench_col is not None:
+            b = cols.index(bench_col)
+            summary["베타"] = cov[g, b] / cov[b, b] if cov[b, b] > 0 else np.nan
+
+        h = [cols.index(c) for c in holdings]
+        sub = cov[np.ix_(h, h)]
+        denom = np.outer(std[h], std[h])
+        corr = np.divide(sub, denom, out=np.full_like(sub, np.nan), where=denom > 1e-18)
+        return {
+            "summary": summary,
+            "rolling": pd.DataFrame(self.rolling[:, g], index=self.levels.index[1:], columns=groups),
+            "corr": pd.DataFrame(corr, index=holdings, columns=holdings),
+        }
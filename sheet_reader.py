@@ -0,0 +1,157 @@
+import os
+import csv
+import time
+import hashlib
+import sqlite3
+import threading
+from contextlib import closing
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from profiling import count
+
+# ==========================================
+# 구글 시트 자산 기록 읽기 - 조건부 요청 + 로컬 캐시
+# CSV 로 게시한 시트를 ETag / Last-Modified 로 조건부 요청한다 (안 바뀌었으면 304, 본문 없음).
+# 바뀐 본문도 지난번에 읽은 앞부분(마지막 줄 직전까지)이 그대로이고 그보다 길면 그 뒤 줄만 읽어 SQLite 에 더한다.
+# 마지막 줄은 고쳐 쓸 수 있으므로 늘 다시 읽고, 줄이 지워지는 등 나머지 변화는 전체를 다시 읽는다.
+# ==========================================
+SHEET_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "sheet_history.sqlite")
+CHECK_SEC = 300            # 마지막 확인 후 이 시간 안에는 서버에 묻지 않고 캐시를 쓴다
+DATE_COLUMNS = ("date", "날짜", "일자")
+ASSET_COLUMNS = ("asset", "총자산", "자산")
+SCHEMA_VERSION = 2         # 캐시 표 모양이 바뀌면 올린다 (예전 캐시는 지우고 다시 받음)
+
+def _connect(db_path):
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    con = sqlite3.connect(db_path, timeout=30)
+    if con.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+        con.execute("DROP TABLE IF EXISTS meta")
+        con.execute("DROP TABLE IF EXISTS rows")
+        con.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    con.execute("""CREATE TABLE IF NOT EXISTS meta (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, checked_at REAL,
+                   date_col INTEGER, asset_col INTEGER, prefix_len INTEGER, prefix_sha1 TEXT, body_sha1 TEXT, last_date TEXT)""")
+    con.execute("CREATE TABLE IF NOT EXISTS rows (url TEXT, date TEXT, asset REAL, PRIMARY KEY (url, date))")
+    return con
+
+def _sha1(data):
+    return hashlib.sha1(data).hexdigest()
+
+def _columns(header):
+    """머리글에서 (날짜 열, 자산 열, 머리글 이름을 찾았는지). 못 찾으면 앞의 두 열 (시트 기록기가 쓰는 date, asset 순서)."""
+    names = [h.strip().lower() for h in header]
+    date_col = next((k for k, n in enumerate(names) if n in DATE_COLUMNS), None)
+    asset_col = next((k for k, n in enumerate(names) if n in ASSET_COLUMNS), None)
+    named = date_col is not None or asset_col is not None
+    return (0 if date_col is None else date_col), (1 if asset_col is None else asset_col), named
+
+def _parse_rows(lines, date_col, asset_col):
+    """CSV 줄들 → [(YYYY-MM-DD, 자산)]. 날짜/숫자가 아닌 줄은 건너뛴다."""
+    dates, assets = [], []
+    for rec in csv.reader(lines):
+        if len(rec) <= max(date_col, asset_col): continue
+        try: assets.append(float(rec[asset_col].strip().replace(",", "").replace("₩", "")))
+        except ValueError: continue
+        dates.append(rec[date_col].strip())
+    if not dates: return []
+    parsed = pd.to_datetime(dates, errors="coerce", format="mixed")      # '2024-01-02', '2024. 1. 2' 섞여도 한 번에
+    return [(d.strftime("%Y-%m-%d"), a) for d, a in zip(parsed, assets) if not pd.isna(d)]
+
+def _last_line_start(body):
+    """마지막 (빈 줄이 아닌) 줄이 시작하는 바이트 위치"""
+    return body.rstrip(b"\r\n").rfind(b"\n") + 1
+
+class SheetReader:
+    """SheetReader(url).history() → 시트에 기록된 날짜별 총자산 Series.
+    refresh() 결과: "fresh" (확인 간격 안) / "not_modified" (304) / "unchanged" (본문 같음) / "append" / "full" / "error"."""
+
+    def __init__(self, url, db_path=SHEET_DB, session=None, timeout=(3.05, 10), check_sec=CHECK_SEC):
+        self.url = url
+        self.db_path = db_path
+        self.timeout = timeout
+        self.check_sec = check_sec
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        self.session = session
+        self._lock = threading.Lock()
+
+    def _meta(self, con):
+        keys = ("etag", "last_modified", "checked_at", "date_col", "asset_col", "prefix_len", "prefix_sha1", "body_sha1", "last_date")
+        row = con.execute(f"SELECT {', '.join(keys)} FROM meta WHERE url = ?", (self.url,)).fetchone()
+        return dict(zip(keys, row)) if row else {}
+
+    def refresh(self, force=False):
+        with self._lock, closing(_connect(self.db_path)) as con, con:
+            meta = self._meta(con)
+            if not force and meta and time.time() - meta["checked_at"] < self.check_sec:
+                count("sheet_fresh")
+                return "fresh"
+
+            headers = {}
+            if meta.get("etag"): headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"): headers["If-Modified-Since"] = meta["last_modified"]
+            try:
+                resp = self.session.get(self.url, headers=headers, timeout=self.timeout)
+            except requests.RequestException:
+                count("sheet_error")
+                return "error"
+            if resp.status_code == 304 and meta:
+                con.execute("UPDATE meta SET checked_at = ? WHERE url = ?", (time.time(), self.url))
+                count("sheet_not_modified")
+                return "not_modified"
+            if resp.status_code != 200:
+                count("sheet_error")
+                return "error"
+
+            body = resp.content
+            cut = _last_line_start(body)
+            if meta and _sha1(body) == meta["body_sha1"]:
+                result = "unchanged"
+                date_col, asset_col = meta["date_col"], meta["asset_col"]
+            elif (meta and meta["prefix_len"] and len(body) > meta["prefix_len"]
+                  and _sha1(body[:meta["prefix_len"]]) == meta["prefix_sha1"]):
+                # 앞부분이 그대로: 지난번 마지막 줄(고쳐 썼을 수 있음)부터 새로 붙은 줄까지만 다시 읽는다.
+                # 지난번 마지막 줄 날짜의 캐시 행은 지우고 넣으므로 그 줄의 날짜가 바뀌어도 옛 행이 남지 않는다.
+                # 본문이 앞부분과 같아진 경우(마지막 줄 삭제)는 아래 전체 경로로 간다.
+                result = "append"
+                date_col, asset_col = meta["date_col"], meta["asset_col"]
+                tail = body[meta["prefix_len"]:].decode("utf-8", errors="replace").splitlines()
+                if meta["last_date"]: con.execute("DELETE FROM rows WHERE url = ? AND date = ?", (self.url, meta["last_date"]))
+                con.executemany("INSERT OR REPLACE INTO rows VALUES (?, ?, ?)", [(self.url, d, a) for d, a in _parse_rows(tail, date_col, asset_col)])
+            else:
+                result = "full"
+                lines = body.decode("utf-8-sig", errors="replace").splitlines()
+                date_col, asset_col, named = _columns(next(csv.reader(lines[:1]), []))
+                # 첫 줄은 머리글 이름이 맞거나 데이터로 읽히지 않을 때만 머리글로 본다 (머리글 없는 시트)
+                skip = 1 if lines and (named or not _parse_rows(lines[:1], date_col, asset_col)) else 0
+                con.execute("DELETE FROM rows WHERE url = ?", (self.url,))
+                con.executemany("INSERT OR REPLACE INTO rows VALUES (?, ?, ?)", [(self.url, d, a) for d, a in _parse_rows(lines[skip:], date_col, asset_col)])
+            last = _parse_rows([body[cut:].decode("utf-8-sig", errors="replace").strip()], date_col, asset_col)      # 다음 덧붙이기 때 지울 날짜
+            con.execute(
+                "INSERT OR REPLACE INTO meta VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.url, resp.headers.get("ETag"), resp.headers.get("Last-Modified"), time.time(),
+                 date_col, asset_col, cut, _sha1(body[:cut]), _sha1(body), last[0][0] if last else None),
+            )
+            count(f"sheet_{result}")
+            return result
+
+    def history(self, refresh=True):
+        """날짜별 기록된 총자산 Series (캐시 기준, refresh 면 먼저 서버 확인). 기록이 없으면 빈 Series."""
+        if refresh: self.refresh()
+        with closing(_connect(self.db_path)) as con:
+            rows = con.execute("SELECT date, asset FROM rows WHERE url = ? ORDER BY date", (self.url,)).fetchall()
+        if not rows: return pd.Series(dtype=float)
+        dates, assets = zip(*rows)
+        return pd.Series(assets, index=pd.to_datetime(list(dates)), dtype=float, name="asset")
+
+_readers = {}
+_readers_lock = threading.Lock()
+
+def get_sheet_reader(url):
+    """URL 별로 프로세스에 하나만 만든다 (Streamlit 재실행/여러 세션이 공유)."""
+    with _readers_lock:
+        if url not in _readers: _readers[url] = SheetReader(url)
+        return _readers[url]
@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import queue
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from profiling import count
+
+# ==========================================
+# 구글 시트 자산 기록 - 백그라운드 전송 큐
+# ==========================================
+SPOOL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "sheet_spool.jsonl")
+
+class SheetWriter:
+    """{"date", "asset"} 행을 넣으면 먼저 spool 파일에 적고, 백그라운드 스레드가 웹앱 URL 로 보낸다.
+    spool 에서는 보낸 행만 지우므로 보내기 전에 프로세스가 죽어도 다음 전송 때 함께 다시 보낸다.
+    서버가 거절한 행(429 가 아닌 4xx)은 다시 보내도 똑같으므로 spool 에서 빼서 <spool>.rejected 에 남긴다."""
+
+    def __init__(self, url, spool_path=SPOOL_FILE, session=None, timeout=(3.05, 10), max_retries=3, backoff_sec=1.0, idle_sec=30):
+        self.url = url
+        self.spool_path = spool_path
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_sec = backoff_sec
+        self.idle_sec = idle_sec
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        self.session = session
+        self._queue = queue.Queue()
+        self._send_lock = threading.Lock()
+        self._spool_lock = threading.Lock()
+        self._thread_lock = threading.Lock()
+        self._thread = None
+
+    def enqueue(self, row):
+        row = dict(row)
+        # spool 에 먼저 적는다. 못 적으면 (읽기 전용 디스크 등) 메모리에만 들고 있다가 보낸다
+        try:
+            with self._spool_lock: self._append_spool(row)
+            self._queue.put(None)
+        except OSError:
+            self._queue.put(row)
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="sheet-writer", daemon=True)
+                self._thread.start()
+
+    def flush(self):
+        """큐와 spool 에 쌓인 행을 지금 바로 보낸다. 아직 못 보낸 행 수를 돌려준다."""
+        return self._send_batch(self._drain())
+
+    def pending(self):
+        return self._read_spool()
+
+    def _drain(self, first=None):
+        """큐를 비우고 spool 에 못 적은 (메모리에만 있는) 행만 돌려준다. None 은 깨우기 신호."""
+        items = [first]
+        while True:
+            try: items.append(self._queue.get_nowait())
+            except queue.Empty: return [row for row in items if row is not None]
+
+    def _run(self):
+        while True:
+            try: first = self._queue.get(timeout=self.idle_sec)
+            except queue.Empty:
+                # 끝내기 직전에 들어온 행이 있으면 계속 돈다. _thread 를 비운 뒤의 enqueue 는 새 스레드를 띄운다
+                with self._thread_lock:
+                    if self._queue.empty():
+                        self._thread = None
+                        return
+                continue
+            self._send_batch(self._drain(first))
+
+    def _send_batch(self, rows):
+        with self._send_lock:
+            with self._spool_lock: spooled = self._read_spool()
+            latest = {}
+            # 같은 날짜는 마지막 값만 보낸다 (하루 한 줄 기록)
+            for row in spooled + rows: latest[row["date"]] = row
+            failed, rejected = [], []
+            for row in latest.values():
+                result, status = self._post(row)
+                if result == "retry": failed.append(row)
+                elif result == "rejected": rejected.append({**row, "status": status})
+            if rejected:
+                count("sheet_rejected", len(rejected))
+                try: self._append_rows(self.spool_path + ".rejected", rejected)
+                except OSError: pass
+            # 보내는 동안 enqueue 가 덧붙인 행(spooled 뒤쪽)은 남기고, 다시 보낼 행을 그 앞에 둔다
+            with self._spool_lock:
+                try: self._write_spool(failed + self._read_spool()[len(spooled):])
+                except OSError: pass
+            return len(failed)
+
+    def _post(self, row):
+        """("sent" | "retry" | "rejected", 마지막 상태 코드). 5xx·429·연결 오류는 max_retries 번까지 다시 해 본다."""
+        status = None
+        for attempt in range(self.max_retries):
+            try:
+                resp = self.session.post(self.url, data=row, timeout=self.timeout)
+                status = resp.status_code
+                if resp.ok: return "sent", status
+                if 400 <= status < 500 and status != 429: return "rejected", status
+            except requests.RequestException:
+                pass
+            if attempt < self.max_retries - 1: time.sleep(self.backoff_sec * 2 ** attempt)
+        return "retry", status
+
+    def _read_spool(self):
+        """spool 의 행 목록. 쓰다 만 줄(적는 도중 종료)은 그 줄만 건너뛴다."""
+        rows = []
+        try:
+            with open(self.spool_path, encoding="utf-8") as f:
+                for line in f:
+                    try: rows.append(json.loads(line))
+                    except ValueError: pass
+        except OSError:
+            pass
+        return rows
+
+    def _append_spool(self, row):
+        self._append_rows(self.spool_path, [row])
+
+    def _append_rows(self, path, rows):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            for row in rows: f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _write_spool(self, rows):
+        os.makedirs(os.path.dirname(self.spool_path), exist_ok=True)
+        tmp = self.spool_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for row in rows: f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        os.replace(tmp, self.spool_path)
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+def get_sheet_writer(url):
+    """URL 별로 프로세스에 하나만 만든다 (Streamlit 재실행/여러 세션이 공유)."""
+    with _writers_lock:
+        if url not in _writers: _writers[url] = SheetWriter(url)
+        return _writers[url]
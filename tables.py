@@ -0,0 +1,333 @@
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# 표 데이터 구성 & 스타일 (Streamlit 없이 import 가능)
+# state 는 st.session_state 또는 engine.session_values() 가 돌려주는 dict
+# ==========================================
+STOCK_COLUMNS = ["실행", "종목", "현재가($)", "현재가(₩)", "D-1", "등락률", "오늘수익", "목표비중", "실제비중", "목표금액", "실제금액", "목표수량", "내보유"]
+SUMMARY_COLUMNS = ["종목", "D-1", "등락률", "오늘수익", "목표비중", "실제비중", "목표금액", "실제금액"]
+PNL_COLUMNS = ["종목", "현재가", "실제평단가", "실현수익", "미실현수익", "총수익", "실제금액", "원금(투입분)", "수익률(%)"]
+
+def fmt_pnl(val):
+    if val > 0: return f"▲ ₩{val:,.0f}"
+    elif val < 0: return f"▼ ₩{abs(val):,.0f}"
+    return "₩0"
+
+def fmt_pct(val):
+    if val > 0: return f"▲ {val:.2f}%"
+    elif val < 0: return f"▼ {abs(val):.2f}%"
+    return "0.00%"
+
+def fmt_change(val):
+    if val > 0: return f"▲ {val:.2f}%"
+    elif val < 0: return f"▼ {abs(val):.2f}%"
+    return "-"
+
+def _won(vals):
+    return [f"₩{v:,.0f}" for v in vals]
+
+def _price(vals, is_usd):
+    """미국 종목은 달러, 나머지는 원화 (값이 NaN 인 요약행은 '-')"""
+    return ["-" if np.isnan(v) else (f"${v:,.2f}" if us else f"₩{v:,.0f}") for v, us in zip(vals, is_usd)]
+
+# --- 5-1. 개별 종목표 데이터 구성 ---
+# 숫자는 종목 순서 배열로 한 번에 모으고, 문자열 표시는 화면에 나갈 행만 뷰마다 만든다.
+def build_holding_rows(pf, state):
+    """(리밸런싱 숫자 프레임, 손익 숫자 프레임, 매수/매도 알림 목록). 두 프레임 모두 종목 순서."""
+    cache = state["stock_data_cache"]
+    col = lambda key: np.array([c[key] for c in cache], dtype=float)
+    exc_rate = state["exc_rate"]
+    total_asset = state["total_asset"]
+    target_costs, target_ratios = pf.target_costs(state["rebalance_budget"])
+    locked = np.asarray(pf.locked, dtype=bool)
+    is_usd = np.array(pf.countries) == "US"
+    my_amt, price_krw, price_usd = col("my_amt"), col("price_krw"), col("price_usd")
+    my_qty = np.asarray(state["user_holdings"], dtype=float)
+    target_qty = np.asarray(state["target_qty"], dtype=float)
+
+    diff = target_qty - my_qty
+    action = np.full(len(pf), "유지", dtype=object)
+    actions_needed = []
+    for i in np.flatnonzero(diff != 0):
+        if locked[i]: continue
+        n = int(abs(diff[i]))
+        if diff[i] > 0:
+            action[i] = f"{n}주 매수"
+            actions_needed.append(f"**{pf.names[i]}** <span style='color:#2E7D32; font-weight:bold;'>🟢 {n}주 매수</span>")
+        else:
+            action[i] = f"{n}주 매도"
+            actions_needed.append(f"**{pf.names[i]}** <span style='color:#D32F2F; font-weight:bold;'>🔴 {n}주 매도</span>")
+    action[locked] = "매매불가"
+
+    stock = pd.DataFrame({
+        "실행": action, "종목": list(pf.labels), "카테고리": pf.category_names, "고정": locked, "미국": is_usd,
+        "현재가$숫자": price_usd, "현재가숫자": price_krw, "D-1숫자": col("prev_change_pct"),
+        "등락률숫자": col("change_pct"), "오늘수익숫자": col("today_profit"),
+        "목표비중숫자": np.asarray(target_ratios, dtype=float),
+        "실제비중숫자": my_amt / total_asset if total_asset > 0 else np.zeros(len(pf)),
+        "목표금액숫자": np.asarray(target_costs, dtype=float), "실제금액숫자": my_amt,
+        "목표수량숫자": target_qty, "내보유숫자": my_qty,
+    })
+    actual_avg = col("actual_avg_p")
+    pnl = pd.DataFrame({
+        "종목": list(pf.labels), "카테고리": pf.category_names, "미국": is_usd,
+        "현재가숫자": np.where(is_usd, price_usd, price_krw),
+        "평단가숫자": np.where(is_usd, actual_avg / exc_rate if exc_rate > 0 else 0.0, actual_avg),
+        "실현수익숫자": col("real_p"), "미실현수익숫자": col("unreal_p"), "총수익숫자": col("tot_p"),
+        "실제금액숫자": my_amt, "원금숫자": col("principal"), "수익률숫자": col("return_pct"),
+    })
+    return stock, pnl, actions_needed
+
+def _format_stock(df):
+    """리밸런싱 숫자 프레임의 행들 → 표시 열(STOCK_COLUMNS)"""
+    locked = df["고정"].to_numpy()
+    return pd.DataFrame({
+        "실행": df["실행"], "종목": df["종목"],
+        "현재가($)": [f"${v:,.2f}" if us else "-" for v, us in zip(df["현재가$숫자"], df["미국"])],
+        "현재가(₩)": _won(df["현재가숫자"]),
+        "D-1": [fmt_change(v) for v in df["D-1숫자"]], "등락률": [fmt_change(v) for v in df["등락률숫자"]],
+        "오늘수익": [fmt_pnl(v) for v in df["오늘수익숫자"]],
+        "목표비중": ["-" if lk else f"{v:.1%}" for v, lk in zip(df["목표비중숫자"], locked)],
+        "실제비중": [f"{v:.1%}" for v in df["실제비중숫자"]],
+        "목표금액": ["-" if lk else f"₩{v:,.0f}" for v, lk in zip(df["목표금액숫자"], locked)],
+        "실제금액": _won(df["실제금액숫자"]),
+        "목표수량": ["-" if lk else str(int(v)) for v, lk in zip(df["목표수량숫자"], locked)],
+        "내보유": [str(int(v)) for v in df["내보유숫자"]],
+    }, index=df.index)
+
+def action_summary_html(actions_needed):
+    """최상단 알림(Placeholder) 에 넣을 매수/매도 요약 박스"""
+    if actions_needed:
+        return f"""
+        <div style='background-color: #FFFDE7; padding: 15px; border-radius: 8px; border: 2px solid #FBC02D; margin-bottom: 20px;'>
+            <h5 style='margin-top: 0; color: #F57F17; margin-bottom: 10px;'>🛒 필요 매수/매도 요약</h5>
+            <div style='font-size: 15px;'>{' &nbsp;|&nbsp; '.join(actions_needed)}</div>
+        </div>
+        """
+    return """
+        <div style='background-color: #F1F8E9; padding: 15px; border-radius: 8px; border: 2px solid #66BB6A; margin-bottom: 20px;'>
+            <h5 style='margin-top: 0; color: #2E7D32; margin-bottom: 0;'>🟢 매수/매도 신호 없음 (현재 목표 비중 완벽 유지중)</h5>
+        </div>
+        """
+
+# [리밸런싱 뷰] 데이터프레임: 분석 때 만든 표에서 필터/정렬은 행 순서만 고르고 요약행만 새로 계산
+def _stock_view(table, filter_by, sort_by):
+    """(표시용 DataFrame, 원래 종목 위치 순서)"""
+    df_stocks = table.stock
+    if filter_by != "전체":
+        df_stocks = df_stocks[df_stocks['카테고리'] == filter_by]
+
+    sum_actual_amt = df_stocks['실제금액숫자'].sum()
+    sum_today_profit = df_stocks['오늘수익숫자'].sum()
+    sum_target_ratio = df_stocks['목표비중숫자'].sum()
+    sum_actual_ratio = df_stocks['실제비중숫자'].sum()
+    sum_target_amt = df_stocks['목표금액숫자'].sum()
+
+    summary_row = {
+        "실행": "-", "종목": f"📊 [{filter_by}] 요약",
+        "현재가($)": "-", "현재가(₩)": "-", "D-1": "-", "등락률": "-",
+        "오늘수익": fmt_pnl(sum_today_profit),
+        "목표비중": f"{sum_target_ratio:.1%}",
+        "실제비중": f"{sum_actual_ratio:.1%}",
+        "목표금액": f"₩{sum_target_amt:,.0f}",
+        "실제금액": f"₩{sum_actual_amt:,.0f}",
+        "목표수량": "-", "내보유": "-"
+    }
+
+    order = df_stocks[sort_by].sort_values(ascending=False).index
+    view = pd.concat([_format_stock(table.stock.loc[order]), pd.DataFrame([summary_row])], ignore_index=True)
+    return view, order
+
+# [상세 손익 뷰] 카테고리별 정렬 및 요약행 삽입
+PNL_SUMS = ["실현수익숫자", "미실현수익숫자", "총수익숫자", "실제금액숫자", "원금숫자"]
+
+def build_pnl_table(pf, pnl):
+    """손익 숫자 프레임 → 카테고리마다 수익률 내림차순 종목 + 요약행, 맨 끝에 전체 요약행을 붙인 표시 프레임"""
+    cat_order = [c.name for c in pf.categories]
+    n_cat = len(cat_order)
+    pos = {name: k for k, name in enumerate(cat_order)}
+    cat = np.array([pos[c] for c in pnl["카테고리"]], dtype=np.intp)
+    vals = pnl[PNL_SUMS].to_numpy(dtype=float)
+    sums = np.zeros((n_cat + 1, len(PNL_SUMS)))
+    np.add.at(sums, cat, vals)
+    sums[-1] = vals.sum(axis=0)
+
+    # 종목 행 다음에 그 카테고리 요약행, 맨 끝에 전체 요약 (lexsort 는 안정 정렬이라 같은 수익률은 원래 순서)
+    prin, tot = sums[:, PNL_SUMS.index("원금숫자")], sums[:, PNL_SUMS.index("총수익숫자")]
+    ret = np.r_[pnl["수익률숫자"].to_numpy(dtype=float), np.divide(tot * 100, prin, out=np.zeros_like(tot), where=prin > 0)]
+    n, n_sum = len(pnl), n_cat + 1
+    is_sum = np.r_[np.zeros(n), np.ones(n_sum)]
+    order = np.lexsort((np.where(is_sum, 0.0, -ret), is_sum, np.r_[cat, np.arange(n_sum)]))
+
+    labels = np.r_[pnl["종목"].to_numpy(dtype=object), [f"📊 [{c}] 요약" for c in cat_order] + ["📊 전체 자산 총합 요약"]][order]
+    is_usd = np.r_[pnl["미국"].to_numpy(dtype=bool), np.zeros(n_sum, dtype=bool)][order]
+    price = np.r_[pnl["현재가숫자"].to_numpy(dtype=float), np.full(n_sum, np.nan)][order]
+    avg = np.r_[pnl["평단가숫자"].to_numpy(dtype=float), np.full(n_sum, np.nan)][order]
+    vals, ret = np.vstack([vals, sums])[order], ret[order]
+
+    real, unreal, tot, amt, prin = vals.T
+    return pd.DataFrame({
+        "종목": labels,
+        "현재가": _price(price, is_usd), "실제평단가": _price(avg, is_usd),
+        "실현수익": [fmt_pnl(v) for v in real], "미실현수익": [fmt_pnl(v) for v in unreal], "총수익": [fmt_pnl(v) for v in tot],
+        "실제금액": _won(amt), "원금(투입분)": _won(prin),
+        "수익률(%)": [fmt_pct(v) for v in ret],
+    })
+
+def target_amounts(pf, state):
+    """(종목별 목표금액 — 고정 종목은 현재 평가금액, 예수금 목표금액)"""
+    target_costs, _ = pf.target_costs(state["rebalance_budget"])
+    locked_amts = np.array([c['my_amt'] for c in state["stock_data_cache"]]) * pf.locked
+    return np.where(pf.locked, locked_amts, target_costs), state["rebalance_budget"] * pf.cash_share
+
+# --- 포트폴리오 자산군별 현황 요약표 ---
+def build_summary_table(pf, state):
+    total_asset = state["total_asset"]
+    cat_stats = state["cat_stats"]
+    tgt_amts, tgt_Cash = target_amounts(pf, state)
+    tgt_cat = np.bincount(pf.cat_idx, tgt_amts, len(pf.categories))
+
+    sum_rows = []
+    target_data = [(c.code, c.label, tgt_cat[k]) for k, c in enumerate(pf.categories)]
+
+    for code, label, t_amt in target_data:
+        c_cur = cat_stats[code]
+        c_prev = cat_stats[code + "_P"]
+        c_prev2 = cat_stats[code + "_P2"]
+
+        c_prof = c_cur - c_prev
+        c_pct = (c_prof / c_prev * 100) if c_prev > 0 else 0
+        c_d1_pct = ((c_prev - c_prev2) / c_prev2 * 100) if c_prev2 > 0 else 0
+
+        c_pct_str = f"▲ {c_pct:.2f}%" if c_pct > 0 else (f"▼ {abs(c_pct):.2f}%" if c_pct < 0 else "-")
+        c_d1_pct_str = f"▲ {c_d1_pct:.2f}%" if c_d1_pct > 0 else (f"▼ {abs(c_d1_pct):.2f}%" if c_d1_pct < 0 else "-")
+        c_prof_str = f"▲ ₩{c_prof:,.0f}" if c_prof > 0 else (f"▼ ₩{abs(c_prof):,.0f}" if c_prof < 0 else "₩0")
+
+        sum_rows.append({
+            "종목": label, "D-1": c_d1_pct_str, "등락률": c_pct_str, "오늘수익": c_prof_str,
+            "목표비중": f"{(t_amt / total_asset):.1%}" if total_asset > 0 else "0%",
+            "실제비중": f"{(c_cur / total_asset):.1%}",
+            "목표금액": f"₩{t_amt:,.0f}", "실제금액": f"₩{c_cur:,.0f}"
+        })
+
+    sum_rows.append({
+        "종목": pf.cash_label, "D-1": "-", "등락률": "-", "오늘수익": "-",
+        "목표비중": f"{pf.cash_share:.1%}", "실제비중": f"{(state['input_cash'] / total_asset):.1%}",
+        "목표금액": f"₩{tgt_Cash:,.0f}", "실제금액": f"₩{state['input_cash']:,.0f}"
+    })
+
+    tot_pct_daily = state["total_daily_return_pct"]
+    tot_d1_pct = state["total_d1_change_pct"]
+    tot_prof_daily = state["total_today_profit"]
+
+    tot_pct_str = f"▲ {tot_pct_daily:.2f}%" if tot_pct_daily > 0 else (f"▼ {abs(tot_pct_daily):.2f}%" if tot_pct_daily < 0 else "-")
+    tot_d1_pct_str = f"▲ {tot_d1_pct:.2f}%" if tot_d1_pct > 0 else (f"▼ {abs(tot_d1_pct):.2f}%" if tot_d1_pct < 0 else "-")
+    tot_profit_str = f"▲ ₩{tot_prof_daily:,.0f}" if tot_prof_daily > 0 else (f"▼ ₩{abs(tot_prof_daily):,.0f}" if tot_prof_daily < 0 else "₩0")
+
+    sum_rows.append({
+        "종목": "📊 포트폴리오 총합", "D-1": tot_d1_pct_str, "등락률": tot_pct_str, "오늘수익": tot_profit_str,
+        "목표비중": "100.0%", "실제비중": "100.0%", "목표금액": f"₩{total_asset:,.0f}", "실제금액": f"₩{total_asset:,.0f}"
+    })
+    return pd.DataFrame(sum_rows)
+
+# ==========================================
+# 표 렌더링 스타일
+# ==========================================
+TEXT_COLUMNS = ("실행", "종목", "구분")      # 가운데 정렬 (나머지는 오른쪽)
+
+def style_change_color(val):
+    val_str = str(val)
+    if '▲' in val_str: return 'background-color: #CCFFCC; color: #2E7D32; font-weight: bold;'
+    elif '▼' in val_str: return 'background-color: #FFD1DC; color: #C2185B; font-weight: bold;'
+    return ''
+
+def style_d1_color(val):
+    val_str = str(val)
+    if '▲' in val_str: return 'color: #2E7D32; font-weight: bold;'
+    elif '▼' in val_str: return 'color: #C2185B; font-weight: bold;'
+    return ''
+
+def style_text_color(val):
+    if '매수' in str(val): return 'color: #2E7D32; font-weight: bold;'  # 초록색
+    elif '매도' in str(val): return 'color: #D32F2F; font-weight: bold;' # 빨간색
+    return 'color: #757575;'
+
+def style_profit_val(val):
+    val_str = str(val)
+    if '▲' in val_str: return 'color: #2E7D32; font-weight: bold;'
+    elif '▼' in val_str: return 'color: #C2185B; font-weight: bold;'
+    return ''
+
+def style_stock_dataframe(row):
+    if '총합 요약' in str(row.get('종목', '')):
+        return ['background-color: #FFF59D; color: #212121; font-weight: bold; font-size: 15px;'] * len(row)
+    elif '요약' in str(row.get('종목', '')):
+        return ['background-color: #EEEEEE; font-weight: bold;'] * len(row)
+    return [''] * len(row)
+
+def style_summary_dataframe(row):
+    col_name = '종목' if '종목' in row else '구분'
+    bg_color = 'white'
+    if '해외' in row[col_name] or '미장' in row[col_name]: bg_color = '#FCE4EC'
+    elif '국내' in row[col_name] or '국장' in row[col_name]: bg_color = '#E3F2FD'
+    elif 'ETF' in row[col_name] or '현금성' in row[col_name]: bg_color = '#FFF9C4'
+    elif '예수금' in row[col_name]: bg_color = '#F1F8E9'
+    elif '전체' in row[col_name] or '총합' in row[col_name]: bg_color = '#EEEEEE'
+    return [f'background-color: {bg_color}'] * len(row)
+
+def _cell_css(df, row_style=None, cell_styles=()):
+    """행 스타일 함수 → 셀 스타일 함수들 → 정렬 순서로 (행 × 열) CSS 문자열 프레임을 한 번에 만든다.
+    Styler 에는 apply(axis=None) 하나만 걸리므로 화면을 그릴 때마다 도는 _compute 가 가볍다."""
+    cells = [[[] for _ in df.columns] for _ in range(len(df))]
+    if row_style is not None:
+        for i, (_, row) in enumerate(df.iterrows()):
+            for j, css in enumerate(row_style(row)): cells[i][j].append(css)
+    for func, cols in cell_styles:
+        for col in cols:
+            j = df.columns.get_loc(col)
+            for i, val in enumerate(df[col]): cells[i][j].append(func(val))
+    for j, col in enumerate(df.columns):
+        align = 'text-align: center' if col in TEXT_COLUMNS else 'text-align: right'
+        for i in range(len(df)): cells[i][j].append(align)
+    return pd.DataFrame([[";".join(c for c in cell if c) for cell in row] for row in cells], index=df.index, columns=df.columns)
+
+def _styled(df, css):
+    return (df.style.apply(lambda _: css, axis=None)
+                    .set_table_styles([dict(selector='th', props=[('text-align', 'center')])], overwrite=False))
+
+STOCK_STYLES = [(style_text_color, ['실행']), (style_change_color, ['등락률', '오늘수익']), (style_d1_color, ['D-1'])]
+SUMMARY_STYLES = [(style_change_color, ['등락률', '오늘수익']), (style_d1_color, ['D-1'])]
+PNL_STYLES = [(style_profit_val, ['실현수익', '미실현수익', '총수익', '수익률(%)'])]
+
+def style_summary_table(df_summary):
+    return _styled(df_summary, _cell_css(df_summary, style_summary_dataframe, SUMMARY_STYLES))
+
+def style_pnl_table(df_pnl):
+    return _styled(df_pnl, _cell_css(df_pnl, style_stock_dataframe, PNL_STYLES))
+
+# ==========================================
+# 분석 1회분 표 묶음: 숫자/표시 열과 셀 CSS 는 한 번만 만들고, 정렬·필터는 행 순서만 바꾼다
+# ==========================================
+@dataclass(frozen=True, eq=False)
+class HoldingTable:
+    stock: pd.DataFrame        # 종목 순서: 숫자 열 + 실행/종목/카테고리 (표시 문자열은 뷰마다 _format_stock 으로)
+    stock_css: pd.DataFrame    # 종목 행의 표시 열 셀별 CSS (요약행 제외)
+    pnl: pd.DataFrame
+    summary: pd.DataFrame
+    actions: list              # 최상단 매수/매도 알림
+
+def build_holding_table(pf, state):
+    stock, pnl, actions = build_holding_rows(pf, state)
+    return HoldingTable(
+        stock=stock, stock_css=_cell_css(_format_stock(stock), style_stock_dataframe, STOCK_STYLES),
+        pnl=build_pnl_table(pf, pnl), summary=build_summary_table(pf, state), actions=actions,
+    )
+
+def style_stock_view(table, filter_by, sort_by):
+    """필터/정렬된 리밸런싱 표 Styler. 종목 행의 CSS 는 미리 만든 것을 같은 순서로 고르기만 한다."""
+    view, order = _stock_view(table, filter_by, sort_by)
+    summary_css = _cell_css(view.iloc[[-1]], style_stock_dataframe, STOCK_STYLES)
+    css = pd.concat([table.stock_css.loc[order], summary_css], ignore_index=True)
+    return _styled(view, css)
@@ -0,0 +1,79 @@
+import os
+import sys
+import hashlib
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class SheetStandIn:
+    """구글 시트 대역 (로컬 http.server).
+    GET: body 를 CSV 로 돌려주고 ETag/Last-Modified 조건부 요청이면 304 (validators=False 면 둘 다 안 보냄).
+    POST: post_status 에서 상태 코드를 하나씩 꺼내 답하고 (비면 200), 받은 폼을 posts 에 남긴다."""
+
+    def __init__(self):
+        self.body = b""
+        self.mtime = 1_700_000_000.0
+        self.validators = True
+        self.gets = []             # (If-None-Match, If-Modified-Since, 상태 코드)
+        self.posts = []            # (폼 dict, 상태 코드)
+        self.post_status = []
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}/sheet"
+
+    def set_body(self, text):
+        self.body = text.encode("utf-8")
+        self.mtime += 10
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body=b"", headers=()):
+                self.send_response(status)
+                for k, v in headers: self.send_header(k, v)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                body = stand_in.body
+                etag = '"%s"' % hashlib.sha1(body).hexdigest()
+                modified = formatdate(stand_in.mtime, usegmt=True)
+                inm, ims = self.headers.get("If-None-Match"), self.headers.get("If-Modified-Since")
+                fresh = stand_in.validators and (inm == etag if inm else ims == modified)
+                stand_in.gets.append((inm, ims, 304 if fresh else 200))
+                if fresh: return self._reply(304)
+                headers = [("Content-Type", "text/csv; charset=utf-8")]
+                if stand_in.validators: headers += [("ETag", etag), ("Last-Modified", modified)]
+                self._reply(200, body, headers)
+
+            def do_POST(self):
+                form = parse_qs(self.rfile.read(int(self.headers.get("Content-Length", 0))).decode())
+                with stand_in._lock:
+                    status = stand_in.post_status.pop(0) if stand_in.post_status else 200
+                    stand_in.posts.append(({k: v[0] for k, v in form.items()}, status))
+                self._reply(status, b"ok")
+
+        return Handler
+
+@pytest.fixture
+def sheet():
+    stand_in = SheetStandIn()
+    yield stand_in
+    stand_in.close()
@@ -0,0 +1,18 @@
+import numpy as np
+import pytest
+from backtest import _integer_targets
+
+@pytest.mark.parametrize("fee_rate", [0.0, 0.01, 0.05])
+def test_fees_never_push_cash_below_zero(fee_rate):
+    price = np.array([10_000.0, 7_000.0, 3_000.0])
+    qty = np.array([[0, 0, 0], [50, 0, 10]])
+    locked = np.zeros(3, dtype=bool)
+    budget = (qty * price).sum(axis=1) + np.array([1_000_000.0, 0.0])          # 예수금을 전부 투자하는 목표
+    target = budget[:, None] * np.array([0.5, 0.3, 0.2])
+
+    def cash_after(new_qty):
+        return budget - (new_qty * price).sum(axis=1) - fee_rate * (np.abs(new_qty - qty) * price).sum(axis=1)
+
+    assert (cash_after(_integer_targets(target, price, qty, locked, budget, fee_rate)) >= -1e-6).all()
+    if fee_rate > 0:                                                            # 수수료를 빼지 않으면 예수금이 음수가 되는 경우
+        assert (cash_after(_integer_targets(target, price, qty, locked, budget)) < 0).any()
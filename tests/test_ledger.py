@@ -0,0 +1,81 @@
+import io
+import pytest
+from portfolio import load_portfolio
+from ledger import CostBasisBook, LedgerError, apply_files, ingest_files, load_book, read_trades
+
+HEADER = "date,action,symbol,quantity,price,fee,tax,currency\n"
+TRADES = HEADER + (
+    "2024-01-02,buy,AAA,10,100,0,0,KRW\n"
+    "2024-01-03,buy,AAA,10,200,0,0,KRW\n"
+    "2024-01-04,sell,AAA,15,300,0,0,KRW\n"
+    "2024-01-05,dividend,AAA,1,50,0,10,KRW\n"
+)
+
+class Upload(io.BytesIO):
+    """Streamlit UploadedFile 처럼 이름이 붙은 바이너리 파일"""
+    def __init__(self, name, text):
+        super().__init__(text.encode())
+        self.name = name
+
+def _ingest(text, method="fifo", book=None, encoding="utf-8"):
+    book = book or CostBasisBook(method)
+    return book, book.ingest("trades.csv", read_trades(io.BytesIO(text.encode(encoding))))
+
+def test_fifo_sells_oldest_lots_first():
+    book, applied = _ingest(TRADES)
+    qty, avg, realized, dividends = book.positions()["AAA"]
+    assert applied == 4
+    assert qty == 5 and avg == 200                          # 100원 10주 + 200원 5주를 팔고 200원 5주가 남음
+    assert realized == 15 * 300 - (10 * 100 + 5 * 200) + 40 and dividends == 40
+
+def test_avg_uses_moving_average_cost():
+    book, _ = _ingest(TRADES, method="avg")
+    qty, avg, realized, _ = book.positions()["AAA"]
+    assert qty == 5 and avg == 150
+    assert realized == 15 * (300 - 150) + 40
+
+def test_descending_export_is_read_from_the_end():
+    lines = TRADES.splitlines(keepends=True)
+    book, _ = _ingest(lines[0] + "".join(reversed(lines[1:])))
+    assert book.positions()["AAA"][:2] == (5, 200)
+
+def test_reingesting_the_same_file_applies_nothing():
+    book, _ = _ingest(TRADES)
+    _, applied = _ingest(TRADES, book=book)
+    assert applied == 0 and book.positions()["AAA"][0] == 5
+    _, applied = _ingest(TRADES + "2024-01-05,buy,AAA,1,100,0,0,KRW\n", book=book)     # 같은 날짜에 한 줄 더
+    assert applied == 1 and book.positions()["AAA"][0] == 6
+
+def test_cli_state_survives_reload(tmp_path):
+    pf = load_portfolio()
+    db = str(tmp_path / "ledger.sqlite")
+    _, applied = ingest_files(pf, [("a.csv", io.BytesIO(TRADES.encode()))], db_path=db)
+    _, again = ingest_files(pf, [("a.csv", io.BytesIO(TRADES.encode()))], db_path=db)
+    assert applied == 4 and again == 0
+    assert load_book("fifo", db).positions()["AAA"][0] == 5
+    assert not load_book("avg", db).positions()              # 방식이 바뀌면 빈 상태
+
+def test_cp949_with_korean_only_after_the_first_block():
+    rows = "".join(f"2024-01-{1 + i // 200:02d},buy,AAA,1,100,0,0,KRW\n" for i in range(4000))
+    book, applied = _ingest(HEADER + rows + "2024-02-01,매수,AAA,2,100,0,0,KRW\n", encoding="cp949")
+    assert applied == 4001 and book.positions()["AAA"][0] == 4002
+
+def test_undecodable_file_is_a_ledger_error():
+    with pytest.raises(LedgerError):
+        list(read_trades(io.BytesIO(HEADER.encode() + b"2024-01-02,\xff\xfe,AAA,1,1,0,0,KRW\n")))
+
+def test_failed_upload_leaves_the_session_book_unchanged():
+    pf = load_portfolio()
+    book, _ = apply_files(CostBasisBook(), pf, [("trades.csv", Upload("trades.csv", TRADES))])
+    unsorted = HEADER + "2024-02-02,buy,AAA,1,1,0,0,KRW\n2024-02-01,buy,AAA,1,1,0,0,KRW\n2024-02-03,buy,AAA,1,1,0,0,KRW\n"
+    with pytest.raises(LedgerError):
+        apply_files(book, pf, [("more.csv", Upload("more.csv", unsorted))])
+    assert book.positions()["AAA"][0] == 5 and "more.csv" not in book.sources
+
+def test_sessions_with_the_same_file_name_do_not_mix():
+    pf = load_portfolio()
+    mine, _ = apply_files(CostBasisBook(), pf, [("export.csv", Upload("export.csv", TRADES))])
+    other = HEADER + "2024-01-02,buy,BBB,7,10,0,0,KRW\n"
+    theirs, applied = apply_files(CostBasisBook(), pf, [("export.csv", Upload("export.csv", other))])
+    assert applied == 1
+    assert set(mine.positions()) == {"AAA"} and set(theirs.positions()) == {"BBB"}
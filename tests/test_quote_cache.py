@@ -0,0 +1,15 @@
+from datetime import datetime
+import pytest
+from quote_cache import KST, NY, LIVE_TTL_SEC, quote_ttl
+
+@pytest.mark.parametrize("country, local, short", [
+    ("KR", datetime(2024, 3, 6, 15, 29, tzinfo=KST), True),      # 장중
+    ("KR", datetime(2024, 3, 6, 15, 45, tzinfo=KST), True),      # 마감 직후 종가 확정 대기
+    ("KR", datetime(2024, 3, 6, 16, 0, tzinfo=KST), False),      # 이후는 다음 장 시작까지
+    ("KR", datetime(2024, 3, 9, 15, 45, tzinfo=KST), False),     # 토요일
+    ("US", datetime(2024, 3, 6, 20, 10, tzinfo=NY), True),
+    ("US", datetime(2024, 3, 6, 20, 30, tzinfo=NY), False),
+])
+def test_short_ttl_until_the_close_settles(country, local, short):
+    ttl = quote_ttl(country, local)
+    assert (ttl == LIVE_TTL_SEC) == short
@@ -0,0 +1,67 @@
+import itertools
+import numpy as np
+import pytest
+import rebalance
+from rebalance import solve_integer_rebalance, _spend
+
+def _error(qty, price, target, active):
+    return (((qty * price - target)[active]) ** 2).sum()
+
+def _brute_force(price, target, current, budget, active, fee_rate):
+    """예산 안의 모든 정수 조합 중 오차 최소값"""
+    ranges = [range(int(budget // price[i]) + 1) if active[i] else [current[i]] for i in range(len(price))]
+    best = np.inf
+    for q in itertools.product(*ranges):
+        q = np.array(q)
+        if _spend(q, price, current, fee_rate, active) <= budget + 1e-6:
+            best = min(best, _error(q, price, target, active))
+    return best
+
+def _case(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(3, 6))
+    price = rng.uniform(2e4, 3e5, n)
+    budget = rng.uniform(3e5, 1.2e6)
+    target = budget * rng.dirichlet(np.ones(n)) * 1.1         # 대부분 반올림이 예산을 넘어 탐색 경로를 탄다
+    current = rng.integers(0, 4, n)
+    tradable = rng.random(n) > 0.15
+    fee_rate = float(rng.choice([0.0, 0.0015, 0.01]))
+    return price, target, current, budget, tradable, fee_rate
+
+@pytest.mark.parametrize("seed", range(40))
+def test_matches_brute_force(seed):
+    price, target, current, budget, tradable, fee_rate = _case(seed)
+    plan = solve_integer_rebalance(price, target, current, budget, tradable, fee_rate=fee_rate)
+    active = tradable & (price > 0)
+    assert plan.exact
+    assert _spend(plan.qty, price, current, fee_rate, active) <= budget + 1e-6
+    assert np.array_equal(plan.qty[~active], current[~active])
+    best = _brute_force(price, target, current, budget, active, fee_rate)
+    assert _error(plan.qty, price, target, active) <= best * (1 + 1e-9) + 1e-6
+
+def test_rounding_within_budget_is_exact_without_search():
+    plan = solve_integer_rebalance([100.0, 200.0], [1040.0, 1960.0], [0, 0], 5000, [True, True])
+    assert plan.exact and plan.qty.tolist() == [10, 10]
+
+def _tight_case():
+    # 모든 종목을 반올림하면 예산을 넘어서 DP·탐색 경로를 탄다
+    price = np.array([90_000.0, 61_000.0, 47_000.0, 33_000.0])
+    target = np.array([4.6, 3.6, 4.6, 4.6]) * price                 # 반올림 합 1,094,000 > 예산
+    return price, target, np.zeros(4, dtype=np.int64), 1_000_000.0, np.ones(4, dtype=bool)
+
+def test_too_many_tickers_falls_back_to_heuristic(monkeypatch):
+    monkeypatch.setattr(rebalance, "EXACT_MAX_TICKERS", 2)
+    price, target, current, budget, tradable = _tight_case()
+    plan = solve_integer_rebalance(price, target, current, budget, tradable)
+    assert not plan.exact
+    assert _spend(plan.qty, price, current, 0.0, tradable) <= budget + 1e-6
+
+def test_node_limit_falls_back_to_best_found(monkeypatch):
+    monkeypatch.setattr(rebalance, "EXACT_MAX_NODES", 0)
+    price, target, current, budget, tradable = _tight_case()
+    approx = solve_integer_rebalance(price, target, current, budget, tradable)
+    monkeypatch.setattr(rebalance, "EXACT_MAX_NODES", 50_000)
+    exact = solve_integer_rebalance(price, target, current, budget, tradable)
+    assert not approx.exact and exact.exact
+    assert _spend(approx.qty, price, current, 0.0, tradable) <= budget + 1e-6
+    assert _error(exact.qty, price, target, tradable) <= _error(approx.qty, price, target, tradable)
@@ -0,0 +1,77 @@
+from sheet_reader import SheetReader
+
+HEADER = "date,asset\n"
+
+def _rows(n, start=1):
+    return "".join(f'2024-01-{d:02d},"{1_000_000 + d * 1000:,}"\n' for d in range(start, start + n))
+
+def _reader(sheet, tmp_path, check_sec=0):
+    return SheetReader(sheet.url, db_path=str(tmp_path / "sheet.sqlite"), check_sec=check_sec)
+
+def test_full_then_fresh_then_not_modified(sheet, tmp_path):
+    sheet.set_body(HEADER + _rows(5))
+    reader = _reader(sheet, tmp_path, check_sec=3600)
+    assert reader.refresh() == "full"
+    assert list(reader.history(refresh=False)) == [1_001_000, 1_002_000, 1_003_000, 1_004_000, 1_005_000]
+    assert reader.refresh() == "fresh"
+    assert len(sheet.gets) == 1                       # 확인 간격 안에서는 요청하지 않는다
+    assert reader.refresh(force=True) == "not_modified"
+    assert sheet.gets[-1][0] is not None and sheet.gets[-1][2] == 304
+
+def test_append_reads_only_new_rows(sheet, tmp_path):
+    sheet.set_body(HEADER + _rows(5))
+    reader = _reader(sheet, tmp_path)
+    reader.refresh()
+    sheet.set_body(HEADER + _rows(7))
+    assert reader.refresh() == "append"
+    hist = reader.history(refresh=False)
+    assert len(hist) == 7 and hist.iloc[-1] == 1_007_000
+
+def test_rewritten_last_row_replaces_old_date(sheet, tmp_path):
+    sheet.set_body(HEADER + _rows(3))
+    reader = _reader(sheet, tmp_path)
+    reader.refresh()
+    sheet.set_body(HEADER + _rows(2) + '2024-01-04,"9,999"\n2024-01-05,1\n')     # 마지막 줄 날짜를 고치고 한 줄 더
+    assert reader.refresh() == "append"
+    hist = reader.history(refresh=False)
+    assert [d.day for d in hist.index] == [1, 2, 4, 5]
+    assert hist.iloc[-2] == 9_999
+
+def test_deleted_last_row_is_dropped(sheet, tmp_path):
+    sheet.set_body(HEADER + _rows(3))
+    reader = _reader(sheet, tmp_path)
+    reader.refresh()
+    sheet.set_body(HEADER + _rows(2))
+    assert reader.refresh() == "full"
+    assert len(reader.history(refresh=False)) == 2
+
+def test_edit_in_the_middle_rereads_everything(sheet, tmp_path):
+    sheet.set_body(HEADER + _rows(4))
+    reader = _reader(sheet, tmp_path)
+    reader.refresh()
+    sheet.set_body(HEADER + _rows(1) + "2024-01-02,5\n" + _rows(2, start=3))
+    assert reader.refresh() == "full"
+    assert reader.history(refresh=False).iloc[1] == 5
+
+def test_sheet_without_header_keeps_first_row(sheet, tmp_path):
+    sheet.set_body("2024. 1. 2,100\n2024. 1. 3,200\n")
+    reader = _reader(sheet, tmp_path)
+    assert reader.refresh() == "full"
+    assert list(reader.history(refresh=False)) == [100, 200]
+
+def test_unchanged_body_without_validators(sheet, tmp_path):
+    sheet.validators = False
+    sheet.set_body(HEADER + _rows(3))
+    reader = _reader(sheet, tmp_path)
+    reader.refresh()
+    assert reader.refresh() == "unchanged"
+    assert sheet.gets[-1][:2] == (None, None)
+
+def test_server_down_keeps_cache(sheet, tmp_path):
+    sheet.set_body(HEADER + _rows(3))
+    reader = _reader(sheet, tmp_path)
+    reader.refresh()
+    sheet.close()
+    reader.timeout = (0.5, 0.5)
+    assert reader.refresh() == "error"
+    assert len(reader.history()) == 3
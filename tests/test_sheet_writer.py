@@ -0,0 +1,67 @@
+import json
+import time
+from sheet_writer import SheetWriter
+
+ROW = {"date": "2024-01-02", "asset": 12345678}
+
+def _writer(sheet, tmp_path, **kwargs):
+    kwargs = {"backoff_sec": 0.01, "idle_sec": 0.05, **kwargs}
+    return SheetWriter(sheet.url, spool_path=str(tmp_path / "spool.jsonl"), timeout=(1, 2), **kwargs)
+
+def _wait(cond, timeout=5.0):
+    end = time.time() + timeout
+    while not cond():
+        assert time.time() < end, "timed out"
+        time.sleep(0.01)
+
+def test_5xx_is_retried_until_success(sheet, tmp_path):
+    sheet.post_status = [500, 503]
+    writer = _writer(sheet, tmp_path)
+    writer.enqueue(ROW)
+    _wait(lambda: len(sheet.posts) == 3 and not writer.pending())
+    assert [status for _, status in sheet.posts] == [500, 503, 200]
+    assert sheet.posts[-1][0] == {"date": "2024-01-02", "asset": "12345678"}
+
+def test_400_is_rejected_once_and_not_resent(sheet, tmp_path):
+    sheet.post_status = [400]
+    writer = _writer(sheet, tmp_path)
+    writer.enqueue(ROW)
+    _wait(lambda: writer._thread is None)
+    assert len(sheet.posts) == 1
+    assert writer.pending() == []                  # 거절된 행은 spool 에 다시 넣지 않는다
+    rejected = (tmp_path / "spool.jsonl.rejected").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line) for line in rejected] == [{**ROW, "status": 400}]
+    writer.enqueue({"date": "2024-01-03", "asset": 1})
+    _wait(lambda: len(sheet.posts) == 2 and not writer.pending())
+    assert sheet.posts[-1][0]["date"] == "2024-01-03"
+
+def test_exhausted_retries_stay_in_spool(sheet, tmp_path):
+    sheet.post_status = [503, 503, 503]
+    writer = _writer(sheet, tmp_path)
+    writer._append_spool(ROW)
+    assert writer.flush() == 1
+    assert len(sheet.posts) == 3 and writer.pending() == [ROW]
+    assert writer.flush() == 0 and writer.pending() == []
+
+def test_row_is_spooled_before_it_is_sent(sheet, tmp_path):
+    sheet.post_status = [500]
+    writer = _writer(sheet, tmp_path, backoff_sec=0.5)
+    writer.enqueue(ROW)
+    assert writer.pending() == [ROW]               # 보내기 전에 이미 디스크에 있다
+    _wait(lambda: not writer.pending())
+
+def test_flush_drains_spool(sheet, tmp_path):
+    spool = tmp_path / "spool.jsonl"
+    rows = [{"date": "2024-01-02", "asset": 1}, {"date": "2024-01-03", "asset": 2}, {"date": "2024-01-02", "asset": 3}]
+    spool.write_text("".join(json.dumps(r) + "\n" for r in rows) + '{"date": "2024-01-0', encoding="utf-8")   # 마지막 줄은 쓰다 만 줄
+    writer = _writer(sheet, tmp_path)
+    assert writer.flush() == 0
+    assert sorted((p["date"], p["asset"]) for p, _ in sheet.posts) == [("2024-01-02", "3"), ("2024-01-03", "2")]
+    assert writer.pending() == []
+
+def test_enqueue_after_idle_exit_starts_new_thread(sheet, tmp_path):
+    writer = _writer(sheet, tmp_path)
+    writer.enqueue(ROW)
+    _wait(lambda: writer._thread is None)
+    writer.enqueue({"date": "2024-01-03", "asset": 1})
+    _wait(lambda: len(sheet.posts) == 2 and not writer.pending())
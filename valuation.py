@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+from price_history import OHLC_FIELDS
+
+# ==========================================
+# 과거 평가금액 계산 커널 (날짜 × 티커 × OHLC)
+# ==========================================
+FX_TICKER = "KRW=X"
+
+def build_price_cube(hist, tickers, usd_mask, fx_ticker=FX_TICKER):
+    """PriceHistory 를 (날짜 × 티커 × OHLC) 원화 float64 배열로 한 번에 정렬한다.
+    결측은 티커별 ffill → bfill 을 한 번만 하고, 그래도 비어 있으면 0 으로 둔다.
+    달러 종목은 같은 필드의 환율(시가×시가, 종가×종가 …)을 곱한다."""
+    cube = hist.block(list(tickers) + [fx_ticker])
+    prices, fx = cube[:, :-1, :], cube[:, -1:, :]
+    prices = np.where(np.asarray(usd_mask, dtype=bool)[None, :, None], prices * fx, prices)
+    return np.nan_to_num(prices)
+
+def value_by_group(cube, qty, group_idx, n_groups):
+    """(티커 × 그룹) 수량 행렬과 한 번 곱해 (날짜 × OHLC × 그룹) 평가금액을 만든다.
+    qty 가 (날짜 × 티커) 보유 이력이면 날짜별 수량을 먼저 곱하고 0/1 그룹 행렬로 묶는다."""
+    qty = np.asarray(qty, dtype=float)
+    weights = np.zeros((cube.shape[1], n_groups))
+    if qty.ndim == 2:
+        weights[np.arange(cube.shape[1]), group_idx] = 1.0
+        return np.tensordot(cube * qty[:, :, None], weights, axes=([1], [0]))
+    weights[np.arange(cube.shape[1]), group_idx] = qty
+    return np.tensordot(cube, weights, axes=([1], [0]))
+
+def value_portfolio(hist, tickers, qty, usd_mask, group_of, groups, cash=0.0, fx_ticker=FX_TICKER):
+    """그룹별 + 전체("total", 예수금 포함) OHLC 평가금액 DataFrame 을 담은 dict 를 돌려준다.
+    qty/cash 는 현재 보유 (종목,) / 숫자 또는 보유 이력 (날짜 × 종목) / (날짜,)."""
+    cube = build_price_cube(hist, tickers, usd_mask, fx_ticker)
+    values = value_by_group(cube, qty, [groups.index(g) for g in group_of], len(groups))
+    cash = np.broadcast_to(np.asarray(cash, dtype=float), len(hist.index))
+    out = {g: pd.DataFrame(values[:, :, k], index=hist.index, columns=OHLC_FIELDS) for k, g in enumerate(groups)}
+    out["total"] = pd.DataFrame(values.sum(axis=2) + cash[:, None], index=hist.index, columns=OHLC_FIELDS)
+    out["cash"] = pd.Series(cash, index=hist.index)
+    return out
+
+def value_holdings(pf, hist, qty, cash=0.0):
+    """전 종목을 한 번에 정렬해 (카테고리, 국가) 그룹별로 계산한 뒤 차트용으로 묶는다.
+    {"total", "cat": {카테고리명: DataFrame}, "KR", "US", "cash": 날짜별 예수금 Series}"""
+    val_group = list(zip(pf.category_names, pf.countries))
+    val_keys = sorted(set(val_group))
+    valued = value_portfolio(hist, pf.tickers, qty, pf.usd, val_group, val_keys, cash=cash)
+    zero_val = valued["total"] * 0
+    return {
+        "total": valued["total"],
+        "cat": {c.name: sum((valued[g] for g in val_keys if g[0] == c.name), zero_val) for c in pf.categories},
+        "KR": sum((valued[g] for g in val_keys if g[1] == "KR"), zero_val),
+        "US": sum((valued[g] for g in val_keys if g[1] == "US"), zero_val),
+        "cash": valued["cash"],
+    }